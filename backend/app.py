@@ -1,9 +1,28 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, request, jsonify, send_file
 from flask_cors import CORS
 from datetime import datetime
 import os
-import json
 import re
+import threading
+import time
+
+import client_import
+import compression
+import json_codec
+import metrics
+import pagination
+import portfolio_analytics
+import snapshot
+from app_logging import begin_request, configure_logging, get_logger
+from client_store import ClientStore
+from dataset_summary import DatasetSummary
+from event_bus import EventBus, HEARTBEAT, stream_preamble
+from recommendation_repository import RecommendationRepository
+from recommendation_templates import GenericRecommendations
+from search_cache import SearchCache, SearchParams
+from static_assets import StaticAssets
+from storage import open_storage
+from versions import COLLECTION, VersionRegistry
 
 # Determine if we're in production
 is_production = os.environ.get('FLASK_ENV') == 'production'
@@ -12,6 +31,7 @@ is_production = os.environ.get('FLASK_ENV') == 'production'
 static_folder = '../frontend/dist' if is_production else None
 
 app = Flask(__name__, static_folder=static_folder)
+app.json = json_codec.FastJSONProvider(app)
 
 # CORS Configuration with dynamic origins
 allowed_origins = [
@@ -27,24 +47,23 @@ if os.environ.get('ADDITIONAL_CORS_ORIGINS'):
         if origin.strip():
             allowed_origins.append(origin.strip())
 
-CORS(app, origins=allowed_origins, supports_credentials=True)
+CORS(app, origins=allowed_origins, supports_credentials=True, expose_headers=['X-Next-Cursor', 'ETag'])
 
-# Enhanced logging - matching Express style
-print('🚀 Starting AIVest Banking Server (Flask)...')
-print(f'📅 Timestamp: {datetime.now().isoformat()}')
-print(f'🌐 Target Port: {os.getenv("PORT", 5000)}')
-print(f'💻 Python Version: {os.sys.version}')
-print(f'📁 Working Directory: {os.getcwd()}')
-print(f'🔧 Environment: {os.getenv("FLASK_ENV", "development")}')
-print(f'🔧 Production Mode: {is_production}')
+# Structured logging - records are queued and written by a background thread
+configure_logging(production=is_production)
+log = get_logger('api')
 
-# CORS Configuration log
-print('🔧 CORS Configuration Initialized')
-print(f'   🌐 Allowed Origins: {", ".join(allowed_origins)}')
-print(f'   🔧 Mode: {os.getenv("FLASK_ENV", "development")}')
+log.info('Starting AIVest Banking Server (Flask)', extra={
+    'port': os.getenv('PORT', 5000),
+    'python': os.sys.version.split()[0],
+    'cwd': os.getcwd(),
+    'environment': os.getenv('FLASK_ENV', 'development'),
+    'production': is_production,
+})
+log.info('CORS configuration initialized', extra={'origins': allowed_origins})
 
-# In-memory dataset - exact copy from your Express server
-clients = [
+# Seed dataset - exact copy from your Express server
+seed_clients = [
     {
         'id': 'c001',
         'name': 'Elena Rossi-Marchetti',
@@ -158,7 +177,7 @@ clients = [
 ]
 
 # Portfolio data - exact copy from Express
-portfolio_data = {
+seed_portfolios = {
     'c001': {
         'totalValue': 860,
         'lastUpdated': '2025-08-25T10:00:00Z',
@@ -198,7 +217,7 @@ portfolio_data = {
 }
 
 # Recommendations data - exact copy from Express
-recommendations = [
+seed_recommendations = [
     {
         'id': 'rec001',
         'clientId': 'c001',
@@ -237,212 +256,738 @@ recommendations = [
     }
 ]
 
+# Pre-encoded response bodies for records that only change on create/delete
+serialized_cache = json_codec.SerializedCache()
+
+# Compressed response bodies, reused while their ETag is unchanged
+compressed_bodies = compression.CompressedBodies()
+
+# Encoded /api/clients/search results, valid until the collection changes
+search_cache = SearchCache()
+
+# Generic recommendations for clients without static ones, built from templates
+generic_recommendations = GenericRecommendations()
+
+# Versions behind the ETags on client, portfolio and recommendation reads (see load_dataset)
+versions = None
+
+# Change feed pushed to dashboards over /api/stream
+change_feed = EventBus()
+# Refresh interval suggested to dashboards when this server can't hold the stream
+STREAM_POLL_SECONDS = 30
+# Each open stream holds a request thread of a wsgi worker for good, so only
+# some of them may stream (by default half the worker's threads); the rest
+# stay free for the API. A dashboard that went away frees its slot once a
+# heartbeat to it fails.
+MAX_STREAMS = int(os.getenv('AIVEST_MAX_STREAMS', str(max(int(os.getenv('AIVEST_THREADS', '8')) // 2, 1))))
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+# Mutations (request handlers and storage sync) run one at a time, so a check
+# and the write that depends on it can't interleave with another write.
+# Readers never take it: the stores serve lock-free reads (see concurrency.py).
+write_lock = threading.RLock()
+
+def json_body(body, status=200):
+    """Response for an already-encoded JSON body"""
+    return Response(body, status=status, mimetype='application/json')
+
+def not_modified(etag):
+    """304 response when the caller already holds `etag`, otherwise None"""
+    # Weak comparison: a compressed copy of the resource carries W/"etag"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        return with_etag(response, etag)
+    return None
+
+def with_etag(response, etag):
+    """Attach a strong ETag and ask clients to revalidate before reuse"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def portfolio_body(client_id):
+    """Encoded portfolio for a client, or None; snapshot portfolios are served from its pages"""
+    if isinstance(portfolio_data, snapshot.Overlay):
+        body = portfolio_data.raw(client_id)
+        if body is not None:
+            return body
+    portfolio = portfolio_data.get(client_id)
+    if not portfolio:
+        return None
+    return serialized_cache.get(('portfolio', client_id), portfolio)
+
+def client_resources(client_id):
+    """Resources whose representation a client being created or deleted changes"""
+    return ('client', client_id), ('recommendations', client_id), COLLECTION, ('summary', 'book')
+
+def recommendation_resources(rec):
+    """Resources whose representation storing a recommendation changes"""
+    return ('recommendations', rec['clientId']), ('summary', 'book')
+
+def client_changed(client, change, publish=True, seq=None):
+    """Invalidate caches, update aggregates and publish after a client is 'created' or 'deleted'
+
+    `seq` is the change log position of a change pulled from storage.
+    """
+    client_id = client['id']
+    serialized_cache.invalidate(('client', client_id))
+    generic_recommendations.invalidate(client_id)
+    versions.changed(client_resources(client_id), seq)
+    if change == 'created':
+        summary.client_added(client)
+        if analytics is not None and client_id in portfolio_data:
+            analytics.add(client, portfolio_data[client_id])
+        if publish:
+            change_feed.publish('client.created', {'id': client_id, 'client': client})
+    else:
+        summary.client_removed(client)
+        if analytics is not None:
+            analytics.remove(client_id)
+        change_feed.publish('client.deleted', {'id': client_id})
+
+def recommendation_changed(rec, previous_status, seq=None):
+    """Bump versions, update aggregates and publish after a recommendation is stored"""
+    versions.changed(recommendation_resources(rec), seq)
+    summary.recommendation_stored(rec, previous_status)
+    change_feed.publish('recommendation.updated', {
+        'id': rec['id'],
+        'clientId': rec['clientId'],
+        'status': rec.get('status'),
+    })
+
+def load_dataset(clients, portfolios, recs):
+    """Build the in-memory indexes for a dataset and drop everything derived from the old one"""
+    global client_store, portfolio_data, recommendation_repo, versions, analytics, summary
+    client_store = ClientStore(clients)
+    portfolio_data = portfolios
+    # Columnar copy of the portfolios for /api/analytics (needs numpy)
+    analytics = portfolio_analytics.PortfolioAnalytics(client_store, portfolios) if portfolio_analytics.AVAILABLE else None
+    recommendation_repo = RecommendationRepository(recs)
+    # Dashboard counters, kept up to date by client_changed/recommendation_changed
+    summary = DatasetSummary(client_store, portfolios, recommendation_repo)
+    serialized_cache.clear()
+    compressed_bodies.clear()
+    search_cache.clear()
+    generic_recommendations.clear()
+    # Versions start at the log position the dataset reflects
+    versions = VersionRegistry(storage.epoch, storage.change_seq())
+
+# How often workers look for a newly written dataset snapshot
+SNAPSHOT_CHECK_SECONDS = 1.0
+
+dataset_snapshot = None
+snapshot_checked_at = 0.0
+
+def read_dataset():
+    """`(clients, portfolios, recommendations)` to serve, from the snapshot when one is configured
+
+    Without AIVEST_SNAPSHOT_PATH this is simply the storage backend's
+    dataset. With it, the snapshot is mapped read-only and the storage change
+    log is replayed from where it was taken; a missing, unreadable or stale
+    snapshot is rebuilt from storage first.
+    """
+    global dataset_snapshot
+    path = snapshot.snapshot_path()
+    if path is None:
+        return storage.load(seed_clients, seed_portfolios, seed_recommendations)
+    
+    opened = None
+    if os.path.exists(path):
+        try:
+            opened = snapshot.Snapshot(path)
+        except (OSError, ValueError) as error:
+            log.warning('Ignoring unreadable dataset snapshot: %s', error)
+    if opened is None or not storage.resume(opened.change_seq):
+        log.info('Writing dataset snapshot', extra={'path': path})
+        write_snapshot()
+        opened = snapshot.Snapshot(path)
+        storage.resume(opened.change_seq)
+    dataset_snapshot = opened
+    return opened.clients(), snapshot.Overlay(opened.portfolios), opened.recommendations()
+
+def write_snapshot():
+    """Write the storage backend's current dataset to the snapshot file"""
+    clients, portfolios, recs = storage.load(seed_clients, seed_portfolios, seed_recommendations)
+    snapshot.write(snapshot.snapshot_path(), clients, portfolios, recs, storage.change_seq())
+
+def snapshot_swapped():
+    """True (at most once per SNAPSHOT_CHECK_SECONDS) when a new snapshot replaced ours"""
+    global snapshot_checked_at
+    if dataset_snapshot is None:
+        return False
+    now = time.monotonic()
+    if now - snapshot_checked_at < SNAPSHOT_CHECK_SECONDS:
+        return False
+    snapshot_checked_at = now
+    return not dataset_snapshot.is_current()
+
+def sync_storage():
+    """Apply mutations other workers committed to shared storage
+
+    Only one thread syncs at a time; the others go ahead without waiting, as
+    they would have if their request had arrived a moment earlier.
+    """
+    if not write_lock.acquire(blocking=False):
+        return
+    try:
+        apply_storage_changes()
+    finally:
+        write_lock.release()
+
+def apply_storage_changes():
+    """Reload on a new snapshot or a lost change log position, else apply the pending changes"""
+    if snapshot_swapped():
+        log.info('Dataset snapshot replaced, reloading dataset')
+        load_dataset(*read_dataset())
+        change_feed.publish('resync', {'reason': 'snapshot'})
+    changes = storage.pull_changes()
+    if changes is None:
+        log.warning('Fell behind the storage change log, reloading dataset')
+        load_dataset(*read_dataset())
+        change_feed.publish('resync', {'reason': 'reload'})
+        return
+    for seq, entity, op, key, doc, own in changes:
+        if own:
+            own_change_logged(seq, entity, key, doc)
+        elif entity == 'client' and op == 'insert':
+            if key not in client_store:
+                client_changed(client_store.add(doc), 'created', seq=seq)
+        elif entity == 'client' and op == 'delete':
+            removed = client_store.remove(key)
+            if removed is not None:
+                client_changed(removed, 'deleted', seq=seq)
+        elif entity == 'recommendation':
+            stored, previous_status = recommendation_repo.upsert(doc)
+            recommendation_changed(stored, previous_status, seq)
+
+def own_change_logged(seq, entity, key, doc):
+    """Settle the versions of this worker's write, which the change log has at `seq`"""
+    if entity == 'client':
+        versions.logged(client_resources(key), seq)
+        return
+    stored = recommendation_repo.get(key)
+    if stored is None or any(stored.get(field) != value for field, value in doc.items()):
+        # Another worker's earlier write to it was pulled after ours; the log puts ours last
+        stored, previous_status = recommendation_repo.upsert(doc)
+        recommendation_changed(stored, previous_status, seq)
+    versions.logged(recommendation_resources(doc), seq)
+
+# In-memory indexes, loaded from the storage backend (AIVEST_STORAGE=memory|sqlite)
+storage = open_storage()
+load_dataset(*read_dataset())
+log.info('Dataset loaded', extra={'storage': storage.name, 'clients': len(client_store),
+                                  'snapshot': dataset_snapshot.path if dataset_snapshot else None})
+
+# Dataset size gauges, read from the maintained aggregates at scrape time
+metrics.registry.gauge_callback('aivest_clients', 'Clients in the store', lambda: summary.clients)
+metrics.registry.gauge_callback('aivest_portfolios', 'Clients with a portfolio', lambda: summary.portfolios)
+metrics.registry.gauge_callback('aivest_recommendations', 'Recommendations shown, by status',
+                                lambda: {(status,): count for status, count in
+                                         summary.as_dict()['recommendations']['byStatus'].items()},
+                                ('status',))
+metrics.registry.gauge_callback('aivest_stream_subscribers', 'Open /api/stream connections', lambda: len(change_feed))
+metrics.registry.gauge_callback('aivest_serialized_cache_entries', 'Pre-encoded bodies cached',
+                                lambda: len(serialized_cache))
+metrics.registry.gauge_callback('aivest_compressed_cache_bytes', 'Compressed response bodies cached',
+                                lambda: compressed_bodies.bytes)
+metrics.registry.gauge_callback('aivest_search_cache_entries', 'Search results cached', lambda: len(search_cache))
+metrics.registry.counter_callback('aivest_search_cache_hits_total', 'Searches answered from the result cache',
+                                  lambda: search_cache.hits)
+metrics.registry.counter_callback('aivest_search_cache_misses_total', 'Searches computed from the indexes',
+                                  lambda: search_cache.misses)
+
 @app.before_request
 def log_request_info():
-    """Enhanced request logging middleware - matching Express style"""
+    """Start request logging: sampling decision, timing and request details"""
+    route = request.url_rule.rule if request.url_rule else request.path
+    begin_request(route)
     if request.path.startswith('/api'):
-        print(f'\n📨 [{datetime.now().isoformat()}] {request.method} {request.path}')
-        print(f'   🔗 Origin: {request.headers.get("Origin", "None")}')
-        print(f'   🌐 User-Agent: {request.headers.get("User-Agent", "")[:100]}...')
-        if request.get_json(silent=True):
-            print(f'   📋 Body size: {len(str(request.get_json()))} chars')
+        # Metrics are labelled by route template; unmatched paths share one label
+        request.environ['aivest.route'] = route if request.url_rule else 'unmatched'
+        metrics.request_started(request.environ['aivest.route'])
+        request.environ['aivest.start'] = time.perf_counter()
+        sync_storage()
+        log.debug('%s %s origin=%s body=%s bytes', request.method, request.path,
+                  request.headers.get('Origin'), request.content_length or 0)
 
 @app.after_request
 def log_response_info(response):
-    """Log response information"""
-    if request.path.startswith('/api'):
-        print(f'   ✅ Response {response.status_code} sent')
-        print(f'   📊 Content-Length: {response.content_length or "unknown"}')
+    """Emit one structured access-log record per API response"""
+    started = request.environ.get('aivest.start')
+    if started is not None:
+        duration = time.perf_counter() - started
+        metrics.observe_request(request.method, request.environ['aivest.route'], response.status_code,
+                                duration, None if response.is_streamed else response.content_length)
+        log.info('%s %s %s', request.method, request.path, response.status_code, extra={
+            'status': response.status_code,
+            'bytes': response.content_length,
+            'duration_ms': round(duration * 1000, 3),
+        })
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress API responses for clients that accept gzip/brotli (see compression.py)
+
+    Registered after the access log hook so it runs first and the log and
+    metrics record the bytes actually sent.
+    """
+    if not request.path.startswith('/api') or 'Content-Encoding' in response.headers:
+        return response
+    if response.status_code in (204, 206, 304) or not compression.compressible(response.content_type):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compression.choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        response.response = compression.compress_chunks(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < compression.MIN_BYTES:
+            return response
+        etag = response.headers.get('ETag')
+        if etag is not None:
+            query = request.query_string.decode('latin-1')
+            url = request.path + (f'?{query}' if query else '')
+            body = compressed_bodies.compress(url, etag, body, encoding)
+        else:
+            body = compression.compress(body, encoding)
+        response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if 'ETag' in response.headers:
+        response.headers['ETag'] = compression.weak_etag(response.headers['ETag'])
     return response
 
-# API Routes - exact copies from Express
+@app.teardown_request
+def finish_request(error=None):
+    """Drop the in-flight count, also for requests that raised"""
+    route = request.environ.pop('aivest.route', None)
+    if route is not None:
+        metrics.request_finished(route)
+
+def wants_ndjson():
+    """True when the caller asked for a streamed NDJSON listing"""
+    if request.args.get('format') == 'ndjson':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+def client_listing_response(search=None):
+    """Respond with clients from the store, honouring limit/cursor/format
+
+    Without `limit` or `cursor` the whole result is returned as one JSON
+    array, as the frontend has always expected. With them, one page is
+    returned and `X-Next-Cursor` carries the token for the next page. NDJSON
+    requests are streamed page by page from a generator. `search` (a
+    SearchParams) filters and orders the listing; without it clients come
+    in store order.
+    """
+    sort_by, reverse = (search.sort_by, search.reverse) if search else (None, False)
+    scope = listing_scope(sort_by, reverse)
+    try:
+        limit, after = parse_page_args(request.args, scope)
+    except ValueError as error:
+        log.warning('Invalid pagination parameters: %s', error)
+        return jsonify({'error': 'Invalid pagination parameters', 'details': str(error)}), 400
+    
+    ndjson = wants_ndjson()
+    etag = listing_etag(ndjson)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    if ndjson:
+        log.debug('Streaming NDJSON listing (limit=%s)', limit)
+        response = Response(stream_clients(sort_by, reverse, search_filters(search), after, limit),
+                            mimetype='application/x-ndjson')
+        return with_etag(response, etag)
+    
+    body, next_cursor = client_page(scope, search, limit, after)
+    response = json_body(body)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return with_etag(response, etag)
+
+# Request-agnostic pieces of the listing, search and recommendation routes,
+# shared with the ASGI front end in asgi.py
+
+def listing_scope(sort_by, reverse):
+    """Name of a listing's ordering, as carried in its cursors"""
+    if sort_by is None:
+        return 'store'
+    return f'{client_store.resolve_sort(sort_by)}:{"desc" if reverse else "asc"}'
+
+def parse_page_args(args, scope):
+    """`(limit, after)` from limit/cursor query args; raises ValueError"""
+    limit = pagination.parse_limit(args.get('limit'))
+    after = pagination.decode_cursor(args.get('cursor'), scope)
+    return limit, after
+
+def listing_etag(ndjson):
+    """ETag for any listing of the client collection"""
+    return versions.collection_etag('ndjson' if ndjson else '')
+
+def client_page(scope, search, limit, after):
+    """Encoded `(body, next_cursor)` for one page, or the whole result when unpaged
+
+    Search results are served from search_cache for as long as the client
+    collection is unchanged.
+    """
+    if search is not None:
+        key = (search, limit, after)
+        version = versions.collection_etag()
+        cached = search_cache.get(key, version)
+        if cached is not None:
+            log.debug('Search result from cache')
+            return cached
+    
+    sort_by, reverse = (search.sort_by, search.reverse) if search else (None, False)
+    filters = search_filters(search)
+    if limit is None and after is None:
+        records, _ = client_store.query(sort_by, reverse, **filters)
+        log.debug('Returning %d clients', len(records))
+        next_cursor = None
+    else:
+        records, next_after = client_store.query(sort_by, reverse, after=after,
+                                                 limit=limit or pagination.MAX_PAGE_SIZE, **filters)
+        log.debug('Returning page of %d clients (more: %s)', len(records), next_after is not None)
+        next_cursor = None if next_after is None else pagination.encode_cursor(scope, next_after)
+    
+    body = b'[' + b','.join(client_json(records)) + b']\n'
+    if search is not None:
+        search_cache.put(key, version, (body, next_cursor), len(body))
+    return body, next_cursor
+
+def client_json(records):
+    """Encoded JSON of each client record, reused from serialized_cache"""
+    return serialized_cache.get_many([('client', record.id) for record in records], records)
+
+def stream_clients(sort_by, reverse, filters, after, limit):
+    """Yield JSON lines, one client per line, a block per chunk fetched from the store
+
+    Whole blocks keep the number of socket writes (and compression flushes)
+    per response small.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = pagination.STREAM_CHUNK_SIZE if remaining is None else min(remaining, pagination.STREAM_CHUNK_SIZE)
+        records, after = client_store.query(sort_by, reverse, after=after, limit=chunk, **filters)
+        if records:
+            yield b'\n'.join(client_json(records)) + b'\n'
+        if remaining is not None:
+            remaining -= len(records)
+        if after is None:
+            return
+
+# API Routes (same paths and JSON shapes as the original Express server)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    print('💓 Health check requested')
-    print('   🏥 Server status: healthy')
-    print('   📊 Memory usage: normal')
-    return jsonify({
+    return jsonify(health_status())
+
+def health_status():
+    """Liveness details with measured uptime, memory and load"""
+    rss = metrics.rss_bytes()
+    return {
         'status': 'ok',
         'service': 'AIVest Banking API',
         'version': '1.0.0',
         'timestamp': datetime.now().isoformat(),
-        'uptime': 'running'
-    })
+        'uptime': round(metrics.uptime_seconds(), 3),
+        'pid': os.getpid(),
+        'memory': {
+            'rssBytes': rss,
+            'peakRssBytes': max(rss, metrics.peak_rss_bytes()),
+        },
+        'requestsInFlight': sum(value for _, _, value in metrics.requests_in_flight.collect()),
+        'clients': summary.clients,
+        'storage': storage.name,
+    }
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of request, dataset and process metrics"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/api/clients', methods=['GET'])
 def get_clients():
-    """Get all clients - exact copy from Express"""
-    print('📋 GET /api/clients - Fetching all clients')
-    print(f'   📊 Total clients in memory: {len(clients)}')
+    """All clients, or one page with limit/cursor; JSON or NDJSON, with an ETag"""
+    log.debug('Fetching all clients (%d in memory)', len(client_store))
     
     try:
-        print('   ✅ Sending client list response')
-        print(f'   📤 Response size: {len(clients)} clients')
-        return jsonify(clients)
-    except Exception as error:
-        print(f'   ❌ Error sending clients: {error}')
+        return client_listing_response()
+    except Exception:
+        log.exception('Error sending clients')
         return jsonify({'error': 'Failed to fetch clients'}), 500
 
 @app.route('/api/clients/search', methods=['GET'])
 def search_clients():
-    """Search clients with filters - exact copy from Express"""
-    print('🔍 GET /api/clients/search - Search request')
-    
-    # Get query parameters
-    q = request.args.get('q', '').lower().strip()
-    min_aum = request.args.get('minAUM')
-    max_aum = request.args.get('maxAUM')
-    segments = request.args.getlist('segments')
-    domiciles = request.args.getlist('domiciles')
-    risk_profiles = request.args.getlist('riskProfiles')
-    sort_by = request.args.get('sortBy', 'name')
-    sort_order = request.args.get('sortOrder', 'asc')
-    
-    print(f'   🔍 Search text: "{q}"')
-    print(f'   💰 AUM range: {min_aum} - {max_aum}')
-    print(f'   📊 Filters: segments={segments}, domiciles={domiciles}, risk={risk_profiles}')
-    print(f'   📈 Sort: {sort_by} {sort_order}')
-    
-    filtered = clients.copy()
-    initial_count = len(filtered)
-    
-    # Text search
+    """Clients matching text and category filters, sorted and paged like the listing"""
+    return client_listing_response(search_params(request.args))
+
+def search_params(args):
+    """Normalized SearchParams for search query args
+
+    List filters are order- and duplicate-insensitive and an unknown sortBy
+    means name, as in the store, so equivalent searches share a cache entry.
+    """
+    min_aum = args.get('minAUM')
+    max_aum = args.get('maxAUM')
+    search = SearchParams(
+        q=args.get('q', '').lower().strip(),
+        segments=tuple(sorted(set(args.getlist('segments')))),
+        domiciles=tuple(sorted(set(args.getlist('domiciles')))),
+        risk_profiles=tuple(sorted(set(args.getlist('riskProfiles')))),
+        sort_by=client_store.resolve_sort(args.get('sortBy', 'name')),
+        reverse=args.get('sortOrder', 'asc') == 'desc',
+        min_aum=float(min_aum) if min_aum else None,
+        max_aum=float(max_aum) if max_aum else None,
+    )
+    log.debug('Search %s', search)
+    return search
+
+def search_filters(search):
+    """Turn a search into `client_store.query` filters ({} for the plain listing)
+
+    Text, segment, domicile and risk profile filters are resolved to a set of
+    candidate ids here; AUM range, sorting and paging are left to the sorted
+    indexes.
+    """
+    if search is None:
+        return {}
+    q, segments, domiciles, risk_profiles = search.q, search.segments, search.domiciles, search.risk_profiles
+    
+    # Text, segment, domicile and risk profile filters come straight from the indexes
+    candidate_ids = None
     if q:
-        filtered = [c for c in filtered if (
-            q in c['name'].lower() or
-            any(q in s.lower() for s in c['segments']) or
-            q in c['description'].lower() or
-            q in c['domicile'].lower() or
-            q in c['riskProfile'].lower()
-        )]
-        print(f'   📝 Text filter: {initial_count} → {len(filtered)} clients')
-    
-    # AUM range filter
-    if min_aum:
-        filtered = [c for c in filtered if c['aum'] >= float(min_aum)]
-        print(f'   💰 Min AUM filter: → {len(filtered)} clients')
-    if max_aum:
-        filtered = [c for c in filtered if c['aum'] <= float(max_aum)]
-        print(f'   💰 Max AUM filter: → {len(filtered)} clients')
-    
-    # Segments filter
+        candidate_ids = client_store.ids_matching_text(q)
+        log.debug('Text filter: %d -> %d clients', len(client_store), len(candidate_ids))
     if segments:
-        filtered = [c for c in filtered if any(seg in c['segments'] for seg in segments)]
-        print(f'   🏷️ Segments filter: → {len(filtered)} clients')
-    
-    # Domiciles filter
+        matches = client_store.ids_by_segment(segments)
+        candidate_ids = matches if candidate_ids is None else candidate_ids & matches
+        log.debug('Segments filter: -> %d clients', len(candidate_ids))
     if domiciles:
-        filtered = [c for c in filtered if c['domicile'] in domiciles]
-        print(f'   🌍 Domiciles filter: → {len(filtered)} clients')
-    
-    # Risk profiles filter
+        matches = client_store.ids_by_domicile(domiciles)
+        candidate_ids = matches if candidate_ids is None else candidate_ids & matches
+        log.debug('Domiciles filter: -> %d clients', len(candidate_ids))
     if risk_profiles:
-        filtered = [c for c in filtered if c['riskProfile'] in risk_profiles]
-        print(f'   ⚖️ Risk profiles filter: → {len(filtered)} clients')
-    
-    # Sorting
-    reverse = sort_order == 'desc'
-    if sort_by == 'aum':
-        filtered.sort(key=lambda x: x['aum'], reverse=reverse)
-    elif sort_by == 'domicile':
-        filtered.sort(key=lambda x: x['domicile'], reverse=reverse)
-    elif sort_by == 'riskProfile':
-        filtered.sort(key=lambda x: x['riskProfile'], reverse=reverse)
-    else:  # name
-        filtered.sort(key=lambda x: x['name'].lower(), reverse=reverse)
-    
-    print(f'   📊 Final result: {len(filtered)} clients (sorted by {sort_by} {sort_order})')
-    return jsonify(filtered)
+        matches = client_store.ids_by_risk_profile(risk_profiles)
+        candidate_ids = matches if candidate_ids is None else candidate_ids & matches
+        log.debug('Risk profiles filter: -> %d clients', len(candidate_ids))
+    
+    return {
+        'candidate_ids': candidate_ids,
+        'min_aum': search.min_aum,
+        'max_aum': search.max_aum,
+    }
 
 @app.route('/api/clients/<client_id>', methods=['GET'])
 def get_client(client_id):
-    """Get specific client - exact copy from Express"""
-    print(f'👤 GET /api/clients/{client_id} - Fetching client details')
+    """One client, served from its cached encoding; 304 when the ETag still matches"""
+    etag = versions.etag('client', client_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
-    client = next((c for c in clients if c['id'] == client_id), None)
+    client = client_store.get(client_id)
     
     if not client:
-        print(f'   ❌ Client not found: {client_id}')
+        log.debug('Client not found: %s', client_id)
         return jsonify({'error': 'Client not found', 'id': client_id}), 404
     
-    print(f'   ✅ Client found: {client["name"]} (AUM: ${client["aum"]}M)')
-    return jsonify(client)
+    return with_etag(json_body(serialized_cache.get(('client', client_id), client)), etag)
 
 @app.route('/api/clients', methods=['POST'])
 def create_client():
-    """Create new client - exact copy from Express"""
-    print('=== Creating new client ===')
-    data = request.get_json()
-    print(f'📝 Request body: {json.dumps(data, indent=2)}')
+    """Validate and store a new client, then index it and publish client.created"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        log.warning('Client validation failed - body is not a JSON object')
+        return jsonify({'error': 'Invalid data format', 'details': 'Expected a JSON object'}), 400
     
     # Validation
-    required_fields = ['name', 'phone', 'aum', 'domicile', 'riskProfile']
-    missing_fields = [field for field in required_fields if field not in data or not data[field]]
+    missing_fields = client_import.missing_fields(data)
     
     if missing_fields:
-        print(f'❌ Validation failed - missing required fields: {missing_fields}')
+        log.warning('Client validation failed - missing required fields: %s', missing_fields)
         return jsonify({
             'error': 'Missing required fields',
-            'required': required_fields,
+            'required': client_import.REQUIRED_FIELDS,
             'missing': missing_fields
         }), 400
     
     try:
-        # Generate new ID
-        existing_ids = [int(c['id'][1:]) for c in clients if c['id'][1:].isdigit()]
-        next_id = max(existing_ids, default=0) + 1
-        new_id = f'c{next_id:03d}'
+        fields = client_import.client_fields(data)
         
-        print(f'🆔 Generated new client ID: {new_id}')
-        
-        # Create new client
-        new_client = {
-            'id': new_id,
-            'name': data['name'].strip(),
-            'phone': data['phone'].strip(),
-            'aum': float(data['aum']),
-            'domicile': data['domicile'].strip(),
-            'segments': data.get('segments', []),
-            'keyContacts': data.get('keyContacts', []),
-            'description': data.get('description', '').strip(),
-            'riskProfile': data['riskProfile'].strip(),
-            'createdAt': datetime.now().isoformat()
-        }
-        
-        clients.append(new_client)
-        print(f'✅ New client created successfully:')
-        print(f'   👤 Name: {new_client["name"]}')
-        print(f'   💰 AUM: ${new_client["aum"]}M')
-        print(f'   🌍 Domicile: {new_client["domicile"]}')
-        print(f'   📊 Total clients: {len(clients)}')
+        with write_lock:
+            # Generate new ID
+            new_id = client_store.next_id(storage.next_client_seq())
+            row = {'id': new_id, **fields}
+            
+            # The store checks the record before changing anything, so it goes first
+            new_client = client_store.add(row)
+            try:
+                storage.insert_client(row)
+            except Exception:
+                client_store.remove(new_id)
+                raise
+            client_changed(new_client, 'created')
+        log.info('Client created', extra={
+            'client_id': new_id,
+            'aum': new_client['aum'],
+            'domicile': new_client['domicile'],
+            'total_clients': len(client_store),
+        })
         
         return jsonify(new_client), 201
         
     except ValueError as e:
-        print(f'❌ Validation error: {e}')
+        log.warning('Client validation error: %s', e)
         return jsonify({'error': 'Invalid data format', 'details': str(e)}), 400
     except Exception as error:
-        print(f'❌ Error creating client: {error}')
+        log.exception('Error creating client')
         return jsonify({'error': 'Internal server error', 'details': str(error)}), 500
 
-@app.route('/api/clients/<client_id>', methods=['DELETE'])
-def delete_client(client_id):
-    """Delete client - exact copy from Express"""
-    print('=== Deleting client ===')
-    print(f'🗑️ Client ID: {client_id}')
+@app.route('/api/clients/bulk', methods=['POST'])
+def bulk_import_clients():
+    """Create clients from a streamed NDJSON or CSV body
+
+    Rows are validated and inserted a chunk at a time, ids come from one
+    sequence allocation per chunk, and the response reports how many rows
+    were created plus the row number and reason for each rejected one.
+    """
+    try:
+        rows = client_import.read_rows(request.stream, request.mimetype)
+    except ValueError as error:
+        log.warning('Bulk import rejected: %s', error)
+        return jsonify({'error': 'Unsupported Media Type', 'details': str(error)}), 415
     
-    global clients
-    client_index = next((i for i, c in enumerate(clients) if c['id'] == client_id), -1)
+    report = client_import.ImportReport()
+    try:
+        for chunk in client_import.chunks(rows):
+            valid = []
+            valid_rows = []
+            for row, data, error in chunk:
+                if error is None:
+                    try:
+                        valid.append(client_import.client_fields(data))
+                        valid_rows.append(row)
+                    except ValueError as invalid:
+                        error = str(invalid)
+                if error is not None:
+                    report.add_error(row, error)
+            try:
+                report.add_created(import_clients(valid))
+            except Exception as failure:
+                # Nothing from this chunk was kept; report its rows and go on with the next
+                log.exception('Bulk import chunk of %d rows failed', len(valid))
+                for row in valid_rows:
+                    report.add_error(row, f'Not imported: {failure}')
+    except UnicodeDecodeError as error:
+        log.warning('Bulk import aborted: %s', error)
+        return jsonify({'error': 'Body is not valid UTF-8', 'details': str(error), **report.as_dict()}), 400
     
-    if client_index == -1:
-        print('❌ Client not found')
-        return jsonify({'error': 'Client not found'}), 404
+    log.info('Bulk import finished', extra={
+        'created': report.created,
+        'failed': report.failed,
+        'total_clients': len(client_store),
+    })
+    status = 201 if report.created else 400 if report.failed else 200
+    return jsonify(report.as_dict()), status
+
+def import_clients(fields_list):
+    """Assign ids to validated client fields, then persist and index them as one batch"""
+    if not fields_list:
+        return []
+    with write_lock:
+        ids = client_store.next_ids(len(fields_list), storage.next_client_seqs(len(fields_list)))
+        rows = [{'id': client_id, **fields} for client_id, fields in zip(ids, fields_list)]
+        # Either call fails without a partial write, and the store checks every row first
+        records = client_store.add_many(rows)
+        try:
+            storage.insert_clients(rows)
+        except Exception:
+            for record in records:
+                client_store.remove(record['id'])
+            raise
+        # One feed event per batch rather than one per client
+        for record in records:
+            client_changed(record, 'created', publish=False)
+    change_feed.publish('clients.imported', {
+        'count': len(records),
+        'firstId': records[0]['id'],
+        'lastId': records[-1]['id'],
+    })
+    return records
+
+BATCH_INCLUDES = ('client', 'portfolio', 'recommendations')
+
+@app.route('/api/clients/batch', methods=['POST'])
+def batch_fetch_clients():
+    """Clients with their portfolios and/or recommendations in one response
+
+    Body: {"ids": [...], "include": ["client", "portfolio", "recommendations"],
+    "status": "pending"}. Results follow the order of `ids`; unknown ids are
+    listed under `missing`. Client and portfolio bodies come straight from
+    the serialized cache, so the response is assembled from encoded bytes.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    ids = data.get('ids')
+    include = data.get('include') or list(BATCH_INCLUDES)
+    status = data.get('status')
+    
+    if not isinstance(ids, list) or not all(isinstance(client_id, str) for client_id in ids):
+        return jsonify({'error': 'ids must be a list of client ids'}), 400
+    if not isinstance(include, list) or not all(isinstance(name, str) for name in include):
+        return jsonify({'error': 'include must be a list', 'allowed': list(BATCH_INCLUDES)}), 400
+    if status is not None and not isinstance(status, str):
+        return jsonify({'error': 'status must be a string'}), 400
+    if len(ids) > pagination.MAX_PAGE_SIZE:
+        return jsonify({'error': f'At most {pagination.MAX_PAGE_SIZE} ids per request'}), 400
+    unknown = [name for name in include if name not in BATCH_INCLUDES]
+    if unknown:
+        return jsonify({'error': 'Unknown include', 'allowed': list(BATCH_INCLUDES), 'unknown': unknown}), 400
+    
+    results = []
+    missing = []
+    for client_id in dict.fromkeys(ids):
+        client = client_store.get(client_id)
+        if not client:
+            missing.append(client_id)
+            continue
+        parts = [b'"id":' + json_codec.dumps(client_id)]
+        if 'client' in include:
+            parts.append(b'"client":' + client_json([client])[0])
+        if 'portfolio' in include:
+            body = portfolio_body(client_id)
+            parts.append(b'"portfolio":' + (body.rstrip() if body is not None else b'null'))
+        if 'recommendations' in include:
+            parts.append(b'"recommendations":' + json_codec.dumps(client_recommendations(client_id, status)))
+        results.append(b'{' + b','.join(parts) + b'}')
     
-    deleted_client = clients.pop(client_index)
-    print(f'✅ Client deleted successfully: {deleted_client["name"]}')
-    print(f'📊 Remaining clients: {len(clients)}')
+    log.debug('Batch fetch of %d clients (%d missing)', len(results), len(missing))
+    body = b'{"results":[' + b','.join(results) + b'],"missing":' + json_codec.dumps(missing) + b'}\n'
+    return json_body(body)
+
+@app.route('/api/clients/<client_id>', methods=['DELETE'])
+def delete_client(client_id):
+    """Delete a client from storage and the store, then publish client.deleted"""
+    with write_lock:
+        if client_id not in client_store:
+            log.debug('Client not found: %s', client_id)
+            return jsonify({'error': 'Client not found'}), 404
+        
+        storage.delete_client(client_id)
+        deleted_client = client_store.remove(client_id)
+        
+        client_changed(deleted_client, 'deleted')
+    log.info('Client deleted', extra={'client_id': client_id, 'total_clients': len(client_store)})
     
     return jsonify({
         'message': 'Client deleted successfully',
@@ -451,219 +996,235 @@ def delete_client(client_id):
 
 @app.route('/api/clients/<client_id>/portfolio', methods=['GET'])
 def get_portfolio(client_id):
-    """Get client portfolio - exact copy from Express"""
-    print(f'💼 GET /api/clients/{client_id}/portfolio - Fetching portfolio')
+    """A client's portfolio, with an ETag"""
+    etag = versions.etag('portfolio', client_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
-    portfolio = portfolio_data.get(client_id)
-    if not portfolio:
-        print(f'   ❌ Portfolio not found for client: {client_id}')
+    body = portfolio_body(client_id)
+    if body is None:
+        log.debug('Portfolio not found for client: %s', client_id)
         return jsonify({'error': 'Portfolio not found'}), 404
     
-    print(f'   ✅ Portfolio found: ${portfolio["totalValue"]}M total value')
-    print(f'   📊 Allocations: {len(portfolio["allocations"])} asset classes')
-    return jsonify(portfolio)
+    return with_etag(json_body(body), etag)
 
 @app.route('/api/clients/<client_id>/recommendations', methods=['GET'])
 def get_recommendations(client_id):
-    """Get client recommendations - exact copy from Express"""
-    print(f'🤖 GET /api/clients/{client_id}/recommendations')
-    print(f'   🔍 Looking for recommendations for client: {client_id}')
-    
-    # Find static recommendations for this client
-    client_recs = [rec for rec in recommendations if rec['clientId'] == client_id]
-    print(f'   📊 Found static recommendations: {len(client_recs)}')
+    """A client's recommendations (static, actioned or generic), optionally by status"""
+    etag = versions.etag('recommendations', client_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
+    # Optional ?status=pending etc., answered from the status index
+    client_recs = client_recommendations(client_id, request.args.get('status'))
+    if client_recs is None:
+        log.debug('Client not found: %s', client_id)
+        return jsonify({'error': 'Client not found'}), 404
+    return with_etag(jsonify(client_recs), etag)
+
+def client_recommendations(client_id, status=None):
+    """A client's recommendations, optionally with one status; None for an unknown client"""
     # If no static recommendations exist, generate generic ones
-    if not client_recs:
-        print('   🔄 No static recommendations found, generating generic ones')
-        client = next((c for c in clients if c['id'] == client_id), None)
-        if client:
-            generic_recs = generate_generic_recommendations(client)
-            print(f'   ✅ Generated {len(generic_recs)} generic recommendations')
-            print(f'   📋 Recommendations: {[r["title"] for r in generic_recs]}')
-            return jsonify(generic_recs)
-        else:
-            print(f'   ❌ Client not found: {client_id}')
-            return jsonify({'error': 'Client not found'}), 404
+    if not recommendation_repo.has_client(client_id):
+        client = client_store.get(client_id)
+        if not client:
+            return None
+        generic_recs = generate_generic_recommendations(client)
+        if status:
+            generic_recs = [r for r in generic_recs if r['status'] == status]
+        return generic_recs
     
-    print(f'   ✅ Returning {len(client_recs)} static recommendations')
-    return jsonify(client_recs)
+    # Find static recommendations for this client
+    client_recs = recommendation_repo.for_client(client_id, status=status or None)
+    log.debug('Found %d static recommendations for %s', len(client_recs), client_id)
+    return client_recs
 
 def generate_generic_recommendations(client):
-    """Generate generic recommendations based on risk profile - exact copy from Express"""
-    print(f'   🤖 Generating recommendations for {client["name"]} ({client["riskProfile"]})')
-    
-    risk_profile_recommendations = {
-        'Conservative': [{
-            'id': f'rec-{client["id"]}-1',
-            'clientId': client['id'],
-            'type': 'rebalance',
-            'title': 'Annual Portfolio Review',
-            'summary': 'Quarterly rebalancing to maintain conservative allocation targets and ensure capital preservation focus.',
-            'priority': 'Medium',
-            'confidence': 78,
-            'estimatedImpact': '+0.3% stability improvement',
-            'status': 'pending',
-            'createdAt': datetime.now().isoformat()
-        }, {
-            'id': f'rec-{client["id"]}-2',
-            'clientId': client['id'],
-            'type': 'risk_management',
-            'title': 'Bond Duration Adjustment',
-            'summary': 'Consider shortening bond duration given current interest rate environment.',
-            'priority': 'Low',
-            'confidence': 72,
-            'estimatedImpact': '+0.2% yield protection',
-            'status': 'pending',
-            'createdAt': datetime.now().isoformat()
-        }],
-        'Moderate': [{
-            'id': f'rec-{client["id"]}-1',
-            'clientId': client['id'],
-            'type': 'diversify',
-            'title': 'International Diversification',
-            'summary': 'Expand international equity exposure to capture global growth opportunities while managing home country bias.',
-            'priority': 'Medium',
-            'confidence': 82,
-            'estimatedImpact': '+0.7% risk-adjusted returns',
-            'status': 'pending',
-            'createdAt': datetime.now().isoformat()
-        }, {
-            'id': f'rec-{client["id"]}-2',
-            'clientId': client['id'],
-            'type': 'opportunity',
-            'title': 'Alternative Investment Allocation',
-            'summary': 'Consider 5-10% allocation to REITs or commodities for inflation protection.',
-            'priority': 'Medium',
-            'confidence': 75,
-            'estimatedImpact': '+0.5% inflation hedge',
-            'status': 'pending',
-            'createdAt': datetime.now().isoformat()
-        }],
-        'Aggressive': [{
-            'id': f'rec-{client["id"]}-1',
-            'clientId': client['id'],
-            'type': 'opportunity',
-            'title': 'Growth Sector Concentration',
-            'summary': 'Increase exposure to high-growth technology and healthcare sectors aligned with aggressive risk tolerance.',
-            'priority': 'High',
-            'confidence': 75,
-            'estimatedImpact': '+1.2% upside potential',
-            'status': 'pending',
-            'createdAt': datetime.now().isoformat()
-        }, {
-            'id': f'rec-{client["id"]}-2',
-            'clientId': client['id'],
-            'type': 'rebalance',
-            'title': 'Emerging Markets Exposure',
-            'summary': 'Consider adding emerging markets equity exposure for enhanced growth potential.',
-            'priority': 'Medium',
-            'confidence': 68,
-            'estimatedImpact': '+1.0% growth acceleration',
-            'status': 'pending',
-            'createdAt': datetime.now().isoformat()
-        }]
-    }
-    
-    recommendations = risk_profile_recommendations.get(client['riskProfile'], risk_profile_recommendations['Moderate'])
-    print(f'   📋 Generated {len(recommendations)} recommendations for {client["riskProfile"]} profile')
-    return recommendations
+    """Generic recommendations based on risk profile, cached per client"""
+    return generic_recommendations.for_client(client)
+
+def find_generic_recommendation(rec_id):
+    """Resolve a generic recommendation id (rec-c001-1, rec-c002-2, ...), or None"""
+    generic_match = re.match(r'^rec-(.+)-(\d+)$', rec_id)
+    if not generic_match:
+        return None
+    client = client_store.get(generic_match.group(1))
+    if not client:
+        return None
+    rec = generic_recommendations.get(client, int(generic_match.group(2)))
+    return rec if rec and rec['id'] == rec_id else None
 
 @app.route('/api/recommendations/<rec_id>/detail', methods=['GET'])
 def get_recommendation_detail(rec_id):
-    """Get recommendation detail - exact copy from Express"""
-    print(f'🔍 GET /api/recommendations/{rec_id}/detail')
-    print(f'   🔍 Looking for recommendation: {rec_id}')
-    
+    """One recommendation, static or generic, with an ETag"""
     # Check static recommendations first
-    rec = next((r for r in recommendations if r['id'] == rec_id), None)
+    rec = recommendation_repo.get(rec_id)
     if rec:
-        print('   ✅ Found in static recommendations')
-        print(f'   📋 Recommendation: {rec["title"]}')
-        return jsonify(rec)
+        return recommendation_detail_response(rec)
     
     # Check for generic recommendation pattern (rec-c001-1, rec-c002-2, etc.)
-    generic_match = re.match(r'^rec-(.+)-(\d+)$', rec_id)
-    if generic_match:
-        client_id = generic_match.group(1)
-        rec_number = generic_match.group(2)
-        print(f'   🔄 Generic recommendation detected for client: {client_id}, number: {rec_number}')
-        
-        client = next((c for c in clients if c['id'] == client_id), None)
-        if client:
-            generic_recs = generate_generic_recommendations(client)
-            matching_rec = next((r for r in generic_recs if r['id'] == rec_id), None)
-            if matching_rec:
-                print('   ✅ Generated generic recommendation found')
-                print(f'   📋 Recommendation: {matching_rec["title"]}')
-                return jsonify(matching_rec)
-    
-    print('   ❌ Recommendation not found')
+    matching_rec = find_generic_recommendation(rec_id)
+    if matching_rec:
+        return recommendation_detail_response(matching_rec)
+    
+    log.debug('Recommendation not found: %s', rec_id)
     return jsonify({'error': 'Recommendation not found'}), 404
 
+def recommendation_detail_response(rec):
+    """Conditional response for one recommendation, versioned with its client's set"""
+    etag = f'{versions.etag("recommendations", rec["clientId"])}-{rec["id"]}'
+    return not_modified(etag) or with_etag(jsonify(rec), etag)
+
 @app.route('/api/recommendations/<rec_id>/action', methods=['POST'])
 def handle_recommendation_action(rec_id):
-    """Handle recommendation action (approve/reject) - exact copy from Express"""
-    print(f'⚡ POST /api/recommendations/{rec_id}/action')
+    """Approve or reject a recommendation, persist it and publish recommendation.updated"""
     data = request.get_json()
-    print(f'   📝 Action data: {data}')
     
     action = data.get('action')  # 'approved' or 'rejected'
     notes = data.get('notes', '')
     
     if action not in ['approved', 'rejected']:
-        print(f'   ❌ Invalid action: {action}')
+        log.warning('Invalid recommendation action: %r', action)
         return jsonify({'error': 'Invalid action. Must be "approved" or "rejected"'}), 400
     
-    print(f'   🎯 Action: {action}')
-    print(f'   📝 Notes: {notes[:100]}...' if len(notes) > 100 else f'   📝 Notes: {notes}')
-    
-    # Find in static recommendations first
-    rec_index = next((i for i, r in enumerate(recommendations) if r['id'] == rec_id), -1)
-    
-    if rec_index != -1:
-        print('   ✅ Found in static recommendations, updating')
-        recommendations[rec_index].update({
-            'status': action,
-            'actionDate': datetime.now().isoformat(),
-            'notes': notes
+    # Static (or previously actioned) recommendations first, then generic ones,
+    # which are persisted to the repository on their first action
+    with write_lock:
+        matching_rec = recommendation_repo.get(rec_id) or find_generic_recommendation(rec_id)
+        if matching_rec:
+            updated_rec = {
+                **matching_rec,
+                'status': action,
+                'actionDate': datetime.now().isoformat(),
+                'notes': notes
+            }
+            storage.upsert_recommendation(updated_rec)
+            updated_rec, previous_status = recommendation_repo.upsert(updated_rec)
+            recommendation_changed(updated_rec, previous_status)
+    if matching_rec:
+        log.info('Recommendation %s', action, extra={
+            'rec_id': rec_id,
+            'previous_status': previous_status,
+            'total_recommendations': len(recommendation_repo),
         })
-        print(f'   ✅ Static recommendation updated: {recommendations[rec_index]["title"]}')
-        return jsonify({'success': True, 'recommendation': recommendations[rec_index]})
+        return jsonify({'success': True, 'recommendation': updated_rec})
     
-    # Handle generic recommendation
-    generic_match = re.match(r'^rec-(.+)-(\d+)$', rec_id)
-    if generic_match:
-        client_id = generic_match.group(1)
-        print(f'   🔄 Generic recommendation action for client: {client_id}')
-        
-        client = next((c for c in clients if c['id'] == client_id), None)
-        if client:
-            generic_recs = generate_generic_recommendations(client)
-            matching_rec = next((r for r in generic_recs if r['id'] == rec_id), None)
-            if matching_rec:
-                # Update the recommendation and save it to static array for persistence
-                updated_rec = {
-                    **matching_rec,
-                    'status': action,
-                    'actionDate': datetime.now().isoformat(),
-                    'notes': notes
-                }
-                recommendations.append(updated_rec)
-                print('   ✅ Generic recommendation updated and saved to static array')
-                print(f'   📊 Total recommendations now: {len(recommendations)}')
-                return jsonify({'success': True, 'recommendation': updated_rec})
-    
-    print('   ❌ Recommendation not found')
+    log.debug('Recommendation not found: %s', rec_id)
     return jsonify({'error': 'Recommendation not found'}), 404
 
-# Debug endpoints - exact copies from Express
+@app.route('/api/stream', methods=['GET'])
+def stream_changes():
+    """Server-sent events for client and recommendation changes
+
+    Holds a request thread for as long as the dashboard stays connected;
+    under AIVEST_SERVER_MODE=asgi the same stream is served from the event
+    loop. A single-threaded worker would serve nothing else meanwhile, and
+    a threaded one keeps only MAX_STREAMS threads for streams, so beyond
+    that the dashboard is told to poll instead.
+    """
+    if not request.environ.get('wsgi.multithread'):
+        log.warning('Refusing /api/stream on a single-threaded worker; set AIVEST_THREADS or use asgi mode')
+        return stream_unavailable()
+    if not stream_slots.acquire(blocking=False):
+        log.warning('Refusing /api/stream: %d streams already open (AIVEST_MAX_STREAMS)', MAX_STREAMS)
+        return stream_unavailable()
+    response = Response(change_stream(request.headers.get('Last-Event-ID')), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if it never started the body
+    response.call_on_close(stream_slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def stream_unavailable():
+    """503 asking the dashboard to poll the listing instead of streaming"""
+    response = jsonify({
+        'error': 'Change stream unavailable on this server',
+        'poll': {'url': '/api/clients', 'intervalSeconds': STREAM_POLL_SECONDS},
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(STREAM_POLL_SECONDS)
+    return response
+
+def change_stream(last_event_id):
+    """Yield SSE frames from a new subscription, with a heartbeat while idle
+
+    The subscription is opened inside the generator so it is always closed
+    with it. Each idle interval also picks up changes other workers committed
+    to shared storage, so their events reach this worker's subscribers.
+    """
+    subscription = change_feed.subscribe(last_event_id)
+    log.debug('Stream opened (%d subscribers)', len(change_feed))
+    try:
+        yield stream_preamble()
+        while True:
+            frames = subscription.next()
+            if frames:
+                yield b''.join(frames)
+            else:
+                sync_storage()
+                yield HEARTBEAT
+    finally:
+        subscription.close()
+        log.debug('Stream closed (%d events dropped)', subscription.dropped)
+
+@app.route('/api/summary', methods=['GET'])
+def get_summary():
+    """Dashboard summary metrics from the maintained aggregates"""
+    etag = versions.etag('summary', 'book')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return with_etag(jsonify(summary.as_dict()), etag)
+
+# Book-wide analytics over the columnar portfolio store
+
+def analytics_response(name, compute):
+    """Conditional JSON response for an analytics result, 503 without numpy"""
+    if analytics is None:
+        return jsonify({'error': 'Analytics unavailable', 'details': 'numpy is not installed'}), 503
+    # Portfolios only change with the client collection (create/delete/reload)
+    etag = versions.collection_etag(f'analytics-{name}')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    try:
+        result = compute()
+    except ValueError as error:
+        log.warning('Invalid analytics parameters: %s', error)
+        return jsonify({'error': 'Invalid analytics parameters', 'details': str(error)}), 400
+    return with_etag(jsonify(result), etag)
+
+@app.route('/api/analytics/allocation', methods=['GET'])
+def analytics_allocation():
+    """Total value by asset class across all portfolios"""
+    return analytics_response('allocation', lambda: analytics.allocation_totals())
+
+@app.route('/api/analytics/risk', methods=['GET'])
+def analytics_risk():
+    """AUM-weighted Sharpe ratio, volatility, max drawdown and beta"""
+    return analytics_response('risk', lambda: analytics.weighted_risk())
+
+@app.route('/api/analytics/distribution', methods=['GET'])
+def analytics_distribution():
+    """Percentiles of a metric by domicile or risk profile
+
+    ?by=domicile|riskProfile&metric=aum|sharpeRatio|...&percentiles=10,50,90
+    """
+    return analytics_response('distribution', lambda: analytics.distribution(
+        request.args.get('by', 'riskProfile'),
+        request.args.get('metric', 'aum'),
+        portfolio_analytics.parse_percentiles(request.args.get('percentiles')),
+    ))
+
+# Debug endpoints
 
 @app.route('/api/debug/cors', methods=['GET'])
 def debug_cors():
     """Debug CORS configuration"""
     origin = request.headers.get('Origin')
-    print(f'🔧 CORS Debug - Origin: {origin}')
+    log.debug('CORS debug - origin: %s', origin)
     return jsonify({
         'status': 'ok',
         'message': 'CORS working correctly',
@@ -687,21 +1248,19 @@ def debug_cors():
 @app.route('/api/debug/network', methods=['GET'])
 def debug_network():
     """Network diagnostic endpoint"""
-    print('🌐 Network diagnostic requested')
     return jsonify({
         'status': 'success',
         'message': 'Network connectivity verified',
         'server': 'Flask/Python',
         'timestamp': datetime.now().isoformat(),
-        'clientsCount': len(clients),
-        'recommendationsCount': len(recommendations),
-        'portfoliosCount': len(portfolio_data)
+        'clientsCount': summary.clients,
+        'recommendationsCount': summary.stored_recommendations,
+        'portfoliosCount': summary.portfolios
     })
 
 @app.route('/api/test', methods=['GET'])
 def test_endpoint():
     """Test endpoint"""
-    print('🧪 Test endpoint accessed')
     return jsonify({
         'status': 'success',
         'message': 'Flask backend server is reachable and working',
@@ -709,20 +1268,44 @@ def test_endpoint():
         'version': '1.0.0'
     })
 
+# Frontend build, indexed once at startup in production and served from memory
+if os.getenv('FLASK_ENV') == 'production' or os.getenv('NODE_ENV') == 'production':
+    frontend_assets = StaticAssets()
+    log.info('Frontend assets indexed', extra={'root': frontend_assets.root, 'files': len(frontend_assets),
+                                                'bytes': frontend_assets.bytes})
+else:
+    frontend_assets = None
+
+def static_response(asset):
+    """A frontend file in the best encoding the client accepts, or 304 when it is unchanged"""
+    encoding, body = asset.negotiate(request.accept_encodings)
+    etag = asset.etag(encoding)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    elif body is None:
+        response = send_file(asset.path, mimetype=asset.content_type, etag=False, conditional=True)
+    else:
+        response = Response(body, content_type=asset.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = asset.cache_control
+    if asset.varies:
+        response.vary.add('Accept-Encoding')
+    return response
+
 # Static file serving for production (React app)
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_spa(path):
     """Serve React app in production"""
-    if os.getenv('FLASK_ENV') == 'production' or os.getenv('NODE_ENV') == 'production':
-        print(f'📁 Serving static file: {path or "index.html"}')
-        static_folder = os.path.join(os.path.dirname(__file__), '../frontend/dist')
-        
-        if path and os.path.exists(os.path.join(static_folder, path)):
-            return send_from_directory(static_folder, path)
-        
-        # Serve index.html for React Router
-        return send_from_directory(static_folder, 'index.html')
+    if frontend_assets is not None:
+        log.debug('Serving static file: %s', path or 'index.html')
+        # Anything that isn't a file of the build gets index.html, for React Router
+        asset = frontend_assets.get(path) or frontend_assets.get('index.html')
+        if asset is None:
+            abort(404)
+        return static_response(asset)
     
     return jsonify({
         'message': 'Development mode - use separate frontend server',
@@ -734,15 +1317,10 @@ if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') != 'production' and os.getenv('NODE_ENV') != 'production'
     
-    print('\n🎉 =================================')
-    print('🚀 AIVest Banking Server Started (Flask)!')
-    print('🎉 =================================')
-    print(f'🌐 Server URL: http://localhost:{port}')
-    print(f'📊 Initial Client Count: {len(clients)}')
-    print(f'🤖 Initial Recommendations: {len(recommendations)}')
-    print(f'💼 Available Portfolios: {len(portfolio_data)}')
-    print(f'⏰ Started at: {datetime.now().isoformat()}')
-    print('🎯 Ready for connections!')
-    print('=================================\n')
+    log.info('AIVest Banking Server started (Flask) at http://localhost:%s', port, extra={
+        'clients': len(client_store),
+        'recommendations': len(recommendation_repo),
+        'portfolios': len(portfolio_data),
+    })
     
     app.run(host='0.0.0.0', port=port, debug=debug)
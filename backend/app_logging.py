@@ -0,0 +1,153 @@
+"""Queue-backed, leveled and sampled structured logging for the API.
+
+Request threads only put log records on an in-memory queue; a background
+QueueListener thread formats them and writes to stdout. Messages use
+%-style arguments, so nothing is formatted unless a record passes the level
+and sampling checks, and formatting itself happens on the writer thread.
+
+Configuration (environment):
+    LOG_LEVEL         minimum level, default INFO in production, DEBUG otherwise
+    LOG_FORMAT        "json" (default in production) or "text"
+    LOG_SAMPLE_RATES  per-route sampling of sub-WARNING records, e.g.
+                      "/api/clients/search=0.1,/api/health=0"
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+ROOT_LOGGER = 'aivest'
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_sampled = contextvars.ContextVar('aivest_log_sampled', default=True)
+_route = contextvars.ContextVar('aivest_log_route', default=None)
+_sample_rates = {}
+_listener = None
+
+
+def get_logger(name):
+    """Logger under the application's root logger"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def begin_request(route):
+    """Make the per-route sampling decision for the current request"""
+    rate = _sample_rates.get(route, 1.0)
+    _route.set(route)
+    _sampled.set(rate >= 1.0 or random.random() < rate)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stdlib handler formats in the calling thread so records can cross
+    process boundaries; ours never leave the process.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _RouteSampler(logging.Filter):
+    """Drop sub-WARNING records for requests that weren't sampled"""
+
+    def filter(self, record):
+        route = _route.get()
+        if route is not None:
+            record.route = route
+        return record.levelno >= logging.WARNING or _sampled.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields at the top level"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable line with `extra=` fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [f'{k}={v}' for k, v in vars(record).items() if k not in _RECORD_ATTRS]
+        return f'{line} {" ".join(fields)}' if fields else line
+
+
+def configure_logging(production=False):
+    """Install the queue handler and start the background writer"""
+    global _listener
+
+    level = os.getenv('LOG_LEVEL', 'INFO' if production else 'DEBUG').upper()
+    formatter = JsonFormatter() if os.getenv('LOG_FORMAT', 'json' if production else 'text') == 'json' else TextFormatter()
+    _sample_rates.clear()
+    _sample_rates.update(_parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', '')))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(_RouteSampler())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    root.propagate = False
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    return root
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork():
+    # Threads don't survive fork (e.g. gunicorn --preload); give the child its own writer
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+def _parse_sample_rates(spec):
+    rates = {}
+    for item in spec.split(','):
+        route, sep, rate = item.strip().rpartition('=')
+        if sep and route:
+            rates[route] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
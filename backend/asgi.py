@@ -0,0 +1,268 @@
+"""ASGI entry point: the read API on an event loop, everything else via Flask.
+
+The polled dashboard reads (health, client listing and search, client
+detail, portfolio, recommendations) are served by async Starlette handlers,
+so one worker process can hold thousands of open connections instead of one
+request per sync worker. Every other route (mutations, debug endpoints, the
+SPA) is passed to the Flask app unchanged through a2wsgi's WSGIMiddleware,
+which runs it in a thread pool.
+
+The /api/stream change feed waits on the event loop too, so an open
+dashboard stream costs a coroutine rather than a worker.
+
+Work that can take more than a few microseconds (storage sync, building a
+listing page, recommendation lookups, compressing a large body) runs in
+Starlette's thread pool so it never stalls the loop; cheap cached reads stay
+on it.
+
+Both front ends share the module-level state in app.py; handlers read it as
+`flask_app.<name>` on every call because `load_dataset` rebinds it.
+
+Select with AIVEST_SERVER_MODE=asgi (see gunicorn.conf.py), or run directly:
+
+    cd backend && uvicorn asgi:app
+"""
+
+import asyncio
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import Accept, MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags
+
+import app as flask_app
+import compression
+import json_codec
+import metrics
+from app_logging import begin_request, get_logger
+from event_bus import HEARTBEAT, stream_preamble
+
+log = get_logger('asgi')
+
+
+def json_response(obj, status=200):
+    return Response(json_codec.dumps(obj) + b'\n', status_code=status, media_type='application/json')
+
+
+def json_body(body, status=200):
+    """Response for an already-encoded JSON body"""
+    return Response(body, status_code=status, media_type='application/json')
+
+
+def not_modified(request, etag):
+    """304 response when the caller already holds `etag`, otherwise None"""
+    if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+        return with_etag(Response(status_code=304), etag)
+    return None
+
+
+def with_etag(response, etag):
+    """Attach a strong ETag and ask clients to revalidate before reuse"""
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def compress_response(request, response):
+    """Compress a response for clients that accept gzip/brotli, as Flask's after_request hook does"""
+    if response.status_code in (204, 206, 304) or 'content-encoding' in response.headers:
+        return response
+    if not compression.compressible(response.headers.get('content-type')):
+        return response
+    response.headers.add_vary_header('Accept-Encoding')
+    encoding = compression.choose_encoding(parse_accept_header(request.headers.get('accept-encoding'), Accept))
+    if encoding is None:
+        return response
+
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = compression.compress_chunks_async(response.body_iterator, encoding)
+    else:
+        if len(response.body) < compression.MIN_BYTES:
+            return response
+        etag = response.headers.get('etag')
+        url = request.url.path + (f'?{request.url.query}' if request.url.query else '')
+        if etag is not None:
+            response.body = flask_app.compressed_bodies.compress(url, etag, response.body, encoding)
+        else:
+            response.body = compression.compress(response.body, encoding)
+        response.headers['content-length'] = str(len(response.body))
+    response.headers['content-encoding'] = encoding
+    if 'etag' in response.headers:
+        response.headers['etag'] = compression.weak_etag(response.headers['etag'])
+    return response
+
+
+def wants_ndjson(request):
+    """True when the caller asked for a streamed NDJSON listing"""
+    if request.query_params.get('format') == 'ndjson':
+        return True
+    accept = parse_accept_header(request.headers.get('accept'), MIMEAccept)
+    return accept.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+
+async def client_listing_response(request, search=None):
+    """Async counterpart of `app.client_listing_response`"""
+    sort_by, reverse = (search.sort_by, search.reverse) if search else (None, False)
+    scope = flask_app.listing_scope(sort_by, reverse)
+    try:
+        limit, after = flask_app.parse_page_args(request.query_params, scope)
+    except ValueError as error:
+        log.warning('Invalid pagination parameters: %s', error)
+        return json_response({'error': 'Invalid pagination parameters', 'details': str(error)}, 400)
+
+    ndjson = wants_ndjson(request)
+    etag = flask_app.listing_etag(ndjson)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    if ndjson:
+        log.debug('Streaming NDJSON listing (limit=%s)', limit)
+        stream = flask_app.stream_clients(sort_by, reverse, flask_app.search_filters(search), after, limit)
+        return with_etag(StreamingResponse(stream, media_type='application/x-ndjson'), etag)
+
+    body, next_cursor = await run_in_threadpool(flask_app.client_page, scope, search, limit, after)
+    response = json_body(body)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return with_etag(response, etag)
+
+
+async def health_check(request):
+    return json_response(flask_app.health_status())
+
+
+async def get_clients(request):
+    try:
+        return await client_listing_response(request)
+    except Exception:
+        log.exception('Error sending clients')
+        return json_response({'error': 'Failed to fetch clients'}, 500)
+
+
+async def search_clients(request):
+    return await client_listing_response(request, flask_app.search_params(request.query_params))
+
+
+async def get_client(request):
+    client_id = request.path_params['client_id']
+    etag = flask_app.versions.etag('client', client_id)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    client = flask_app.client_store.get(client_id)
+    if not client:
+        log.debug('Client not found: %s', client_id)
+        return json_response({'error': 'Client not found', 'id': client_id}, 404)
+    return with_etag(json_body(flask_app.serialized_cache.get(('client', client_id), client)), etag)
+
+
+async def get_portfolio(request):
+    client_id = request.path_params['client_id']
+    etag = flask_app.versions.etag('portfolio', client_id)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    body = flask_app.portfolio_body(client_id)
+    if body is None:
+        log.debug('Portfolio not found for client: %s', client_id)
+        return json_response({'error': 'Portfolio not found'}, 404)
+    return with_etag(json_body(body), etag)
+
+
+async def get_recommendations(request):
+    client_id = request.path_params['client_id']
+    etag = flask_app.versions.etag('recommendations', client_id)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    client_recs = await run_in_threadpool(flask_app.client_recommendations, client_id,
+                                          request.query_params.get('status'))
+    if client_recs is None:
+        log.debug('Client not found: %s', client_id)
+        return json_response({'error': 'Client not found'}, 404)
+    return with_etag(json_response(client_recs), etag)
+
+
+async def stream_changes(request):
+    stream = change_stream(request.headers.get('last-event-id'))
+    response = StreamingResponse(stream, media_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def change_stream(last_event_id):
+    """Async counterpart of `app.change_stream`"""
+    subscription = flask_app.change_feed.subscribe(last_event_id, loop=asyncio.get_running_loop())
+    log.debug('Stream opened (%d subscribers)', len(flask_app.change_feed))
+    try:
+        yield stream_preamble()
+        while True:
+            frames = await subscription.next_async()
+            if frames:
+                yield b''.join(frames)
+            else:
+                await run_in_threadpool(flask_app.sync_storage)
+                yield HEARTBEAT
+    finally:
+        subscription.close()
+        log.debug('Stream closed (%d events dropped)', subscription.dropped)
+
+
+def api_route(path, handler):
+    """GET route with the same storage sync, access log and CORS policy as Flask
+
+    CORS is applied per route rather than app-wide so responses from the
+    mounted Flask app, which sets its own CORS headers, are left alone.
+    """
+    route = path.replace('{', '<').replace('}', '>')
+
+    async def endpoint(request):
+        begin_request(route)
+        started = time.perf_counter()
+        metrics.request_started(route)
+        try:
+            await run_in_threadpool(flask_app.sync_storage)
+            response = await handler(request)
+            if isinstance(response, StreamingResponse) or len(response.body) < compression.MIN_BYTES:
+                response = compress_response(request, response)
+            else:
+                response = await run_in_threadpool(compress_response, request, response)
+        finally:
+            metrics.request_finished(route)
+        duration = time.perf_counter() - started
+        streamed = isinstance(response, StreamingResponse)
+        metrics.observe_request(request.method, route, response.status_code, duration,
+                                None if streamed else len(response.body))
+        log.info('%s %s %s', request.method, request.url.path, response.status_code, extra={
+            'status': response.status_code,
+            'bytes': response.headers.get('content-length'),
+            'duration_ms': round(duration * 1000, 3),
+        })
+        return response
+
+    cors = Middleware(CORSMiddleware, allow_origins=flask_app.allowed_origins, allow_credentials=True,
+                      allow_methods=['*'], allow_headers=['*'], expose_headers=['X-Next-Cursor', 'ETag'])
+    return Route(path, endpoint, methods=['GET', 'OPTIONS'], middleware=[cors])
+
+
+app = Starlette(routes=[
+    api_route('/api/health', health_check),
+    api_route('/api/clients', get_clients),
+    api_route('/api/clients/search', search_clients),
+    api_route('/api/clients/{client_id}', get_client),
+    api_route('/api/clients/{client_id}/portfolio', get_portfolio),
+    api_route('/api/clients/{client_id}/recommendations', get_recommendations),
+    api_route('/api/stream', stream_changes),
+    Mount('/', app=WSGIMiddleware(flask_app.app)),
+])
@@ -0,0 +1,102 @@
+"""Synthetic datasets with the same schema as the seed data in app.py."""
+
+import random
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+FIRST_NAMES = ('Elena', 'Daniel', 'Amelia', 'Lars', 'Sophie', 'Kenji', 'Isabella', 'Omar', 'Priya',
+               'Lucas', 'Hannah', 'Mateo', 'Chloe', 'Arjun', 'Freya', 'Noah', 'Mei', 'Rafael')
+LAST_NAMES = ('Rossi', 'Chen', 'Hartley', 'Johansen', 'Dubois', 'Tanaka', 'Garcia', 'Haddad', 'Sharma',
+              'Moreau', 'Fischer', 'Lopez', 'Nguyen', 'Kapoor', 'Olsen', 'Walker', 'Li', 'Santos')
+DOMICILES = ('Switzerland', 'United States', 'United Kingdom', 'Norway', 'Canada', 'Singapore',
+             'Australia', 'France', 'Spain', 'Germany', 'Japan', 'United Arab Emirates')
+SEGMENTS = ('Family Office', 'Wealth Preservation', 'Tech Entrepreneur', 'Growth', 'VC Proceeds',
+            'Renewables', 'Shipping', 'Alternatives', 'Foundation', 'ESG', 'Private Equity',
+            'Diversification', 'Agriculture', 'Real Assets', 'Art Collector', 'Estate Planning',
+            'Real Estate', 'Family Wealth', 'Inherited Wealth', 'Hedge Funds')
+DESCRIPTIONS = (
+    'Multi-generational family wealth focused on capital preservation and sustainable investments.',
+    'Founder with concentrated technology holdings seeking diversification.',
+    'Charitable foundation with a long-term growth mandate and ESG screening.',
+    'Entrepreneur reinvesting business proceeds into real assets and private markets.',
+)
+RISK_PROFILES = ('Conservative', 'Moderate', 'Aggressive')
+
+# Target allocation per risk profile: (asset class, percentage)
+ALLOCATIONS = {
+    'Conservative': (('Fixed Income', 45), ('Equities', 35), ('Real Estate', 15), ('Cash', 5)),
+    'Moderate': (('Equities', 50), ('Fixed Income', 30), ('Alternatives', 15), ('Cash', 5)),
+    'Aggressive': (('Equities', 70), ('Alternatives', 20), ('Fixed Income', 8), ('Cash', 2)),
+}
+RECOMMENDATION_TYPES = (
+    ('rebalance', 'Portfolio Rebalancing Opportunity'),
+    ('opportunity', 'ESG Investment Opportunity'),
+    ('risk_management', 'Hedge Position Recommendation'),
+    ('diversify', 'International Diversification'),
+)
+PRIORITIES = ('Low', 'Medium', 'High')
+STATUSES = ('pending', 'pending', 'pending', 'approved', 'rejected')
+
+
+def generate(count, seed=42, recommendation_share=0.2):
+    """Return `(clients, portfolios, recommendations)` for `count` clients
+
+    The same `count` and `seed` always produce the same dataset. Every
+    client has a portfolio; `recommendation_share` of them also have one to
+    three stored recommendations, the rest get generic ones from templates.
+    """
+    rng = random.Random(seed)
+    clients = []
+    portfolios = {}
+    recommendations = []
+    for n in range(1, count + 1):
+        client_id = f'c{n:03d}'
+        risk_profile = rng.choice(RISK_PROFILES)
+        aum = round(rng.lognormvariate(6.5, 1.0), 1)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        clients.append({
+            'id': client_id,
+            'name': f'{first} {last}-{n}',
+            'phone': f'+41 22 {rng.randrange(100, 999)} {rng.randrange(1000, 9999)}',
+            'aum': aum,
+            'domicile': rng.choice(DOMICILES),
+            'segments': rng.sample(SEGMENTS, rng.randint(1, 3)),
+            'keyContacts': [f'{first} {last}'],
+            'description': rng.choice(DESCRIPTIONS),
+            'riskProfile': risk_profile,
+        })
+        portfolios[client_id] = {
+            'totalValue': aum,
+            'lastUpdated': '2025-08-25T10:00:00Z',
+            'allocations': [
+                {'assetClass': asset_class, 'percentage': percentage, 'value': round(aum * percentage / 100, 1)}
+                for asset_class, percentage in ALLOCATIONS[risk_profile]
+            ],
+            'performance': {
+                'ytd': round(rng.uniform(-5, 20), 1),
+                'oneYear': round(rng.uniform(-8, 25), 1),
+                'threeYear': round(rng.uniform(0, 15), 1),
+            },
+            'riskMetrics': {
+                'sharpeRatio': round(rng.uniform(0.4, 2.0), 2),
+                'volatility': round(rng.uniform(4, 22), 1),
+                'maxDrawdown': round(rng.uniform(-25, -2), 1),
+                'beta': round(rng.uniform(0.5, 1.5), 2),
+            },
+        }
+        if rng.random() < recommendation_share:
+            for _ in range(rng.randint(1, 3)):
+                rec_type, title = rng.choice(RECOMMENDATION_TYPES)
+                recommendations.append({
+                    'id': f'rec{len(recommendations) + 1:06d}',
+                    'clientId': client_id,
+                    'type': rec_type,
+                    'title': title,
+                    'summary': f'{title} for {risk_profile.lower()} allocation targets.',
+                    'priority': rng.choice(PRIORITIES),
+                    'confidence': rng.randint(60, 95),
+                    'estimatedImpact': f'+{rng.uniform(0.1, 1.5):.1f}% annual return',
+                    'status': rng.choice(STATUSES),
+                    'createdAt': '2025-08-20T14:30:00Z',
+                })
+    return clients, portfolios, recommendations
@@ -0,0 +1,418 @@
+"""Latency/throughput benchmarks for the API hot paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --size 1k                  # Flask test client
+    python -m benchmarks.run --size 100k --mode http    # local HTTP server
+    python -m benchmarks.run --size 1k --save-baseline  # record a baseline
+
+Each scenario (search_clients, search_clients_uncached, get_client,
+create_client, get_recommendation_detail, handle_recommendation_action) is
+timed per request after a warm-up. The timed requests are split into
+--rounds rounds, interleaved across scenarios, and the report gives the best
+round's p50/p99 latency and throughput, plus peak RSS.
+
+Results are compared against baselines/<mode>-<size>.json when it exists,
+and the exit status is 1 if p50 or throughput regressed by more than
+--tolerance, or p99 by more than --tail-tolerance (tail latency is much
+noisier). Timings are only comparable on the same machine: record the
+baseline (--save-baseline) on the host that runs the gate. A baseline from
+another host is still compared, with a warning.
+
+A shared or busy machine drifts by more than that from one minute to the
+next. There, gate against a git ref instead of the baseline file:
+
+    python -m benchmarks.run --size 1k --against origin/main
+
+benchmarks the ref in a temporary worktree and this tree alternately
+(--pairs runs of each) and compares the best run of each.
+
+search_clients repeats a small set of searches, so after the warm-up it
+mostly measures SearchCache hits; search_clients_uncached makes every
+search distinct and so measures the text and sorted indexes.
+
+The dataset is synthetic (see datasets.py) and always served from the
+in-memory storage backend. Logging defaults to WARNING so access logs
+don't flood the terminal; set LOG_LEVEL to measure with them.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.datasets import DOMICILES, FIRST_NAMES, LAST_NAMES, SIZES, generate
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_TERMS = ('rossi', 'chen', 'family', 'growth', 'esg', 'lars', 'wealth', 'tech')
+
+
+def _search(rng, ctx):
+    query = f'q={rng.choice(SEARCH_TERMS)}&domiciles={rng.choice(DOMICILES).replace(" ", "+")}'
+    return 'GET', f'/api/clients/search?{query}&sortBy=aum&sortOrder=desc&limit=50', None
+
+
+def _search_uncached(rng, ctx):
+    # A name fragment and a distinct minAUM: no two requests share a cache entry
+    fragment = rng.choice(FIRST_NAMES + LAST_NAMES).lower()[:rng.randint(3, 5)]
+    query = f'q={fragment}&minAUM={rng.uniform(0, 100):.4f}'
+    return 'GET', f'/api/clients/search?{query}&sortBy=aum&sortOrder=desc&limit=50', None
+
+
+def _get_client(rng, ctx):
+    return 'GET', f'/api/clients/c{rng.randint(1, ctx["clients"]):03d}', None
+
+
+def _create_client(rng, ctx):
+    return 'POST', '/api/clients', {
+        'name': f'Benchmark Client {rng.randrange(10 ** 9)}',
+        'phone': '+41 22 000 0000',
+        'aum': round(rng.uniform(50, 5000), 1),
+        'domicile': rng.choice(DOMICILES),
+        'segments': ['Growth'],
+        'riskProfile': 'Moderate',
+    }
+
+
+def _rec_id(rng, ctx):
+    # Half stored recommendations, half generic ones from templates
+    if ctx['recommendations'] and rng.random() < 0.5:
+        return f'rec{rng.randint(1, ctx["recommendations"]):06d}'
+    return f'rec-c{rng.randint(1, ctx["clients"]):03d}-{rng.randint(1, 2)}'
+
+
+def _recommendation_detail(rng, ctx):
+    return 'GET', f'/api/recommendations/{_rec_id(rng, ctx)}/detail', None
+
+
+def _recommendation_action(rng, ctx):
+    action = rng.choice(('approved', 'rejected'))
+    return 'POST', f'/api/recommendations/{_rec_id(rng, ctx)}/action', {'action': action, 'notes': 'benchmark'}
+
+
+SCENARIOS = {
+    'search_clients': _search,
+    'search_clients_uncached': _search_uncached,
+    'get_client': _get_client,
+    'create_client': _create_client,
+    'get_recommendation_detail': _recommendation_detail,
+    'handle_recommendation_action': _recommendation_action,
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies_ns, elapsed):
+    latencies = sorted(latencies_ns)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) / 1e6, 4),
+        'p99_ms': round(percentile(latencies, 99) / 1e6, 4),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def best_of_rounds(rounds):
+    """One summary from per-round summaries, keeping the best value of each metric
+
+    Interference from the rest of the machine only ever makes a round
+    slower, so the best round is the closest to the code's own cost.
+    """
+    return {
+        'requests': sum(result['requests'] for result in rounds),
+        'p50_ms': min(result['p50_ms'] for result in rounds),
+        'p99_ms': min(result['p99_ms'] for result in rounds),
+        'throughput_rps': max(result['throughput_rps'] for result in rounds),
+    }
+
+
+def host_id():
+    return f'{platform.node()}/{platform.machine()}/{os.cpu_count()}cpu/python{platform.python_version()}'
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024, 1)
+
+
+def run_test_client(args):
+    """Drive the scenarios in-process through Flask's test client"""
+    os.environ['AIVEST_STORAGE'] = 'memory'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app as api
+
+    clients, portfolios, recommendations = generate(SIZES[args.size], seed=args.seed)
+    ctx = {'clients': len(clients), 'recommendations': len(recommendations)}
+    started = time.perf_counter()
+    api.load_dataset(clients, portfolios, recommendations)
+    del clients, portfolios, recommendations
+    print(f'loaded {args.size} dataset in {time.perf_counter() - started:.2f}s', file=sys.stderr)
+
+    client = api.app.test_client()
+    rng = random.Random(args.seed)
+    for name in args.scenarios:
+        for _ in range(args.warmup):
+            _call_test_client(client, *SCENARIOS[name](rng, ctx))
+    # Rounds are interleaved across scenarios so a slow spell on the host
+    # costs each scenario at most a round or two
+    rounds = {name: [] for name in args.scenarios}
+    for _ in range(args.rounds):
+        for name in args.scenarios:
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(args.requests // args.rounds):
+                method, path, body = SCENARIOS[name](rng, ctx)
+                t0 = time.perf_counter_ns()
+                _call_test_client(client, method, path, body)
+                latencies.append(time.perf_counter_ns() - t0)
+            rounds[name].append(summarize(latencies, time.perf_counter() - started))
+    return {name: best_of_rounds(rounds[name]) for name in args.scenarios}, peak_rss_mb()
+
+
+def _call_test_client(client, method, path, body):
+    response = client.open(path, method=method, json=body)
+    if response.status_code >= 500:
+        raise RuntimeError(f'{method} {path} -> {response.status_code}')
+    response.close()
+
+
+def run_http(args):
+    """Start benchmarks.serve in a subprocess and load it from client threads"""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serve', '--size', args.size, '--seed', str(args.seed)],
+        stdout=subprocess.PIPE, text=True,
+        env={**os.environ, 'AIVEST_STORAGE': 'memory', 'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING')},
+    )
+    try:
+        ready = server.stdout.readline().split()
+        if not ready or ready[0] != 'READY':
+            raise RuntimeError('benchmark server failed to start')
+        port, ctx = int(ready[1]), {'clients': int(ready[2]), 'recommendations': int(ready[3])}
+
+        for name in args.scenarios:
+            _load(port, SCENARIOS[name], ctx, args.warmup, args.concurrency, args.seed)
+        rounds = {name: [] for name in args.scenarios}
+        for round_number in range(args.rounds):
+            for name in args.scenarios:
+                latencies, elapsed = _load(port, SCENARIOS[name], ctx, args.requests // args.rounds,
+                                           args.concurrency, args.seed + 1000 * (round_number + 1))
+                rounds[name].append(summarize(latencies, elapsed))
+        results = {name: best_of_rounds(rounds[name]) for name in args.scenarios}
+    finally:
+        server.terminate()
+        server.wait()
+    return results, peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+
+def _load(port, make_request, ctx, total, concurrency, seed):
+    """Send `total` requests over `concurrency` keep-alive connections"""
+    latencies = []
+    remaining = [total]
+    lock = threading.Lock()
+    errors = []
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local = []
+        try:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+                method, path, body = make_request(rng, ctx)
+                payload = json.dumps(body) if body is not None else None
+                headers = {'Content-Type': 'application/json'} if body is not None else {}
+                t0 = time.perf_counter_ns()
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                local.append(time.perf_counter_ns() - t0)
+                if response.status >= 500:
+                    raise RuntimeError(f'{method} {path} -> {response.status}')
+        except Exception as error:
+            errors.append(error)
+        finally:
+            conn.close()
+            with lock:
+                latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(seed + i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+    return latencies, elapsed
+
+
+def compare(results, rss, baseline, tolerance, tail_tolerance):
+    """Metrics that are worse than the baseline by more than their tolerance"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        for metric, allowed in (('p50_ms', tolerance), ('p99_ms', tail_tolerance)):
+            if current[metric] > base[metric] * (1 + allowed):
+                regressions.append(f'{name} {metric}: {base[metric]} -> {current[metric]}')
+        if current['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f'{name} throughput_rps: {base["throughput_rps"]} -> {current["throughput_rps"]}')
+    if baseline.get('peak_rss_mb') and rss > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f'peak_rss_mb: {baseline["peak_rss_mb"]} -> {rss}')
+    return regressions
+
+
+def run_against(args):
+    """Benchmark this tree and git ref `args.against` alternately, best run of each
+
+    The ref is checked out into a temporary worktree. Each run is a fresh
+    `benchmarks.run` process in one tree or the other, alternating, so both
+    see the same conditions on the host. Returns `(current, reference)`
+    reports.
+    """
+    toplevel = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=BACKEND_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    worktree = tempfile.mkdtemp(prefix='aivest-bench-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.against], cwd=BACKEND_DIR,
+                   check=True, capture_output=True)
+    try:
+        trees = (BACKEND_DIR, os.path.join(worktree, os.path.relpath(BACKEND_DIR, toplevel)))
+        runs = ([], [])
+        for _ in range(args.pairs):
+            for directory, reports in zip(trees, runs):
+                reports.append(_run_tree(directory, args))
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=BACKEND_DIR, capture_output=True)
+        shutil.rmtree(worktree, ignore_errors=True)
+    return tuple(_best_report(reports) for reports in runs)
+
+
+def _run_tree(directory, args):
+    # Only options every version of this script understands
+    with tempfile.NamedTemporaryFile(suffix='.json') as out:
+        subprocess.run([sys.executable, '-m', 'benchmarks.run', '--size', args.size, '--mode', args.mode,
+                        '--requests', str(args.requests), '--warmup', str(args.warmup),
+                        '--concurrency', str(args.concurrency), '--seed', str(args.seed), '--json', out.name],
+                       cwd=directory, stdout=subprocess.DEVNULL, check=False)
+        with open(out.name) as f:
+            return json.load(f)
+
+
+def _best_report(reports):
+    names = [name for name in reports[0]['scenarios'] if all(name in r['scenarios'] for r in reports)]
+    return {
+        **reports[0],
+        'scenarios': {name: best_of_rounds([r['scenarios'][name] for r in reports]) for name in names},
+        'peak_rss_mb': min(r['peak_rss_mb'] for r in reports),
+    }
+
+
+def print_report(results, rss):
+    print(f'{"scenario":<30} {"requests":>9} {"p50 ms":>9} {"p99 ms":>9} {"req/s":>10}')
+    for name, result in results.items():
+        print(f'{name:<30} {result["requests"]:>9} {result["p50_ms"]:>9.3f} '
+              f'{result["p99_ms"]:>9.3f} {result["throughput_rps"]:>10.1f}')
+    print(f'peak RSS: {rss} MB')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size', choices=sorted(SIZES), default='1k')
+    parser.add_argument('--mode', choices=('test-client', 'http'), default='test-client')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=3000, help='timed requests per scenario')
+    parser.add_argument('--rounds', type=int, default=10, help='rounds the timed requests are split into')
+    parser.add_argument('--warmup', type=int, default=500, help='untimed requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads in http mode')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p50/throughput regression, e.g. 0.25 = 25%%')
+    parser.add_argument('--tail-tolerance', type=float, default=1.0, help='allowed p99 regression')
+    parser.add_argument('--save-baseline', action='store_true', help='write results as the new baseline')
+    parser.add_argument('--json', help='also write results to this file')
+    parser.add_argument('--against', metavar='REF',
+                        help='compare with git ref REF benchmarked alternately on this host, not the baseline')
+    parser.add_argument('--pairs', type=int, default=3, help='runs of each tree with --against')
+    args = parser.parse_args(argv)
+
+    args.rounds = max(1, min(args.rounds, args.requests))
+    if args.against:
+        current, reference = run_against(args)
+        print_report(current['scenarios'], current['peak_rss_mb'])
+        regressions = compare(current['scenarios'], current['peak_rss_mb'], reference,
+                              args.tolerance, args.tail_tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if not regressions:
+            print(f'no regressions beyond {args.tolerance:.0%} of {args.against}')
+        return 1 if regressions else 0
+
+    run = run_http if args.mode == 'http' else run_test_client
+    results, rss = run(args)
+    print_report(results, rss)
+
+    report = {
+        'mode': args.mode,
+        'size': args.size,
+        'requests': args.requests,
+        'rounds': args.rounds,
+        'concurrency': args.concurrency if args.mode == 'http' else 1,
+        'python': platform.python_version(),
+        'host': host_id(),
+        'scenarios': results,
+        'peak_rss_mb': rss,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = os.path.join(BASELINE_DIR, f'{args.mode}-{args.size}.json')
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'baseline written to {baseline_path}')
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print('no baseline to compare against (run with --save-baseline)')
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get('host') != report['host']:
+        print(f'warning: baseline recorded on {baseline.get("host", "an unknown host")}, '
+              f'not {report["host"]}; re-record it here for a reliable gate')
+    regressions = compare(results, rss, baseline, args.tolerance, args.tail_tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    if not regressions:
+        print(f'no regressions beyond {args.tolerance:.0%} of {os.path.basename(baseline_path)}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""HTTP server over a synthetic dataset, started by `benchmarks.run --mode http`.
+
+Loads the dataset into the Flask app, binds a threaded werkzeug server to a
+free local port and prints `READY <port> <clients> <recommendations>` once
+it is accepting connections.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from werkzeug.serving import make_server
+
+from benchmarks.datasets import SIZES, generate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', choices=sorted(SIZES), default='1k')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.environ['AIVEST_STORAGE'] = 'memory'
+    import app as api
+
+    clients, portfolios, recommendations = generate(SIZES[args.size], seed=args.seed)
+    counts = len(clients), len(recommendations)
+    api.load_dataset(clients, portfolios, recommendations)
+    del clients, portfolios, recommendations
+
+    # werkzeug logs every request at INFO, which would dominate the timings
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', args.port, api.app, threaded=True)
+    print(f'READY {server.server_port} {counts[0]} {counts[1]}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Client validation shared by create_client and the streamed bulk import.
+
+`read_rows` turns a request body stream into `(row, data, error)` tuples,
+decoding and splitting it a block at a time, so a large NDJSON or CSV file
+is never held in memory. `chunks` groups those rows for batched inserts and
+ImportReport collects the per-row outcome with a bounded error list.
+"""
+
+import codecs
+import csv
+import json
+import math
+from datetime import datetime
+
+REQUIRED_FIELDS = ['name', 'phone', 'aum', 'domicile', 'riskProfile']
+
+# In CSV, list fields are one cell with values separated by ';'
+CSV_LIST_SEPARATOR = ';'
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+BULK_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+_READ_SIZE = 64 * 1024
+
+
+def missing_fields(data):
+    """Required fields that are absent or empty in `data`"""
+    return [field for field in REQUIRED_FIELDS if field not in data or not data[field]]
+
+
+def client_fields(data):
+    """Validated client record (without id) from request data; raises ValueError"""
+    missing = missing_fields(data)
+    if missing:
+        raise ValueError(f'Missing required fields: {", ".join(missing)}')
+    return {
+        'name': _text(data, 'name'),
+        'phone': _text(data, 'phone'),
+        'aum': _aum(data),
+        'domicile': _text(data, 'domicile'),
+        'segments': _list(data, 'segments'),
+        'keyContacts': _list(data, 'keyContacts'),
+        'description': _text(data, 'description'),
+        'riskProfile': _text(data, 'riskProfile'),
+        'createdAt': datetime.now().isoformat()
+    }
+
+
+def _aum(data):
+    aum = float(data['aum'])
+    if not math.isfinite(aum):
+        raise ValueError('aum must be a finite number')
+    return aum
+
+
+def _text(data, field):
+    value = data.get(field) or ''
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string')
+    return value.strip()
+
+
+def _list(data, field):
+    value = data.get(field) or []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f'{field} must be a list of strings')
+    return value
+
+
+def read_rows(stream, mimetype):
+    """Yield `(row, data, error)` for each record in an NDJSON or CSV body
+
+    Rows are numbered from 1 (the CSV header is not a row). `error` is a
+    message for a row that could not be parsed, in which case `data` is None.
+    Raises ValueError for an unsupported content type.
+    """
+    if mimetype in NDJSON_TYPES:
+        return _ndjson_rows(_lines(stream))
+    if mimetype in CSV_TYPES:
+        return _csv_rows(_lines(stream))
+    raise ValueError(f'Unsupported content type {mimetype!r}; send NDJSON or CSV')
+
+
+def _lines(stream):
+    """Decoded lines (newline kept) from a binary stream, read in blocks"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        block = stream.read(_READ_SIZE)
+        text = decoder.decode(block or b'', final=not block)
+        lines = (pending + text).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        if not block:
+            break
+    if pending:
+        yield pending
+
+
+def _ndjson_rows(lines):
+    for row, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            yield row, None, f'Invalid JSON: {error}'
+            continue
+        if isinstance(data, dict):
+            yield row, data, None
+        else:
+            yield row, None, 'Expected a JSON object'
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for row, data in enumerate(reader, start=1):
+        # Short rows leave trailing columns as None; treat them as empty
+        yield row, {key: value for key, value in data.items() if key is not None and value is not None}, None
+
+
+def chunks(rows, size=BULK_CHUNK_SIZE):
+    """Group an iterable into lists of up to `size` items"""
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportReport:
+    """Outcome of a bulk import: counts, id range and the first row errors"""
+
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.first_id = None
+        self.last_id = None
+        self.errors = []
+
+    def add_error(self, row, error):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'error': error})
+
+    def add_created(self, records):
+        if not records:
+            return
+        self.created += len(records)
+        if self.first_id is None:
+            self.first_id = records[0]['id']
+        self.last_id = records[-1]['id']
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'firstId': self.first_id,
+            'lastId': self.last_id,
+            'errors': self.errors,
+            'errorsTruncated': self.failed > len(self.errors),
+        }
@@ -0,0 +1,137 @@
+"""Compact client record stored by ClientStore.
+
+A parsed client is a dict holding a dozen separate string objects and two
+lists, and the domicile, risk profile and segment strings repeat across
+thousands of clients. ClientRecord keeps a client in `__slots__` instead:
+
+- categorical fields are dictionary-encoded: every distinct domicile, risk
+  profile and segment combination is one shared object, so a record only
+  pays for a pointer to it;
+- the free-text fields (name, phone, description, createdAt and the key
+  contacts) are packed into a single UTF-8 bytes object and split back out
+  when read, which saves the per-string overhead of each of them.
+
+Records behave like a read-only mapping (`record['aum']`, `record.get(...)`,
+`{**record}`) and `to_dict` gives back exactly the JSON shape they were
+built from; json_codec encodes them through it. Values that don't fit the
+packed layout (non-string text, missing fields, unknown keys) are kept
+as-is, so nothing is lost.
+
+The price of the compact layout is encoding: building a dict per record
+makes a listing several times slower to encode than the plain dicts were.
+Records never change once stored, so listings and streams encode each one
+once and reuse the bytes from the API's SerializedCache.
+"""
+
+from collections.abc import Mapping
+
+# JSON field order, as clients have always been returned
+FIELDS = ('id', 'name', 'phone', 'aum', 'domicile', 'segments', 'keyContacts',
+          'description', 'riskProfile', 'createdAt')
+_FIELD_SET = frozenset(FIELDS)
+_SLOT_FIELDS = ('id', 'aum', 'domicile', 'segments', 'riskProfile')
+_TEXT_FIELDS = ('name', 'phone', 'description', 'createdAt')
+_PACKED = frozenset(_TEXT_FIELDS + ('keyContacts',))
+_SEPARATOR = '\0'
+
+# Stands in for a field the source dict did not have
+_ABSENT = object()
+
+_shared = {}
+
+
+def shared(value):
+    """The canonical copy of a repeated value such as a domicile or segment list
+
+    The table only grows with distinct category values, which is a small set;
+    unhashable values are returned as they are.
+    """
+    try:
+        return _shared.setdefault(value, value)
+    except TypeError:
+        return value
+
+
+class ClientRecord(Mapping):
+    __slots__ = _SLOT_FIELDS + ('_text', '_extra')
+
+    def __init__(self, data):
+        self.id = data.get('id', _ABSENT)
+        self.aum = data.get('aum', _ABSENT)
+        self.domicile = shared(data.get('domicile', _ABSENT))
+        self.riskProfile = shared(data.get('riskProfile', _ABSENT))
+        segments = data.get('segments', _ABSENT)
+        if isinstance(segments, list):
+            segments = shared(tuple(shared(segment) for segment in segments))
+        self.segments = segments
+
+        extra = {key: value for key, value in data.items() if key not in _FIELD_SET}
+        self._text = _pack(data)
+        if self._text is None:
+            extra.update((field, data[field]) for field in _PACKED if field in data)
+        self._extra = extra or None
+
+    @classmethod
+    def from_mapping(cls, data):
+        """`data` as a ClientRecord, reusing it if it already is one"""
+        return data if isinstance(data, cls) else cls(data)
+
+    def __getitem__(self, key):
+        if key in _PACKED and self._text is not None:
+            return self._unpack()[key]
+        if key in _FIELD_SET and key not in _PACKED:
+            value = getattr(self, key)
+            if value is not _ABSENT:
+                return list(value) if key == 'segments' and isinstance(value, tuple) else value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __repr__(self):
+        return f'ClientRecord({self.to_dict()!r})'
+
+    def _unpack(self):
+        parts = self._text.decode('utf-8').split(_SEPARATOR)
+        text = dict(zip(_TEXT_FIELDS, parts))
+        if not text['createdAt']:
+            del text['createdAt']
+        text['keyContacts'] = parts[len(_TEXT_FIELDS):]
+        return text
+
+    def to_dict(self):
+        """Plain dict with the original JSON shape"""
+        text = self._unpack() if self._text is not None else self._extra
+        data = {}
+        for field in FIELDS:
+            if field in _PACKED:
+                value = text.get(field, _ABSENT) if text is not None else _ABSENT
+            else:
+                value = getattr(self, field)
+            if value is _ABSENT:
+                continue
+            data[field] = list(value) if field == 'segments' and isinstance(value, tuple) else value
+        if self._extra is not None:
+            data.update(self._extra)
+        return data
+
+
+def _pack(data):
+    """The text fields joined into one bytes object, or None if they don't fit
+
+    Packing needs string name/phone/description, a non-empty createdAt or
+    none at all (seeded clients have none) and a list of string contacts.
+    """
+    created_at = data.get('createdAt', '')
+    contacts = data.get('keyContacts')
+    if created_at == '' and 'createdAt' in data or not isinstance(contacts, list):
+        return None
+    values = [data.get('name'), data.get('phone'), data.get('description'), created_at, *contacts]
+    if not all(isinstance(value, str) and _SEPARATOR not in value for value in values):
+        return None
+    return _SEPARATOR.join(values).encode('utf-8')
@@ -0,0 +1,273 @@
+"""Indexed in-memory client store used by the Flask API."""
+
+from client_record import ClientRecord
+from concurrency import SeqLock
+from search_index import TextIndex, searchable_fields
+from sorted_index import SortedIndex
+
+# Sortable fields and the key each one sorts by
+SORT_KEYS = {
+    'name': lambda record: record['name'].lower(),
+    'aum': lambda record: record['aum'],
+    'domicile': lambda record: record['domicile'],
+    'riskProfile': lambda record: record['riskProfile'],
+}
+DEFAULT_SORT = 'name'
+
+
+class ClientStore:
+    """Holds client records behind a primary id index plus secondary indexes.
+
+    Records are kept in a dict keyed by client id, so lookups and deletes are
+    O(1) and iteration still follows insertion order (the order the API has
+    always returned clients in). Secondary indexes map a domicile, risk
+    profile or segment value to the ids carrying it, a TextIndex answers
+    free-text search and a SortedIndex per sortable field serves AUM range
+    filters and ordered results.
+
+    Records are stored as compact ClientRecords (see client_record.py);
+    `add` and `add_many` convert plain dicts and return the stored records.
+    Both check every record and compute its text index entry before any
+    index changes, so an insert either applies completely or raises
+    (KeyError for a duplicate id, ValueError for a record the indexes
+    can't hold) and leaves the store as it was.
+
+    Writes (and id reservations) are serialized by a SeqLock while reads
+    take no lock: they retry in the rare case a write overlapped them (see
+    concurrency.py), so searches and listings never queue behind an insert.
+    Records themselves are immutable, so a record handed to a reader stays
+    valid whatever happens to the store afterwards.
+    """
+
+    ID_PREFIX = 'c'
+
+    def __init__(self, records=()):
+        self._by_id = {}
+        self._by_domicile = {}
+        self._by_risk_profile = {}
+        self._by_segment = {}
+        self._text = TextIndex()
+        self._sorted = {field: SortedIndex(key) for field, key in SORT_KEYS.items()}
+        self._store_order = SortedIndex(_store_order_key)
+        self._inserted = 0
+        self._last_seq = 0
+        self._lock = SeqLock()
+        self.add_many(records)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, client_id):
+        return client_id in self._by_id
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def all(self):
+        """Return every client in insertion order"""
+        return list(self._by_id.values())
+
+    def get(self, client_id):
+        """Return the client with this id, or None"""
+        return self._by_id.get(client_id)
+
+    def next_ids(self, count, first_seq=None):
+        """Reserve `count` consecutive client ids, like `next_id` for a batch"""
+        with self._lock.writing():
+            if first_seq is None:
+                first_seq = self._last_seq + 1
+            return [self.next_id(seq) for seq in range(first_seq, first_seq + count)]
+
+    def next_id(self, seq=None):
+        """Reserve and return the next client id (c001, c002, ...)
+
+        `seq` is a sequence number already allocated elsewhere (e.g. by a
+        shared storage backend); by default the store's own sequence is used.
+        """
+        with self._lock.writing():
+            if seq is None:
+                seq = self._last_seq + 1
+            self._last_seq = max(self._last_seq, seq)
+        return f'{self.ID_PREFIX}{seq:03d}'
+
+    def add(self, record):
+        """Insert a client record and index it"""
+        record = ClientRecord.from_mapping(record)
+        text = _index_text(record)
+        with self._lock.writing():
+            client_id = record['id']
+            if client_id in self._by_id:
+                raise KeyError(f'Duplicate client id: {client_id}')
+
+            self._by_id[client_id] = record
+            self._store_order.add(record, self._inserted)
+            for index in self._sorted.values():
+                index.add(record, self._inserted)
+            self._inserted += 1
+            self._track_seq(client_id)
+            _index_add(self._by_domicile, record['domicile'], client_id)
+            _index_add(self._by_risk_profile, record['riskProfile'], client_id)
+            for segment in record.get('segments', []):
+                _index_add(self._by_segment, segment, client_id)
+            self._text.add(record, text)
+            return record
+
+    def add_many(self, records):
+        """Insert a batch of client records, indexing them together
+
+        Either every record is added or, on a duplicate id or an invalid
+        record, none is.
+        """
+        records = [ClientRecord.from_mapping(record) for record in records]
+        texts = [_index_text(record) for record in records]
+        with self._lock.writing():
+            seen = set()
+            for record in records:
+                client_id = record['id']
+                if client_id in self._by_id or client_id in seen:
+                    raise KeyError(f'Duplicate client id: {client_id}')
+                seen.add(client_id)
+
+            first_position = self._inserted
+            self._store_order.add_many(records, first_position)
+            for index in self._sorted.values():
+                index.add_many(records, first_position)
+            self._inserted += len(records)
+            for record, text in zip(records, texts):
+                client_id = record['id']
+                self._by_id[client_id] = record
+                self._track_seq(client_id)
+                _index_add(self._by_domicile, record['domicile'], client_id)
+                _index_add(self._by_risk_profile, record['riskProfile'], client_id)
+                for segment in record.get('segments', []):
+                    _index_add(self._by_segment, segment, client_id)
+                self._text.add(record, text)
+            return records
+
+    def remove(self, client_id):
+        """Remove and return the client with this id, or None if unknown"""
+        with self._lock.writing():
+            record = self._by_id.pop(client_id, None)
+            if record is None:
+                return None
+
+            self._store_order.remove(client_id)
+            for index in self._sorted.values():
+                index.remove(client_id)
+            _index_discard(self._by_domicile, record['domicile'], client_id)
+            _index_discard(self._by_risk_profile, record['riskProfile'], client_id)
+            for segment in record.get('segments', []):
+                _index_discard(self._by_segment, segment, client_id)
+            self._text.remove(client_id)
+            return record
+
+    def ids_by_domicile(self, domiciles):
+        """Ids of clients whose domicile is any of the given values"""
+        return self._lock.read(_index_union, self._by_domicile, domiciles)
+
+    def ids_by_risk_profile(self, risk_profiles):
+        """Ids of clients whose risk profile is any of the given values"""
+        return self._lock.read(_index_union, self._by_risk_profile, risk_profiles)
+
+    def ids_by_segment(self, segments):
+        """Ids of clients tagged with any of the given segments"""
+        return self._lock.read(_index_union, self._by_segment, segments)
+
+    def ids_matching_text(self, query):
+        """Ids of clients whose name, segments, description, domicile or
+        risk profile contain `query` (already lower-cased and stripped)"""
+        return self._lock.read(self._text.search, query)
+
+    def resolve_sort(self, sort_by):
+        """Name of the field a `sortBy` value actually sorts on"""
+        return sort_by if sort_by in self._sorted else DEFAULT_SORT
+
+    def query(self, sort_by=DEFAULT_SORT, reverse=False, candidate_ids=None,
+              min_aum=None, max_aum=None, after=None, limit=None):
+        """Return `(records, next_after)` for an ordered, filtered page
+
+        `sort_by=None` keeps store (insertion) order; unknown fields fall back
+        to name. `candidate_ids` limits the result to those ids (e.g. the
+        output of the text and category indexes) and `min_aum`/`max_aum` are
+        inclusive bounds answered from the AUM index. `after` and `limit`
+        page through the result: `next_after` is the cursor position to pass
+        back for the next page, or None once the result is exhausted.
+        """
+        return self._lock.read(self._query, sort_by, reverse, candidate_ids,
+                               min_aum, max_aum, after, limit)
+
+    def _query(self, sort_by, reverse, candidate_ids, min_aum, max_aum, after, limit):
+        if sort_by is None:
+            index = self._store_order
+        else:
+            index = self._sorted[self.resolve_sort(sort_by)]
+        aum_index = self._sorted['aum']
+
+        low = high = None
+        if min_aum is not None or max_aum is not None:
+            if index is aum_index:
+                low, high = min_aum, max_aum
+            else:
+                in_range = set(aum_index.range_ids(min_aum, max_aum))
+                candidate_ids = in_range if candidate_ids is None else candidate_ids & in_range
+
+        fetch = None if limit is None else limit + 1
+        entries = index.page(reverse, after, fetch, candidate_ids, low, high)
+        next_after = None
+        if limit is not None and len(entries) > limit:
+            entries = entries[:limit]
+            next_after = entries[-1][:2] if entries else None
+        return [self._by_id[entry[2]] for entry in entries], next_after
+
+    def _track_seq(self, client_id):
+        suffix = client_id[len(self.ID_PREFIX):]
+        if client_id.startswith(self.ID_PREFIX) and suffix.isdigit():
+            self._last_seq = max(self._last_seq, int(suffix))
+
+
+def _index_text(record):
+    """Check that the indexes can hold `record`; returns its text index entry
+
+    Raises ValueError for a missing field or a value of the wrong type,
+    which would otherwise fail halfway through indexing the record.
+    """
+    try:
+        for field in ('id', 'name', 'domicile', 'riskProfile'):
+            if not isinstance(record[field], str):
+                raise ValueError(f'{field} must be a string')
+        aum = record['aum']
+        if isinstance(aum, bool) or not isinstance(aum, (int, float)):
+            raise ValueError('aum must be a number')
+        if not isinstance(record.get('description', ''), str):
+            raise ValueError('description must be a string')
+        segments = record.get('segments', [])
+        if not isinstance(segments, list) or not all(isinstance(segment, str) for segment in segments):
+            raise ValueError('segments must be a list of strings')
+    except KeyError as missing:
+        raise ValueError(f'missing field {missing}') from None
+    return searchable_fields(record)
+
+
+def _store_order_key(record):
+    # Every record shares one key, so the index orders purely by position
+    return 0
+
+
+def _index_add(index, value, client_id):
+    index.setdefault(value, set()).add(client_id)
+
+
+def _index_discard(index, value, client_id):
+    ids = index.get(value)
+    if ids is None:
+        return
+    ids.discard(client_id)
+    if not ids:
+        del index[value]
+
+
+def _index_union(index, values):
+    result = set()
+    for value in values:
+        result |= index.get(value, set())
+    return result
@@ -0,0 +1,163 @@
+"""Negotiated gzip/brotli compression for API responses.
+
+Both front ends (the Flask after_request hook and the Starlette routes in
+asgi.py) use the same policy:
+
+- only JSON/NDJSON and other text bodies of at least MIN_BYTES are
+  compressed; the SSE change feed is left alone, as its events are tiny and
+  must reach the client the moment they are written;
+- brotli is preferred when the client accepts it and the optional `brotli`
+  package is installed, gzip otherwise;
+- streamed bodies (NDJSON listings) are compressed chunk by chunk, each
+  chunk flushed so the client can start parsing before the stream ends;
+- a compressed body is a different representation, so its ETag becomes
+  weak (W/"..."); conditional requests compare ETags weakly, as If-None-Match
+  is meant to, so the 304 still works;
+- compressed bodies of responses that carry an ETag are cached under the
+  URL, ETag and encoding, so a resource that hasn't changed is compressed
+  once rather than on every request.
+
+Configuration: AIVEST_COMPRESS_MIN_BYTES (default 1024), AIVEST_GZIP_LEVEL
+(1-9, default 6), AIVEST_BROTLI_QUALITY (0-11, default 5) and
+AIVEST_COMPRESS_CACHE_BYTES (default 16 MiB).
+"""
+
+import gzip
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional dependency: gzip only
+    brotli = None
+
+MIN_BYTES = int(os.getenv('AIVEST_COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('AIVEST_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('AIVEST_BROTLI_QUALITY', '5'))
+CACHE_BYTES = int(os.getenv('AIVEST_COMPRESS_CACHE_BYTES', str(16 * 1024 * 1024)))
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+_COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript',
+                       'application/xml', 'image/svg+xml')
+_UNCOMPRESSIBLE_TYPES = ('text/event-stream',)
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a werkzeug-parsed Accept-Encoding header"""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compressible(content_type):
+    """True for media types worth compressing"""
+    media_type = (content_type or '').split(';', 1)[0].strip().lower()
+    if media_type in _UNCOMPRESSIBLE_TYPES:
+        return False
+    return media_type.startswith('text/') or media_type in _COMPRESSIBLE_TYPES
+
+
+def weak_etag(header):
+    """The ETag header value marked weak, e.g. '"abc"' -> 'W/"abc"'"""
+    return header if header.startswith('W/') else f'W/{header}'
+
+
+def compress(data, encoding):
+    """Compress a whole body"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental compressor for streamed bodies"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        """Compressed bytes for `data`, flushed so the client can decode them right away"""
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        """Compressed bytes ending the stream"""
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_chunks(chunks, encoding):
+    """Compress an iterable of body chunks as it is consumed"""
+    compressor = StreamCompressor(encoding)
+    try:
+        for data in chunks:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            if data:
+                yield compressor.chunk(data)
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+async def compress_chunks_async(chunks, encoding):
+    """Compress an async iterable of body chunks as it is consumed"""
+    compressor = StreamCompressor(encoding)
+    async for data in chunks:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+class CompressedBodies:
+    """LRU of compressed bodies keyed by (URL, ETag, encoding), bounded in bytes
+
+    An ETag names one version of the resource at a URL, so the compressed
+    body stays valid for as long as the same ETag is being served.
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def compress(self, url, etag, data, encoding):
+        """`data` compressed with `encoding`, reusing an earlier result for the same version"""
+        key = (url, etag, encoding)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return body
+
+        body = compress(data, encoding)
+        if len(body) > self.max_bytes // 8:
+            return body  # one huge listing shouldn't flush everything else
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = body
+                self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
@@ -0,0 +1,64 @@
+"""Lock-free reads over the in-memory indexes.
+
+Writers to a store serialize on a lock and bump a generation counter before
+and after each change, so the counter is odd while a write is in progress.
+Readers take no lock at all: they note the generation, run the read and
+check the generation again. If a write overlapped, the result may mix the
+old and new state, so it is thrown away and the read runs again. Writes are
+short (one client, one recommendation) and readers far outnumber them, so
+a retry is rare and a reader never waits behind the writer lock unless it
+keeps colliding with writes (after READ_ATTEMPTS tries it takes the lock
+to guarantee progress).
+
+This is the seqlock pattern. It relies on the indexes only ever being
+changed by single interpreter-level operations (dict/set/list updates), so
+a reader sees each of them either before or after, never halfway.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+READ_ATTEMPTS = 8
+
+
+class SeqLock:
+    """Serializes writers; readers run lock-free and retry if a write overlapped"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.generation = 0
+
+    @contextmanager
+    def writing(self):
+        """Context manager for a write; re-entrant, so store methods can nest"""
+        with self._lock:
+            if self._depth == 0:
+                self.generation += 1
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.generation += 1
+
+    def read(self, func, *args, **kwargs):
+        """Result of `func(*args, **kwargs)` as of a moment no write was in progress"""
+        for _ in range(READ_ATTEMPTS):
+            generation = self.generation
+            if generation % 2 == 0:
+                try:
+                    result = func(*args, **kwargs)
+                except Exception:
+                    # Torn reads fail in arbitrary ways; only a clean one is a real error
+                    if self.generation == generation:
+                        raise
+                else:
+                    if self.generation == generation:
+                        return result
+            time.sleep(0)  # let the writer finish
+        with self._lock:
+            return func(*args, **kwargs)
+
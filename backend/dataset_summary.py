@@ -0,0 +1,114 @@
+"""Dashboard summary counters maintained incrementally as the dataset changes."""
+
+import threading
+
+from recommendation_templates import template_count
+
+
+def _increment(counts, key, delta):
+    count = counts.get(key, 0) + delta
+    if count:
+        counts[key] = count
+    else:
+        counts.pop(key, None)
+
+
+class DatasetSummary:
+    """Client and recommendation aggregates updated in O(1) per mutation
+
+    Built once from the dataset by `load_dataset`; afterwards every client
+    create/delete and recommendation action adjusts the counters, so
+    `/api/summary` never scans clients or recommendations.
+
+    Clients without stored recommendations are shown their generic ones,
+    which are all pending; those are counted per client from the template
+    count of its risk profile until its first recommendation is stored.
+    """
+
+    def __init__(self, clients, portfolios, recommendations):
+        self._portfolios = portfolios
+        self._lock = threading.Lock()
+        self.clients = 0
+        self.portfolios = 0
+        self.total_aum = 0
+        self.by_risk_profile = {}
+        self.by_domicile = {}
+        self.by_segment = {}
+        self.stored_by_status = {}
+        self.stored_recommendations = 0
+        self.generic_pending = 0
+        self._stored_per_client = {}
+        self._client_profiles = {}
+
+        for rec in recommendations:
+            self._count_stored(rec, None)
+        for client in clients:
+            self.client_added(client)
+
+    def client_added(self, client):
+        with self._lock:
+            self._count_client(client, 1)
+
+    def client_removed(self, client):
+        with self._lock:
+            self._count_client(client, -1)
+
+    def recommendation_stored(self, rec, previous_status):
+        """Account for a recommendation upserted into the repository
+
+        `previous_status` is what `RecommendationRepository.upsert` returned:
+        None for a newly stored recommendation.
+        """
+        with self._lock:
+            self._count_stored(rec, previous_status)
+
+    def _count_client(self, client, delta):
+        client_id = client['id']
+        self.clients += delta
+        self.total_aum += delta * client['aum']
+        if client_id in self._portfolios:
+            self.portfolios += delta
+        _increment(self.by_risk_profile, client['riskProfile'], delta)
+        _increment(self.by_domicile, client['domicile'], delta)
+        for segment in client.get('segments', ()):
+            _increment(self.by_segment, segment, delta)
+        if delta > 0:
+            self._client_profiles[client_id] = client['riskProfile']
+        else:
+            self._client_profiles.pop(client_id, None)
+        if client_id not in self._stored_per_client:
+            self.generic_pending += delta * template_count(client['riskProfile'])
+
+    def _count_stored(self, rec, previous_status):
+        if previous_status is None:
+            self.stored_recommendations += 1
+            client_id = rec['clientId']
+            stored = self._stored_per_client.get(client_id, 0)
+            self._stored_per_client[client_id] = stored + 1
+            # The client's generic recommendations are no longer shown
+            if not stored and client_id in self._client_profiles:
+                self.generic_pending -= template_count(self._client_profiles[client_id])
+        else:
+            _increment(self.stored_by_status, previous_status, -1)
+        _increment(self.stored_by_status, rec.get('status'), 1)
+
+    def as_dict(self):
+        with self._lock:
+            by_status = dict(self.stored_by_status)
+            if self.generic_pending:
+                _increment(by_status, 'pending', self.generic_pending)
+            return {
+                'clients': self.clients,
+                'portfolios': self.portfolios,
+                'totalAUM': self.total_aum,
+                'averageAUM': self.total_aum / self.clients if self.clients else 0,
+                'byRiskProfile': dict(self.by_risk_profile),
+                'byDomicile': dict(self.by_domicile),
+                'bySegment': dict(self.by_segment),
+                'recommendations': {
+                    'stored': self.stored_recommendations,
+                    'generic': self.generic_pending,
+                    'byStatus': by_status,
+                },
+                'pendingRecommendations': by_status.get('pending', 0),
+            }
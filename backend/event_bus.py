@@ -0,0 +1,186 @@
+"""In-process change feed behind the /api/stream server-sent events endpoint.
+
+Mutations publish small events (client created/deleted, recommendation
+updated) to an EventBus; each connected stream holds a Subscription with a
+bounded queue. Publishing never blocks on a slow reader: when a
+subscriber's queue is full its backlog is dropped and it gets a single
+`resync` event instead, telling the dashboard to re-fetch once. Recent
+events are kept in a replay buffer so a reconnecting EventSource can resume
+from its Last-Event-ID.
+
+Events are encoded to their SSE wire form once, at publish time, and the
+same bytes are shared by every subscriber.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from collections import deque
+
+import json_codec
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 256
+REPLAY_BUFFER_SIZE = 1024
+RETRY_MS = 5000
+
+HEARTBEAT = b': heartbeat\n\n'
+
+# Buses given a new epoch in each forked worker (see EventBus._after_fork)
+_buses = weakref.WeakSet()
+
+
+def _frame(event_id, event_type, data):
+    return (f'id: {event_id}\nevent: {event_type}\ndata: '.encode('utf-8')
+            + json_codec.dumps(data) + b'\n\n')
+
+
+class EventBus:
+    """Fan-out of change events to bounded per-subscriber queues
+
+    Event ids are `<epoch>-<seq>`; the random epoch means an id from another
+    worker or an earlier process never resumes from the wrong position.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE, replay_size=REPLAY_BUFFER_SIZE):
+        self.epoch = os.urandom(4).hex()
+        self.queue_size = queue_size
+        self._seq = 0
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        _buses.add(self)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def _after_fork(self):
+        # Workers forked from a preloaded app would otherwise hand out the
+        # same event ids for different events; the parent's buffered events
+        # and subscribers are not this worker's
+        self.epoch = os.urandom(4).hex()
+        self._replay.clear()
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def last_event_id(self):
+        return f'{self.epoch}-{self._seq}'
+
+    def publish(self, event_type, data):
+        """Send an event to every subscriber and keep it for replay"""
+        with self._lock:
+            self._seq += 1
+            frame = _frame(f'{self.epoch}-{self._seq}', event_type, data)
+            self._replay.append((self._seq, frame))
+            subscribers = tuple(self._subscribers)
+        for subscription in subscribers:
+            subscription._put(frame)
+
+    def subscribe(self, last_event_id=None, loop=None):
+        """Open a subscription, replaying events after `last_event_id` if still buffered
+
+        Pass the running event loop as `loop` to wait with `next_async`.
+        """
+        subscription = Subscription(self, self.queue_size, loop)
+        with self._lock:
+            if last_event_id:
+                missed = self._missed_since(last_event_id)
+                if missed is None:
+                    subscription._overflow()
+                else:
+                    for frame in missed:
+                        subscription._put(frame)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _missed_since(self, last_event_id):
+        """Buffered frames after `last_event_id`, or None when it can't be resumed"""
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq < self._seq and (not self._replay or self._replay[0][0] > seq + 1):
+            return None
+        return [frame for event_seq, frame in self._replay if event_seq > seq]
+
+
+class Subscription:
+    """One stream's bounded queue of encoded SSE frames"""
+
+    def __init__(self, bus, maxsize, loop=None):
+        self.bus = bus
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._frames = deque()
+        self._overflowed = False
+        self._cond = threading.Condition()
+        self._loop = loop
+        self._wakeup = asyncio.Event() if loop is not None else None
+
+    def _put(self, frame):
+        with self._cond:
+            if self._overflowed:
+                return
+            if len(self._frames) >= self.maxsize:
+                self._overflow()
+            else:
+                self._frames.append(frame)
+            self._cond.notify()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _overflow(self):
+        self.dropped += len(self._frames)
+        self._frames.clear()
+        self._overflowed = True
+
+    def _drain(self):
+        if self._overflowed:
+            self._overflowed = False
+            return [_frame(self.bus.last_event_id, 'resync', {'reason': 'overflow'})]
+        frames = list(self._frames)
+        self._frames.clear()
+        return frames
+
+    def next(self, timeout=HEARTBEAT_SECONDS):
+        """Block until frames are queued; returns them, or [] after `timeout`"""
+        with self._cond:
+            if not self._frames and not self._overflowed:
+                self._cond.wait(timeout)
+            return self._drain()
+
+    async def next_async(self, timeout=HEARTBEAT_SECONDS):
+        """`next` for subscriptions opened with an event loop"""
+        with self._cond:
+            if self._frames or self._overflowed:
+                return self._drain()
+            self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._cond:
+            return self._drain()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+def stream_preamble():
+    """First bytes of every stream: the client reconnect delay"""
+    return f'retry: {RETRY_MS}\n\n'.encode('utf-8')
+
+
+def _after_fork_in_child():
+    for bus in list(_buses):
+        bus._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
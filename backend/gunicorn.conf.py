@@ -0,0 +1,43 @@
+"""Gunicorn settings shared by Procfile and render.yaml.
+
+AIVEST_SERVER_MODE picks how the API is served:
+
+    wsgi  threaded workers running the Flask app (app:app), AIVEST_THREADS
+          requests at a time per worker (default 8). Every open /api/stream
+          holds one of those threads, so at most AIVEST_MAX_STREAMS (default
+          half of them) may stream; beyond that, and always with
+          AIVEST_THREADS=1 (sync workers), the app answers /api/stream with
+          a 503 asking dashboards to poll
+    asgi  uvicorn workers running asgi:app, where the read routes are async
+          handlers on an event loop and the rest is the same Flask app
+
+AIVEST_PRELOAD=1 loads the app (and dataset) once in the master before
+forking, so workers start instantly and share its pages copy-on-write.
+Objects are moved out of the garbage collector's reach before each fork,
+otherwise the first collection in a worker would touch, and so copy, them.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+server_mode = os.getenv('AIVEST_SERVER_MODE', 'wsgi').lower()
+if server_mode == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:app'
+elif server_mode == 'wsgi':
+    wsgi_app = 'app:app'
+    # Reads don't lock the dataset, so threads mostly wait on the network, not each other
+    threads = int(os.getenv('AIVEST_THREADS', '8'))
+    if threads > 1:
+        worker_class = 'gthread'
+else:
+    raise ValueError(f'Unknown AIVEST_SERVER_MODE: {server_mode}')
+
+preload_app = os.getenv('AIVEST_PRELOAD', '0').lower() in ('1', 'true', 'yes')
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
@@ -0,0 +1,439 @@
+"""Append-only journal storage backend (AIVEST_STORAGE=journal).
+
+The dataset lives in memory as usual; this backend makes its mutations
+survive restarts without rewriting the dataset on every change:
+
+- every mutation is appended to a journal as one JSON line. Writers only
+  queue the encoded line; a flusher thread writes everything queued with
+  one `write` and one `fsync` every AIVEST_JOURNAL_FLUSH_MS (group commit),
+  so a mutation costs microseconds on the request path. A crash can lose
+  the last flush interval; a graceful shutdown flushes first.
+- the journal is split into segments named after their starting position.
+  A position is a byte offset into the journal as a whole, so positions
+  keep growing across segments and identify a point in the history.
+- once the journal since the last snapshot exceeds
+  AIVEST_JOURNAL_COMPACT_BYTES, a child process (`python journal.py compact
+  DIR`) rotates to a new segment, replays the old ones onto the previous
+  snapshot and writes a compacted snapshot (snapshot.py format) at that
+  position. Segments older than the previous snapshot are then deleted.
+- startup loads the snapshot and replays only the segments after it.
+
+Every worker on the host appends to the same journal under an exclusive
+flock and tails it in `pull_changes`, like the SQLite change log.
+
+Directory layout (AIVEST_JOURNAL_DIR, default ./journal next to this module):
+
+    dataset_id               random name of this journal, the storage `epoch`
+    snapshot                 compacted dataset at position `changeSeq`
+    journal-<position>.log   segments, hex position of their first byte
+    client_seq               last allocated client sequence number
+    lock, compact.lock       flock targets
+"""
+
+import atexit
+import fcntl
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import weakref
+
+import json_codec
+import snapshot
+from app_logging import get_logger
+
+DEFAULT_FLUSH_MS = 10
+DEFAULT_COMPACT_BYTES = 64 * 1024 * 1024
+
+_SEGMENT_PREFIX = 'journal-'
+# Entity of the journal's own bookkeeping entries, ignored on replay
+_JOURNAL = 'journal'
+_SEGMENT_SUFFIX = '.log'
+
+log = get_logger('journal')
+
+# Open journals, re-identified in each forked worker (see JournalStorage._after_fork)
+_open_journals = weakref.WeakSet()
+
+
+class _flock:
+    """Exclusive flock on a file in the journal directory"""
+
+    def __init__(self, path, blocking=True):
+        self.path = path
+        self.blocking = blocking
+        self.acquired = False
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.acquired = True
+        except BlockingIOError:
+            pass
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        os.close(self.fd)  # closing releases the lock
+        return False
+
+
+class JournalStorage:
+    """Journal plus compacted snapshot in one directory, shared by the host's workers"""
+
+    name = 'journal'
+
+    def __init__(self, directory, flush_ms=DEFAULT_FLUSH_MS, compact_bytes=DEFAULT_COMPACT_BYTES):
+        self.directory = directory
+        self.flush_interval = flush_ms / 1000
+        self.compact_bytes = compact_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._snapshot_path = os.path.join(directory, 'snapshot')
+        self._lock_path = os.path.join(directory, 'lock')
+        self._writer = uuid.uuid4().hex[:12]
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._cursor = 0
+        self._cursor_segment = None
+        self._cursor_lock = threading.Lock()
+        self._compacting_since = 0.0
+        with _flock(self._lock_path):
+            self.epoch = self._dataset_id()
+        _open_journals.add(self)
+        atexit.register(self.flush)
+
+    # Loading
+
+    def load(self, seed_clients, seed_portfolios, seed_recommendations):
+        """Snapshot plus replayed journal, seeding the directory on first start"""
+        with _flock(self._lock_path):
+            if not os.path.exists(self._snapshot_path):
+                snapshot.write(self._snapshot_path, seed_clients, seed_portfolios, seed_recommendations, 0)
+            state = _State.from_snapshot(snapshot.Snapshot(self._snapshot_path))
+            end = state.replay(self._segments())
+            self._fix_client_seq(state.clients)
+        with self._cursor_lock:
+            self._cursor = end
+            self._cursor_segment = None
+        return state.dataset()
+
+    def change_seq(self):
+        return self._cursor
+
+    def resume(self, seq):
+        """Tail the journal from position `seq`; False if it was compacted away"""
+        segments = self._segments()
+        oldest = segments[0][0] if segments else 0
+        end = segments[-1][0] + os.path.getsize(segments[-1][1]) if segments else 0
+        if not os.path.exists(self._snapshot_path) or not oldest <= seq <= end:
+            return False
+        with self._cursor_lock:
+            self._cursor = seq
+            self._cursor_segment = None
+        return True
+
+    # Writing
+
+    def next_client_seq(self):
+        return self.next_client_seqs(1)
+
+    def next_client_seqs(self, count):
+        path = os.path.join(self.directory, 'client_seq')
+        with _flock(self._lock_path):
+            last = _read_int(path)
+            _write_int(path, last + count)
+        return last + 1
+
+    def insert_client(self, record):
+        self._append([('client', 'insert', record['id'], record)])
+
+    def insert_clients(self, records):
+        self._append([('client', 'insert', record['id'], record) for record in records])
+
+    def delete_client(self, client_id):
+        self._append([('client', 'delete', client_id, None)])
+
+    def upsert_recommendation(self, record):
+        self._append([('recommendation', 'upsert', record['id'], record)])
+
+    def _append(self, events):
+        lines = [json_codec.dumps([self._writer, entity, op, key, doc]) + b'\n' for entity, op, key, doc in events]
+        with self._queue_lock:
+            self._queue.extend(lines)
+            self._start_flusher()
+
+    def _start_flusher(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name='journal-flush', daemon=True).start()
+
+    def _after_fork(self):
+        # A preloaded app forks every worker off the same object: each needs
+        # its own writer id, or pull_changes would skip its siblings' entries
+        # as its own. Entries still queued are the parent's to flush, and a
+        # lock held by one of the parent's threads would never be released.
+        self._writer = uuid.uuid4().hex[:12]
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._cursor_lock = threading.Lock()
+        self._compacting_since = 0.0
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write and fsync everything queued (the group commit)"""
+        with self._flush_lock:
+            with self._queue_lock:
+                lines, self._queue = self._queue, []
+            if not lines:
+                return
+            with _flock(self._lock_path):
+                segments = self._segments()
+                base, path = segments[-1] if segments else (0, self._segment_path(0))
+                fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    size = os.fstat(fd).st_size
+                    # A crash mid-write leaves a torn last line; start on a fresh one
+                    if size and os.pread(fd, 1, size - 1) != b'\n':
+                        lines.insert(0, b'\n')
+                    data = memoryview(b''.join(lines))
+                    while data:
+                        data = data[os.write(fd, data):]
+                    os.fsync(fd)
+                    size = os.fstat(fd).st_size
+                finally:
+                    os.close(fd)
+        if base + size - self._snapshot_seq() > self.compact_bytes:
+            self._start_compaction()
+
+    # Reading other workers' changes
+
+    def pull_changes(self):
+        """Journal entries appended since the last call
+
+        Returns `(seq, entity, op, key, doc, own)` tuples, `seq` being the
+        position just past the entry, or None when the journal was compacted
+        past this worker's position and it must reload.
+        """
+        with self._cursor_lock:
+            # Fast path: the segment we are reading has not grown. Rotation
+            # appends a marker to the old segment, so it always grows first.
+            if self._cursor_segment is not None:
+                base, path = self._cursor_segment
+                try:
+                    if base + os.stat(path).st_size == self._cursor:
+                        return []
+                except FileNotFoundError:
+                    pass
+
+            segments = self._segments()
+            if segments and self._cursor < segments[0][0]:
+                self._cursor = segments[-1][0] + os.path.getsize(segments[-1][1])
+                self._cursor_segment = None
+                return None
+            changes = []
+            for base, path in segments:
+                end = base + os.path.getsize(path)
+                if end <= self._cursor:
+                    continue
+                with open(path, 'rb') as f:
+                    f.seek(self._cursor - base)
+                    data = f.read(end - self._cursor)
+                # A write may be in progress; leave a partial last line for next time
+                complete = data.rfind(b'\n') + 1
+                for end, (writer, entity, op, key, doc) in _entries(data[:complete]):
+                    if entity != _JOURNAL:
+                        changes.append((self._cursor + end, entity, op, key, doc, writer == self._writer))
+                self._cursor += complete
+                if complete < len(data):
+                    break
+            self._cursor_segment = next(
+                ((base, path) for base, path in reversed(segments) if base <= self._cursor), None)
+        return changes
+
+    # Compaction
+
+    def _start_compaction(self):
+        # At most one attempt per minute per worker; compact() itself takes a lock
+        now = time.monotonic()
+        if now - self._compacting_since < 60:
+            return
+        self._compacting_since = now
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'compact', self.directory],
+                         stdin=subprocess.DEVNULL, start_new_session=True)
+
+    def compact(self):
+        """Fold the journal into a new snapshot; returns its position, or None if one is running"""
+        with _flock(os.path.join(self.directory, 'compact.lock'), blocking=False) as compacting:
+            if not compacting.acquired:
+                return None
+            with _flock(self._lock_path):
+                segments = self._segments()
+                position = segments[-1][0] + os.path.getsize(segments[-1][1]) if segments else 0
+                if segments and position > segments[-1][0]:
+                    # Tell workers tailing the old segment to look for the new one
+                    with open(segments[-1][1], 'ab') as f:
+                        f.write(json_codec.dumps([None, _JOURNAL, 'rotate', None, None]) + b'\n')
+                    position = segments[-1][0] + os.path.getsize(segments[-1][1])
+                    open(self._segment_path(position), 'ab').close()
+
+            previous = snapshot.Snapshot(self._snapshot_path)
+            if position <= previous.change_seq:
+                return previous.change_seq
+            state = _State.from_snapshot(previous)
+            state.replay([(base, path) for base, path in segments if base < position], stop=position)
+            clients, portfolios, recommendations = state.dataset()
+            snapshot.write(self._snapshot_path, clients, portfolios, recommendations, position)
+
+            # Keep the segments since the previous snapshot for workers still catching up
+            for base, path in self._segments():
+                if base + os.path.getsize(path) <= previous.change_seq and base < position:
+                    os.remove(path)
+            return position
+
+    # Helpers
+
+    def _segments(self):
+        """`(position, path)` of every segment, oldest first"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+                base = int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)], 16)
+                segments.append((base, os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _segment_path(self, position):
+        return os.path.join(self.directory, f'{_SEGMENT_PREFIX}{position:016x}{_SEGMENT_SUFFIX}')
+
+    def _snapshot_seq(self):
+        try:
+            return snapshot.Snapshot(self._snapshot_path).change_seq
+        except (OSError, ValueError):
+            return 0
+
+    def _dataset_id(self):
+        path = os.path.join(self.directory, 'dataset_id')
+        try:
+            with open(path) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            dataset_id = uuid.uuid4().hex[:8]
+            with open(path, 'w') as f:
+                f.write(dataset_id)
+            return dataset_id
+
+    def _fix_client_seq(self, clients):
+        # The counter is not fsynced, so never trust it below an id already journaled
+        path = os.path.join(self.directory, 'client_seq')
+        highest = max((int(cid[1:]) for cid in clients if cid[1:].isdigit()), default=0)
+        if _read_int(path) < highest:
+            _write_int(path, highest)
+
+
+class _State:
+    """Plain-data dataset used to replay the journal onto a snapshot"""
+
+    def __init__(self, clients, portfolios, recommendations, position):
+        self.clients = clients
+        self.portfolios = portfolios
+        self.recommendations = recommendations
+        self.position = position
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        # Journal entries never touch portfolios, so they stay in the mapped file
+        return cls({record['id']: record for record in snap.clients()},
+                   snapshot.Overlay(snap.portfolios),
+                   {record['id']: record for record in snap.recommendations()},
+                   snap.change_seq)
+
+    def replay(self, segments, stop=None):
+        """Apply every complete entry after `position`; returns the position reached"""
+        for base, path in segments:
+            with open(path, 'rb') as f:
+                data = f.read()
+            end = base + len(data)
+            if end <= self.position:
+                continue
+            data = data[max(self.position - base, 0):]
+            if stop is not None:
+                data = data[:max(stop - max(self.position, base), 0)]
+            complete = data.rfind(b'\n') + 1
+            for _, (_, entity, op, key, doc) in _entries(data[:complete]):
+                self.apply(entity, op, key, doc)
+            self.position = max(self.position, base) + complete
+        return self.position
+
+    def apply(self, entity, op, key, doc):
+        if entity == 'client' and op == 'insert':
+            self.clients[key] = doc
+        elif entity == 'client' and op == 'delete':
+            self.clients.pop(key, None)
+        elif entity == 'recommendation':
+            self.recommendations[key] = doc
+
+    def dataset(self):
+        return list(self.clients.values()), self.portfolios, list(self.recommendations.values())
+
+
+def _entries(data):
+    """`(end, entry)` for each decoded journal line, `end` being the offset just past it
+
+    Blank and torn lines are skipped.
+    """
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start) + 1 or len(data)
+        line = data[start:end].rstrip(b'\n')
+        start = end
+        if not line:
+            continue
+        try:
+            yield end, json_codec.loads(line)
+        except ValueError:
+            log.warning('Skipping unreadable journal entry (%d bytes)', len(line))
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_int(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+def _after_fork_in_child():
+    for storage in list(_open_journals):
+        storage._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != 'compact':
+        print('usage: python journal.py compact DIR', file=sys.stderr)
+        return 2
+    position = JournalStorage(argv[1]).compact()
+    print('compaction already running' if position is None else f'compacted at position {position}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""JSON encoding for API responses.
+
+Uses orjson when it is installed and falls back to the stdlib encoder
+otherwise; both produce compact UTF-8 bytes. FastJSONProvider plugs the
+encoder into Flask so `jsonify` uses it everywhere, and SerializedCache
+keeps pre-encoded bodies for records that rarely change.
+
+ClientRecord goes through `default`, i.e. a `to_dict` per record, which is
+several times slower than encoding plain dicts; listings and streams reuse
+each record's encoding from SerializedCache instead (see app.client_json).
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+from flask.json.provider import DefaultJSONProvider
+
+from client_record import ClientRecord
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, see requirements.txt
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def default(obj):
+    """Encode the types the JSON libraries don't know, ClientRecord included"""
+    if isinstance(obj, ClientRecord):
+        return obj.to_dict()
+    return DefaultJSONProvider.default(obj)
+
+
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=default)
+
+
+def dumps(obj):
+    """Encode `obj` as compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+    return _stdlib_encoder.encode(obj).encode('utf-8')
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by `dumps` above
+
+    Pretty-printing (debug mode or `compact = False`) and explicit keyword
+    arguments still go through the stdlib encoder.
+    """
+
+    sort_keys = False
+    default = staticmethod(default)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b'\n', mimetype=self.mimetype)
+
+
+class SerializedCache:
+    """Bounded LRU of pre-encoded JSON keyed by e.g. ('client', id)
+
+    `get` gives a ready response body; `get_many` gives the bare encodings
+    of many objects for a caller to join into a listing. Callers must
+    `invalidate` a key whenever the object behind it changes.
+    """
+
+    def __init__(self, maxsize=50000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, obj):
+        """Response body for `key` (JSON plus a newline), encoding `obj` on a miss"""
+        return self.get_many([key], [obj])[0] + b'\n'
+
+    def get_many(self, keys, objs):
+        """Encoded JSON for each key, encoding the matching object of each miss
+
+        A batch larger than the cache is encoded without being cached, as it
+        would only evict itself.
+        """
+        entries = self._entries
+        with self._lock:
+            encoded = [entries.get(key) for key in keys]
+            for key, body in zip(keys, encoded):
+                if body is not None:
+                    entries.move_to_end(key)
+        misses = [i for i, body in enumerate(encoded) if body is None]
+        if not misses:
+            return encoded
+        for i in misses:
+            encoded[i] = dumps(objs[i])
+        if len(keys) <= self.maxsize:
+            with self._lock:
+                for i in misses:
+                    entries[keys[i]] = encoded[i]
+                while len(entries) > self.maxsize:
+                    entries.popitem(last=False)
+        return encoded
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
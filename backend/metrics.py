@@ -0,0 +1,285 @@
+"""Prometheus-style instrumentation for the API.
+
+Counters, gauges and histograms keep one shard per thread: a thread only
+ever writes its own shard, so recording a request is a few dict updates
+with no lock taken. Shards are summed when /api/metrics is scraped. Servers
+that start a thread per request (or recycle their pool) would leave a shard
+behind for every thread that ever ran, so the shards of finished threads
+are folded into one base total whenever a new shard is added or the
+metrics are scraped. Values
+that already exist elsewhere (dataset sizes, RSS, GC stats) are read
+through callbacks at scrape time instead of being tracked.
+
+Metrics are per worker process, like everything else in memory; Prometheus
+aggregates across workers when scraping each one.
+"""
+
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+START_TIME = time.time()
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class _Sharded:
+    """Base for metrics whose values live in per-thread shards"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._base = {}
+        self._shards = []  # (owning thread, shard)
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._fold_finished()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_finished(self):
+        # Called with the lock held; a finished thread never writes its shard again
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._base, shard)
+        self._shards = live
+
+    def _snapshot(self):
+        with self._lock:
+            self._fold_finished()
+            shards = [self._base] + [shard for _, shard in self._shards]
+            return [self._copy(shard) for shard in shards]
+
+    def _copy(self, shard):
+        return dict(shard)
+
+    def _merge(self, total, shard):
+        for labels, value in shard.items():
+            total[labels] = total.get(labels, 0) + value
+
+
+class Counter(_Sharded):
+    """Monotonic count, e.g. requests served"""
+
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for shard in self._snapshot():
+            self._merge(totals, shard)
+        return [(self.name, labels, value) for labels, value in totals.items()]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Sharded):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, then +Inf, sum and count
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def _copy(self, shard):
+        return {labels: list(state) for labels, state in list(shard.items())}
+
+    def _merge(self, total, shard):
+        for labels, state in shard.items():
+            current = total.get(labels)
+            total[labels] = list(state) if current is None else [a + b for a, b in zip(current, state)]
+
+    def collect(self):
+        totals = {}
+        for shard in self._snapshot():
+            self._merge(totals, shard)
+        samples = []
+        for labels, state in totals.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), state):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', labels + (('le', _format_bound(bound)),), cumulative))
+            samples.append((f'{self.name}_sum', labels, state[-2]))
+            samples.append((f'{self.name}_count', labels, state[-1]))
+        return samples
+
+
+class CallbackGauge:
+    """Gauge read from a function at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, func, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.labelnames = tuple(labelnames)
+
+    def collect(self):
+        value = self.func()
+        if isinstance(value, dict):
+            return [(self.name, labels, v) for labels, v in value.items()]
+        return [(self.name, (), value)]
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter read from a function at scrape time, e.g. a cache's hit count"""
+
+    kind = 'counter'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, buckets, labelnames=()):
+        return self.register(Histogram(name, help_text, buckets, labelnames))
+
+    def gauge_callback(self, name, help_text, func, labelnames=()):
+        return self.register(CallbackGauge(name, help_text, func, labelnames))
+
+    def counter_callback(self, name, help_text, func, labelnames=()):
+        return self.register(CallbackCounter(name, help_text, func, labelnames))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            names = metric.labelnames
+            for sample_name, labels, value in metric.collect():
+                pairs = [(names[i], v) for i, v in enumerate(labels) if not isinstance(v, tuple)]
+                pairs += [v for v in labels if isinstance(v, tuple)]
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+                lines.append(f'{sample_name}{{{label_text}}} {_format_value(value)}' if label_text
+                             else f'{sample_name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_bound(bound):
+    return bound if isinstance(bound, str) else repr(float(bound))
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def rss_bytes():
+    """Current resident set size, or the peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def uptime_seconds():
+    return time.time() - START_TIME
+
+
+def _gc_collections():
+    return {(str(generation),): stats['collections'] for generation, stats in enumerate(gc.get_stats())}
+
+
+def _gc_objects():
+    return {(str(generation),): count for generation, count in enumerate(gc.get_count())}
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    'aivest_http_requests_total', 'HTTP requests served', ('method', 'route', 'status'))
+request_duration = registry.histogram(
+    'aivest_http_request_duration_seconds', 'Time to produce a response', LATENCY_BUCKETS, ('method', 'route'))
+response_size = registry.histogram(
+    'aivest_http_response_size_bytes', 'Response body size (streamed bodies excluded)', SIZE_BUCKETS, ('route',))
+requests_in_flight = registry.gauge(
+    'aivest_http_requests_in_flight', 'Requests currently being handled', ('route',))
+
+registry.gauge_callback('process_resident_memory_bytes', 'Resident set size', rss_bytes)
+registry.gauge_callback('process_peak_resident_memory_bytes', 'Peak resident set size', peak_rss_bytes)
+registry.gauge_callback('process_start_time_seconds', 'Unix time the process started', lambda: START_TIME)
+registry.gauge_callback('process_threads', 'Threads in this process', threading.active_count)
+registry.gauge_callback('python_gc_collections', 'GC runs per generation', _gc_collections, ('generation',))
+registry.gauge_callback('python_gc_objects_pending', 'Allocations counted towards the next GC, per generation',
+                        _gc_objects, ('generation',))
+
+
+def request_started(route):
+    requests_in_flight.inc((route,))
+
+
+def request_finished(route):
+    requests_in_flight.dec((route,))
+
+
+def observe_request(method, route, status, duration, size=None):
+    """Record one finished request (duration in seconds, size in bytes)"""
+    requests_total.inc((method, route, str(status)))
+    request_duration.observe(duration, (method, route))
+    if size is not None:
+        response_size.observe(size, (route,))
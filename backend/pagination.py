@@ -0,0 +1,57 @@
+"""Limit/cursor helpers for paginated client listings."""
+
+import base64
+import json
+import math
+
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+
+# Sort fields whose index keys are numbers; the other fields sort by strings
+NUMERIC_FIELDS = ('aum',)
+# Key every entry of the store-order index shares
+STORE_ORDER_KEY = 0
+
+
+def parse_limit(value):
+    """Parse a `limit` query parameter; None when absent"""
+    if value is None or value == '':
+        return None
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(scope, after):
+    """Opaque cursor token for a `(key, position)` place in an ordering
+
+    `scope` names the ordering (e.g. "aum:desc") so a cursor can't be
+    replayed against a differently sorted listing.
+    """
+    key, position = after
+    raw = json.dumps([scope, key, position], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, scope):
+    """Inverse of encode_cursor; None when no cursor was given"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_scope, key, position = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError('malformed cursor')
+    if cursor_scope != scope or type(position) is not int or not _valid_key(key, scope):
+        raise ValueError('cursor does not belong to this listing')
+    return key, position
+
+
+def _valid_key(key, scope):
+    """True when `key` can be compared with the index keys of `scope`"""
+    if scope == 'store':
+        return type(key) is int and key == STORE_ORDER_KEY
+    if scope.split(':', 1)[0] in NUMERIC_FIELDS:
+        return isinstance(key, (int, float)) and not isinstance(key, bool) and math.isfinite(key)
+    return isinstance(key, str)
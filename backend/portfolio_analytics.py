@@ -0,0 +1,213 @@
+"""Book-wide portfolio analytics over a columnar (NumPy) copy of the portfolios.
+
+`portfolio_data` keeps one nested dict per client, which is what
+`get_portfolio` returns. For aggregates the same numbers are also held
+column by column in NumPy arrays, one row per portfolio, so totals,
+AUM-weighted averages and percentiles are single vectorized operations
+instead of Python loops over every portfolio.
+
+Categorical columns (domicile, risk profile) are stored as integer codes
+into a small list of distinct values. Deleted clients are masked out
+rather than compacted, and rows are appended into arrays that grow by
+doubling.
+
+NumPy is optional; without it `AVAILABLE` is False and the /api/analytics
+endpoints answer 503.
+"""
+
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # optional, see requirements.txt
+    np = None
+
+AVAILABLE = np is not None
+
+RISK_METRICS = ('sharpeRatio', 'volatility', 'maxDrawdown', 'beta')
+PERFORMANCE_METRICS = ('ytd', 'oneYear', 'threeYear')
+GROUP_FIELDS = ('domicile', 'riskProfile')
+DISTRIBUTION_METRICS = ('aum',) + RISK_METRICS + PERFORMANCE_METRICS
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+_INITIAL_CAPACITY = 1024
+
+
+class _Categories:
+    """Distinct values of one categorical column and their integer codes"""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class PortfolioAnalytics:
+    """Columnar store of portfolios with vectorized book-wide aggregates
+
+    Writers take a lock; readers take a consistent snapshot of the row count
+    and array references under it and compute outside it.
+    """
+
+    def __init__(self, clients=(), portfolios=None):
+        portfolios = portfolios or {}
+        self._rows = {}
+        self._size = 0
+        self._asset_classes = _Categories()
+        self._groups = {field: _Categories() for field in GROUP_FIELDS}
+        self._lock = threading.Lock()
+        self._allocate(max(_INITIAL_CAPACITY, len(portfolios)))
+        for client in clients:
+            portfolio = portfolios.get(client['id'])
+            if portfolio:
+                self.add(client, portfolio)
+
+    def __len__(self):
+        return int(self._alive[:self._size].sum())
+
+    def _allocate(self, capacity, asset_classes=8):
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._aum = np.zeros(capacity)
+        self._metrics = {name: np.full(capacity, np.nan) for name in RISK_METRICS + PERFORMANCE_METRICS}
+        self._codes = {field: np.zeros(capacity, dtype=np.int32) for field in GROUP_FIELDS}
+        self._allocations = np.zeros((capacity, asset_classes))
+
+    def _grow(self, rows, asset_classes):
+        """Reallocate into larger arrays, keeping the first `_size` rows"""
+        old = (self._alive, self._aum, self._metrics, self._codes, self._allocations)
+        n = self._size
+        self._allocate(rows, asset_classes)
+        self._alive[:n] = old[0][:n]
+        self._aum[:n] = old[1][:n]
+        for name, column in old[2].items():
+            self._metrics[name][:n] = column[:n]
+        for field, column in old[3].items():
+            self._codes[field][:n] = column[:n]
+        self._allocations[:n, :old[4].shape[1]] = old[4][:n]
+
+    def add(self, client, portfolio):
+        """Append (or replace) the row for a client's portfolio"""
+        allocations = portfolio.get('allocations', ())
+        with self._lock:
+            row = self._rows.get(client['id'])
+            capacity, width = self._allocations.shape
+            full = row is None and self._size >= capacity
+            needed = len(self._asset_classes.values) + len(allocations)
+            if full or needed > width:
+                self._grow(capacity * 2 if full else capacity, max(width * 2, needed) if needed > width else width)
+            if row is None:
+                row = self._rows[client['id']] = self._size
+                self._size += 1
+
+            self._alive[row] = True
+            self._aum[row] = portfolio.get('totalValue', client.get('aum', 0))
+            self._allocations[row] = 0.0
+            for column in self._metrics.values():
+                column[row] = np.nan
+            for allocation in allocations:
+                column = self._asset_classes.code(allocation['assetClass'])
+                self._allocations[row, column] += allocation.get('value', 0)
+            for section in ('riskMetrics', 'performance'):
+                for name, value in portfolio.get(section, {}).items():
+                    if name in self._metrics and value is not None:
+                        self._metrics[name][row] = value
+            for field, categories in self._groups.items():
+                self._codes[field][row] = categories.code(client.get(field))
+
+    def remove(self, client_id):
+        """Exclude a client's portfolio from every aggregate"""
+        with self._lock:
+            row = self._rows.get(client_id)
+            if row is not None:
+                self._alive[row] = False
+
+    def _snapshot(self):
+        with self._lock:
+            n = self._size
+            return {
+                'alive': self._alive[:n],
+                'aum': self._aum[:n],
+                'metrics': {name: column[:n] for name, column in self._metrics.items()},
+                'codes': {field: column[:n] for field, column in self._codes.items()},
+                'allocations': self._allocations[:n, :len(self._asset_classes.values)],
+                'asset_classes': list(self._asset_classes.values),
+                'groups': {field: list(c.values) for field, c in self._groups.items()},
+            }
+
+    def allocation_totals(self):
+        """Total value per asset class across the book"""
+        snap = self._snapshot()
+        totals = snap['allocations'][snap['alive']].sum(axis=0)
+        book_total = float(totals.sum())
+        by_class = [
+            {
+                'assetClass': asset_class,
+                'value': float(value),
+                'percentage': round(float(value) / book_total * 100, 4) if book_total else 0.0,
+            }
+            for asset_class, value in zip(snap['asset_classes'], totals)
+        ]
+        by_class.sort(key=lambda item: item['value'], reverse=True)
+        return {
+            'portfolios': int(snap['alive'].sum()),
+            'totalValue': book_total,
+            'assetClasses': by_class,
+        }
+
+    def weighted_risk(self):
+        """AUM-weighted risk metrics across the book"""
+        snap = self._snapshot()
+        alive, aum = snap['alive'], snap['aum']
+        result = {'portfolios': int(alive.sum()), 'totalAUM': float(aum[alive].sum())}
+        for name in RISK_METRICS:
+            values = snap['metrics'][name]
+            mask = alive & ~np.isnan(values)
+            weights = aum[mask]
+            total = weights.sum()
+            result[name] = round(float(np.dot(values[mask], weights) / total), 6) if total else None
+        return result
+
+    def distribution(self, by, metric, percentiles=DEFAULT_PERCENTILES):
+        """Percentiles of `metric` within each `by` group (domicile or riskProfile)"""
+        if by not in GROUP_FIELDS:
+            raise ValueError(f'by must be one of {", ".join(GROUP_FIELDS)}')
+        if metric not in DISTRIBUTION_METRICS:
+            raise ValueError(f'metric must be one of {", ".join(DISTRIBUTION_METRICS)}')
+        snap = self._snapshot()
+        values = snap['aum'] if metric == 'aum' else snap['metrics'][metric]
+        mask = snap['alive'] & ~np.isnan(values)
+        codes, values = snap['codes'][by][mask], values[mask]
+
+        # One sort by (group, value); each group is then a contiguous sorted run
+        order = np.lexsort((values, codes))
+        codes, values = codes[order], values[order]
+        group_codes, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+
+        groups = []
+        for code, start, count in zip(group_codes, starts, counts):
+            run = values[start:start + count]
+            points = np.percentile(run, percentiles)
+            groups.append({
+                by: snap['groups'][by][code],
+                'count': int(count),
+                'mean': round(float(run.mean()), 6),
+                'percentiles': {f'p{p:g}': round(float(v), 6) for p, v in zip(percentiles, points)},
+            })
+        groups.sort(key=lambda group: group['count'], reverse=True)
+        return {'by': by, 'metric': metric, 'groups': groups}
+
+
+def parse_percentiles(value):
+    """Comma-separated percentiles (0-100), or the defaults; raises ValueError"""
+    if not value:
+        return DEFAULT_PERCENTILES
+    percentiles = tuple(float(p) for p in value.split(','))
+    if not all(0 <= p <= 100 for p in percentiles):
+        raise ValueError('percentiles must be between 0 and 100')
+    return percentiles
@@ -0,0 +1,87 @@
+"""Indexed store for persisted (static and actioned) recommendations."""
+
+from concurrency import SeqLock
+
+
+class RecommendationRepository:
+    """Recommendations indexed by id, by client and by status
+
+    Per-client and per-status indexes are dicts used as ordered sets, so
+    listings keep insertion order like the list this replaced. `upsert`
+    replaces a recommendation when its id already exists, so actioning the
+    same recommendation repeatedly never adds copies.
+
+    Stored dicts are never modified: an update stores a new dict, so one
+    already handed to a reader keeps the state it was read in. Writes are
+    serialized and reads retry around them, as in ClientStore.
+    """
+
+    def __init__(self, records=()):
+        self._by_id = {}
+        self._by_client = {}
+        self._by_status = {}
+        self._lock = SeqLock()
+        for record in records:
+            self.upsert(record)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def get(self, rec_id):
+        """Return the recommendation with this id, or None"""
+        return self._by_id.get(rec_id)
+
+    def has_client(self, client_id):
+        """True when any recommendation is stored for this client"""
+        return client_id in self._by_client
+
+    def for_client(self, client_id, status=None):
+        """Recommendations stored for a client, optionally with one status"""
+        return self._lock.read(self._for_client, client_id, status)
+
+    def _for_client(self, client_id, status):
+        if status is None:
+            ids = self._by_client.get(client_id, ())
+        else:
+            ids = self._by_status.get(status, {}).get(client_id, ())
+        return [self._by_id[rec_id] for rec_id in ids]
+
+    def upsert(self, record):
+        """Insert a recommendation or merge `record` into the stored one
+
+        Returns the stored recommendation and the status it had before
+        (None for a new recommendation).
+        """
+        rec_id = record['id']
+        with self._lock.writing():
+            stored = self._by_id.get(rec_id)
+            if stored is None:
+                stored = self._by_id[rec_id] = dict(record)
+                self._by_client.setdefault(stored['clientId'], {})[rec_id] = None
+                self._index_status(stored)
+                return stored, None
+
+            previous_status = stored.get('status')
+            updated = self._by_id[rec_id] = {**stored, **record}
+            if updated.get('status') != previous_status:
+                self._unindex_status(stored)
+                self._index_status(updated)
+            return updated, previous_status
+
+    def _index_status(self, record):
+        status = record.get('status')
+        by_client = self._by_status.setdefault(status, {})
+        by_client.setdefault(record['clientId'], {})[record['id']] = None
+
+    def _unindex_status(self, record):
+        status = record.get('status')
+        by_client = self._by_status[status]
+        ids = by_client[record['clientId']]
+        del ids[record['id']]
+        if not ids:
+            del by_client[record['clientId']]
+        if not by_client:
+            del self._by_status[status]
@@ -0,0 +1,68 @@
+"""Result cache for /api/clients/search."""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+# Normalized search parameters (see app.search_params): two requests for the
+# same search give equal values, whatever the order or repetition of the
+# list parameters and the case of `q`
+SearchParams = namedtuple('SearchParams', 'q segments domiciles risk_profiles sort_by reverse min_aum max_aum')
+
+
+class SearchCache:
+    """Bounded LRU of encoded search results, each tagged with a collection version
+
+    Values are stored together with the version of the client collection
+    they were computed from (`VersionRegistry.collection_etag()`, bumped on
+    every create and delete). A lookup under any other version is a miss
+    and drops the entry, so a result is never served once the collection
+    has changed. Callers read the version before computing a result, so a
+    write that lands mid-computation leaves the entry tagged with the old
+    version.
+    """
+
+    def __init__(self, maxsize=1024, max_bytes=32 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        """The value cached for `key` at `version`, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, version, value, size):
+        """Cache `value` (taking up about `size` bytes) for `key` at `version`"""
+        if size > self.max_bytes // 8:
+            return  # a result this large would push out most of the others
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (version, value, size)
+            self.bytes += size
+            while len(self._entries) > self.maxsize or self.bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
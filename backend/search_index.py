@@ -0,0 +1,125 @@
+"""Inverted text index backing /api/clients/search."""
+
+from client_record import shared
+
+GRAM_SIZE = 3
+
+
+class TextIndex:
+    """Substring search over client text fields without scanning every record.
+
+    Each searchable field (name, segments, description, domicile and risk
+    profile) is lower-cased once and split on whitespace into terms. Postings
+    map a term to the ids containing it, and a small n-gram index over the
+    term vocabulary finds every term containing a query word, so partial
+    words ("ross", "vik") match just like the old `q in field` checks did.
+    """
+
+    def __init__(self):
+        self._fields = {}
+        self._postings = {}
+        self._grams = {}
+
+    def __len__(self):
+        return len(self._fields)
+
+    def add(self, record, fields=None):
+        """Index the searchable fields of a client record
+
+        `fields` is `searchable_fields(record)` when the caller already
+        computed it.
+        """
+        client_id = record['id']
+        if fields is None:
+            fields = searchable_fields(record)
+        self._fields[client_id] = fields
+        for term in _terms(fields):
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = set()
+                for gram in _grams(term):
+                    self._grams.setdefault(gram, set()).add(term)
+            ids.add(client_id)
+
+    def remove(self, client_id):
+        """Drop a client from the index"""
+        fields = self._fields.pop(client_id, None)
+        if fields is None:
+            return
+        for term in _terms(fields):
+            ids = self._postings[term]
+            ids.discard(client_id)
+            if ids:
+                continue
+            del self._postings[term]
+            for gram in _grams(term):
+                terms = self._grams[gram]
+                terms.discard(term)
+                if not terms:
+                    del self._grams[gram]
+
+    def search(self, query):
+        """Ids of clients with `query` as a substring of any searchable field
+
+        `query` must already be lower-cased and stripped, as the search route
+        does with the `q` parameter.
+        """
+        words = query.split()
+        if not words:
+            return set(self._fields)
+
+        result = None
+        for word in sorted(words, key=len, reverse=True):
+            ids = self._ids_containing(word)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+
+        if len(words) == 1 and words[0] == query:
+            # A single whitespace-free word matches a field exactly when it
+            # matches one of the field's terms, so no verification is needed
+            return result
+        return {cid for cid in result if any(query in f for f in self._fields[cid])}
+
+    def _ids_containing(self, word):
+        ids = set()
+        for term in self._terms_containing(word):
+            ids |= self._postings[term]
+        return ids
+
+    def _terms_containing(self, word):
+        if len(word) <= GRAM_SIZE:
+            return self._grams.get(word, ())
+
+        terms = None
+        for i in range(len(word) - GRAM_SIZE + 1):
+            matches = self._grams.get(word[i:i + GRAM_SIZE])
+            if not matches:
+                return ()
+            terms = set(matches) if terms is None else terms & matches
+        return [term for term in terms if word in term]
+
+
+def searchable_fields(record):
+    """Lower-cased text of a record's searchable fields, as the index stores it"""
+    # Categorical values repeat across clients, so their lower-cased forms are shared
+    return (
+        record['name'].lower(),
+        *(shared(segment.lower()) for segment in record.get('segments', [])),
+        record.get('description', '').lower(),
+        shared(record['domicile'].lower()),
+        shared(record['riskProfile'].lower()),
+    )
+
+
+def _terms(fields):
+    return {term for field in fields for term in field.split()}
+
+
+def _grams(term):
+    """Every substring of `term` up to GRAM_SIZE characters long"""
+    return {
+        term[start:start + size]
+        for size in range(1, GRAM_SIZE + 1)
+        for start in range(len(term) - size + 1)
+    }
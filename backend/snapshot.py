@@ -0,0 +1,322 @@
+"""Read-only dataset snapshot memory-mapped by every worker.
+
+A snapshot is one file holding the clients, portfolios and recommendations
+as pre-encoded JSON records, with offset tables so any record can be found
+without parsing the rest. Workers map it read-only, so the records live in
+the page cache once per host instead of once per worker, and portfolios are
+served from it without ever being decoded into Python objects.
+
+Layout (integers are native-endian uint64, sections 8-byte aligned):
+
+    MAGIC | header length | header JSON | sections...
+
+    section: offsets[count + 1] | data
+    keyed section: offsets[count + 1] | key offsets[count + 1] | slots | keys | data
+
+Keyed sections are looked up through `slots`, an open-addressing hash table
+of record numbers (plus one; 0 is empty) at the CRC-32 of the key, which
+unlike `hash()` is the same in every process. The header records each
+section's position and `changeSeq`, the storage change log position the
+snapshot was taken at.
+
+`write` builds the file under a temporary name and renames it over the old
+one, so readers see either the old or the new snapshot, never a partial
+one; a worker holding the old mapping keeps using it until it reloads.
+
+Build or refresh a snapshot from the configured storage with
+
+    python snapshot.py [path]
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping, MutableMapping
+from datetime import datetime
+
+import json_codec
+
+MAGIC = b'AIVSNAP1'
+FORMAT_VERSION = 1
+
+_LENGTH = struct.Struct('=Q')
+_DELETED = object()
+
+
+def snapshot_path():
+    """Snapshot file from AIVEST_SNAPSHOT_PATH, or None when snapshots are off"""
+    return os.getenv('AIVEST_SNAPSHOT_PATH') or None
+
+
+def write(path, clients, portfolios, recommendations, change_seq=0):
+    """Write a snapshot of the dataset to `path`, replacing any existing one atomically"""
+    sections = [
+        ('clients', [json_codec.dumps(record) + b'\n' for record in clients], None),
+        ('recommendations', [json_codec.dumps(record) + b'\n' for record in recommendations], None),
+    ]
+    keys = list(portfolios)
+    # Portfolios from another snapshot are copied without decoding them
+    raw = getattr(portfolios, 'raw', None) or (lambda key: None)
+    sections.append(('portfolios', [raw(key) or json_codec.dumps(portfolios[key]) + b'\n' for key in keys],
+                     [key.encode('utf-8') for key in keys]))
+
+    header = {
+        'format': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'createdAt': datetime.now().isoformat(),
+        'changeSeq': change_seq,
+        'sections': {},
+    }
+    blobs = []
+    for name, records, section_keys in sections:
+        blob = _offsets(records)
+        slots = 0
+        if section_keys is not None:
+            table = _hash_table(section_keys)
+            slots = len(table)
+            blob += _offsets(section_keys) + table.tobytes() + _pad(b''.join(section_keys))
+        blobs.append((name, len(records), slots, blob + b''.join(records)))
+
+    # Section offsets depend on the header length, which depends on the offsets
+    header_size = 0
+    while True:
+        position = _align(len(MAGIC) + _LENGTH.size + header_size)
+        for name, count, slots, blob in blobs:
+            header['sections'][name] = {'offset': position, 'count': count, 'slots': slots}
+            position = _align(position + len(blob))
+        encoded = json.dumps(header).encode('utf-8')
+        if len(encoded) == header_size:
+            break
+        header_size = len(encoded)
+
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + _LENGTH.pack(len(encoded)) + encoded)
+            for _, _, _, blob in blobs:
+                f.write(b'\0' * (_align(f.tell()) - f.tell()))
+                f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _offsets(records):
+    offsets = array('Q', [0])
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    return offsets.tobytes()
+
+
+def _hash_table(keys):
+    """Slots (a power of two, at most half full) holding record number + 1"""
+    size = 8
+    while size < 2 * len(keys):
+        size *= 2
+    table = array('Q', bytes(8 * size))
+    for i, key in enumerate(keys):
+        slot = zlib.crc32(key) & (size - 1)
+        while table[slot]:
+            slot = (slot + 1) & (size - 1)
+        table[slot] = i + 1
+    return table
+
+
+def _align(position):
+    return (position + 7) & ~7
+
+
+def _pad(blob):
+    return blob + b'\0' * (_align(len(blob)) - len(blob))
+
+
+class Snapshot:
+    """A snapshot file mapped read-only into this process"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a dataset snapshot')
+        (size,) = _LENGTH.unpack_from(self._map, len(MAGIC))
+        start = len(MAGIC) + _LENGTH.size
+        self.header = json.loads(self._map[start:start + size])
+        if self.header.get('format') != FORMAT_VERSION or self.header.get('byteorder') != sys.byteorder:
+            raise ValueError(f'{path} was written in an incompatible snapshot format')
+        self.change_seq = self.header['changeSeq']
+        self._view = memoryview(self._map)
+        self.portfolios = SnapshotMapping(self._section('portfolios'))
+
+    def clients(self):
+        """Client records in store order"""
+        return self._section('clients').records()
+
+    def recommendations(self):
+        """Recommendation records in store order"""
+        return self._section('recommendations').records()
+
+    def is_current(self):
+        """False once another snapshot has been renamed over this one's path"""
+        try:
+            return os.stat(self.path).st_ino == self.inode
+        except FileNotFoundError:
+            return True
+
+    def _section(self, name):
+        info = self.header['sections'][name]
+        return _Section(self._view, info['offset'], info['count'], info['slots'])
+
+
+class _Section:
+    def __init__(self, view, offset, count, slots):
+        table = 8 * (count + 1)
+        self.count = count
+        self.offsets = view[offset:offset + table].cast('Q')
+        position = offset + table
+        if slots:
+            self.key_offsets = view[position:position + table].cast('Q')
+            position += table
+            self.slots = view[position:position + 8 * slots].cast('Q')
+            self.mask = slots - 1
+            position += 8 * slots
+            self.keys = view[position:position + self.key_offsets[count]]
+            position = _align(position + self.key_offsets[count])
+        self.data = view[position:position + self.offsets[count]]
+
+    def raw(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def key(self, i):
+        return str(self.keys[self.key_offsets[i]:self.key_offsets[i + 1]], 'utf-8')
+
+    def find(self, key):
+        """Record number for `key`, or None"""
+        encoded = key.encode('utf-8')
+        slot = zlib.crc32(encoded) & self.mask
+        while True:
+            entry = self.slots[slot]
+            if not entry:
+                return None
+            i = entry - 1
+            if self.keys[self.key_offsets[i]:self.key_offsets[i + 1]] == encoded:
+                return i
+            slot = (slot + 1) & self.mask
+
+    def records(self):
+        for i in range(self.count):
+            yield json_codec.loads(self.raw(i))
+
+
+class SnapshotMapping(Mapping):
+    """Keyed snapshot section: records decoded on access, bytes via `raw`"""
+
+    def __init__(self, section):
+        self._section = section
+
+    def _find(self, key):
+        return self._section.find(key) if isinstance(key, str) else None
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        return json_codec.loads(self._section.raw(i))
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __iter__(self):
+        return (self._section.key(i) for i in range(self._section.count))
+
+    def __len__(self):
+        return self._section.count
+
+    def raw(self, key):
+        """The encoded record (JSON plus newline) for `key`, or None"""
+        i = self._find(key)
+        return None if i is None else self._section.raw(i)
+
+
+class Overlay(MutableMapping):
+    """Copy-on-write view of a read-only mapping
+
+    Writes and deletes land in a per-process dict in front of the snapshot,
+    which itself is never modified.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self._changes = {}
+
+    def __getitem__(self, key):
+        if key in self._changes:
+            value = self._changes[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        return self.base[key]
+
+    def __contains__(self, key):
+        if key in self._changes:
+            return self._changes[key] is not _DELETED
+        return key in self.base
+
+    def __setitem__(self, key, value):
+        self._changes[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._changes[key] = _DELETED
+
+    def __iter__(self):
+        for key in self.base:
+            if key not in self._changes:
+                yield key
+        for key, value in self._changes.items():
+            if value is not _DELETED:
+                yield key
+
+    def __len__(self):
+        size = len(self.base)
+        for key, value in self._changes.items():
+            if key in self.base:
+                size -= value is _DELETED
+            else:
+                size += value is not _DELETED
+        return size
+
+    def raw(self, key):
+        """Encoded bytes from the snapshot, or None if the key was overwritten or is absent"""
+        if key in self._changes:
+            return None
+        return self.base.raw(key)
+
+
+def main(argv=None):
+    """Write a snapshot of the configured storage backend's dataset"""
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else snapshot_path()
+    if not path:
+        print('usage: python snapshot.py PATH (or set AIVEST_SNAPSHOT_PATH)', file=sys.stderr)
+        return 2
+    os.environ['AIVEST_SNAPSHOT_PATH'] = path
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app
+    app.write_snapshot()
+    print(f'snapshot written to {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
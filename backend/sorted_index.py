@@ -0,0 +1,163 @@
+"""Sorted secondary indexes over client fields."""
+
+from bisect import bisect_left, bisect_right, insort
+
+_AFTER_ANY_POSITION = float('inf')
+
+# Batch size from which add_many re-sorts instead of inserting one by one
+_BULK_THRESHOLD = 64
+
+
+class SortedIndex:
+    """Client ids kept ordered by a sort key, ties broken by insertion order.
+
+    Entries are `(key, position, id)` tuples in a list maintained with
+    bisect, so range lookups are two binary searches and ordered output is a
+    walk over a pre-sorted list. Keys are computed once per record (e.g. the
+    lower-cased name) rather than on every request.
+
+    Descending order keeps equal keys in insertion order, matching what
+    `list.sort(reverse=True)` does with a stable sort. A `(key, position)`
+    pair identifies a place in either order, which is what pagination
+    cursors carry.
+    """
+
+    def __init__(self, key_func):
+        self.key_func = key_func
+        self._entries = []
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, record, position):
+        """Index a record inserted at `position` in the store"""
+        key = self.key_func(record)
+        self._keys[record['id']] = (key, position)
+        insort(self._entries, (key, position, record['id']))
+
+    def add_many(self, records, first_position):
+        """Index records inserted at consecutive positions from `first_position`
+
+        Large batches are appended and the list re-sorted once; the sort
+        merges the two already-ordered runs instead of shifting the list
+        for every record.
+        """
+        batch = []
+        for position, record in enumerate(records, start=first_position):
+            key = self.key_func(record)
+            self._keys[record['id']] = (key, position)
+            batch.append((key, position, record['id']))
+        if len(batch) < _BULK_THRESHOLD:
+            for entry in batch:
+                insort(self._entries, entry)
+        else:
+            batch.sort()
+            self._entries.extend(batch)
+            self._entries.sort()
+
+    def remove(self, client_id):
+        """Drop a client from the index"""
+        key, position = self._keys.pop(client_id)
+        i = bisect_left(self._entries, (key, position))
+        if i == len(self._entries) or self._entries[i][2] != client_id:
+            # Keys that don't order consistently (NaN) defeat the binary search
+            i = next(i for i, entry in enumerate(self._entries) if entry[2] == client_id)
+        del self._entries[i]
+
+    def range_ids(self, low=None, high=None):
+        """Ids with low <= key <= high, in ascending key order"""
+        return [entry[2] for entry in self._walk(False, None, low, high)]
+
+    def page(self, reverse=False, after=None, limit=None, wanted=None,
+             low=None, high=None):
+        """Return up to `limit` entries in sort order
+
+        `after` is the `(key, position)` of the last entry already returned,
+        `wanted` restricts the result to a set of ids and `low`/`high` bound
+        the key inclusively. Entries are `(key, position, id)` tuples.
+        """
+        if wanted is not None and len(wanted) * 8 < len(self._entries):
+            entries = self._sorted_subset(wanted, reverse, after, low, high)
+            return entries if limit is None else entries[:limit]
+
+        result = []
+        for entry in self._walk(reverse, after, low, high):
+            if wanted is not None and entry[2] not in wanted:
+                continue
+            result.append(entry)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def _walk(self, reverse, after, low, high):
+        if (low is not None and low != low) or (high is not None and high != high):
+            return  # NaN bounds match nothing, as with plain comparisons
+
+        entries = self._entries
+        if not reverse:
+            i = 0 if low is None else bisect_left(entries, (low,))
+            if after is not None:
+                i = max(i, bisect_left(entries, (after[0], after[1] + 1)))
+            while i < len(entries):
+                entry = entries[i]
+                if high is not None and entry[0] > high:
+                    return
+                yield entry
+                i += 1
+            return
+
+        if high is None:
+            end = len(entries)
+        else:
+            end = bisect_right(entries, (high, _AFTER_ANY_POSITION))
+        if after is not None:
+            key, position = after
+            if low is not None and key < low:
+                return
+            if high is None or key <= high:
+                # Finish the cursor's own group of equal keys first
+                i = bisect_left(entries, (key, position + 1))
+                group_end = bisect_left(entries, (key, _AFTER_ANY_POSITION))
+                while i < group_end:
+                    yield entries[i]
+                    i += 1
+                end = min(end, bisect_left(entries, (key,)))
+        while end:
+            key = entries[end - 1][0]
+            if low is not None and key < low:
+                return
+            start = bisect_left(entries, (key,), 0, end)
+            for i in range(start, end):
+                yield entries[i]
+            end = start
+
+    def _sorted_subset(self, wanted, reverse, after, low, high):
+        keys = self._keys
+        entries = []
+        for cid in wanted:
+            found = keys.get(cid)
+            if found is None:
+                continue  # removed since `wanted` was computed
+            key, position = found
+            if low is not None and not key >= low:
+                continue
+            if high is not None and not key <= high:
+                continue
+            if after is not None and not _comes_after(key, position, after, reverse):
+                continue
+            entries.append((key, position, cid))
+
+        if not reverse:
+            entries.sort()
+        else:
+            entries.sort(key=lambda entry: entry[1])
+            entries.sort(key=lambda entry: entry[0], reverse=True)
+        return entries
+
+
+def _comes_after(key, position, after, reverse):
+    after_key, after_position = after
+    if key == after_key:
+        return position > after_position
+    return key < after_key if reverse else key > after_key
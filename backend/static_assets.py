@@ -0,0 +1,203 @@
+"""Frontend build (frontend/dist) indexed once and served from memory.
+
+At startup every file in the build directory is read into an Asset holding
+its content type, a content-hash ETag, its cache policy and compressed
+variants, so serving a file is a dict lookup with no filesystem access:
+
+- bundles Vite writes under assets/ with a content hash in their name
+  (index-D50UCtU5.js) never change under a URL and are cached for a year
+  as immutable; everything else (index.html, files from public/) must be
+  revalidated, which the ETag turns into a 304;
+- text-like files get a gzip variant and, where one was built, a brotli
+  variant, chosen per request from Accept-Encoding.
+
+Variants are normally built once after the frontend build with
+
+    python backend/static_assets.py [dist directory]
+
+which writes name.gz and name.br (brotli needs the optional `brotli`
+package) next to each file. Files without a pre-built .gz are gzipped in
+memory at startup instead, so gzip is always available.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+
+try:
+    import brotli
+except ImportError:  # optional dependency: assets are served without brotli variants
+    brotli = None
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'dist')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Files smaller than this aren't worth a compressed variant
+MIN_COMPRESS_BYTES = 1024
+
+# Larger files are indexed but read from disk per request
+MAX_MEMORY_BYTES = 4 * 1024 * 1024
+
+# Preferred first when the client accepts several equally
+ENCODINGS = ('br', 'gzip')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+_COMPRESSIBLE = re.compile(r'^(text/|application/(javascript|json|xml|manifest\+json|wasm)|image/svg\+xml)')
+# Vite's assetsDir and its name-<8 character hash>.ext file names
+_HASHED_NAME = re.compile(r'^assets/(.+/)?[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+
+class Asset:
+    """One file of the build and its encoded variants"""
+
+    __slots__ = ('path', 'content_type', 'cache_control', 'bodies', '_etag')
+
+    def __init__(self, path, content_type, cache_control, identity, variants):
+        self.path = path
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self._etag = hashlib.sha1(identity if identity is not None else _read(path)).hexdigest()[:20]
+        # encoding -> body; the identity body is None for files served from disk
+        self.bodies = {'identity': identity, **variants}
+
+    def negotiate(self, accept_encodings):
+        """`(encoding, body)` for the best variant a werkzeug Accept-Encoding header allows"""
+        available = [encoding for encoding in ENCODINGS if encoding in self.bodies]
+        encoding = accept_encodings.best_match(available, default='identity') if available else 'identity'
+        return encoding, self.bodies[encoding]
+
+    @property
+    def varies(self):
+        """True when the response depends on Accept-Encoding"""
+        return len(self.bodies) > 1
+
+    def etag(self, encoding):
+        """Strong ETag value (unquoted); each encoding is a different representation"""
+        return self._etag if encoding == 'identity' else f'{self._etag}-{encoding}'
+
+
+class StaticAssets:
+    """Index of a build directory, keyed by URL path relative to its root"""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = os.path.abspath(root)
+        self._assets = {}
+        self.bytes = 0
+        if not os.path.isdir(self.root):
+            return
+        for name in _files(self.root):
+            if _variant_source(self.root, name):
+                continue
+            asset = self._load(name)
+            self._assets[name] = asset
+            self.bytes += sum(len(body) for body in asset.bodies.values() if body is not None)
+
+    def __len__(self):
+        return len(self._assets)
+
+    def get(self, path):
+        """Asset at a URL path such as 'assets/index-D50UCtU5.js', or None"""
+        return self._assets.get(path)
+
+    def _load(self, name):
+        path = os.path.join(self.root, name)
+        content_type = _content_type(name)
+        cache_control = IMMUTABLE if _HASHED_NAME.match(name) else REVALIDATE
+        if os.path.getsize(path) > MAX_MEMORY_BYTES:
+            return Asset(path, content_type, cache_control, None, {})
+
+        identity = _read(path)
+        variants = {}
+        if _COMPRESSIBLE.match(content_type) and len(identity) >= MIN_COMPRESS_BYTES:
+            for encoding in ENCODINGS:
+                body = _prebuilt(path, encoding)
+                if body is None and encoding == 'gzip':
+                    body = _compress(identity, encoding)
+                if body is not None and len(body) < len(identity):
+                    variants[encoding] = body
+        return Asset(path, content_type, cache_control, identity, variants)
+
+
+def _files(root):
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            yield os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/')
+
+
+def _variant_source(root, name):
+    """True for a name.gz/name.br sitting next to the file it compresses"""
+    base, suffix = os.path.splitext(name)
+    return suffix in SUFFIXES.values() and os.path.isfile(os.path.join(root, base))
+
+
+def _content_type(name):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type == 'application/javascript':
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _prebuilt(path, encoding):
+    """Body of a pre-built variant that is at least as new as its source, or None"""
+    variant = path + SUFFIXES[encoding]
+    try:
+        if os.path.getmtime(variant) < os.path.getmtime(path):
+            return None
+    except OSError:
+        return None
+    return _read(variant)
+
+
+def _compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def build_variants(root=DEFAULT_ROOT):
+    """Write .gz (and, with brotli installed, .br) variants next to compressible files"""
+    written = 0
+    for name in _files(root):
+        path = os.path.join(root, name)
+        if _variant_source(root, name) or not _COMPRESSIBLE.match(_content_type(name)):
+            continue
+        data = _read(path)
+        if len(data) < MIN_COMPRESS_BYTES:
+            continue
+        for encoding in ENCODINGS:
+            if _prebuilt(path, encoding) is not None:
+                continue
+            body = _compress(data, encoding)
+            if body is not None and len(body) < len(data):
+                with open(path + SUFFIXES[encoding], 'wb') as f:
+                    f.write(body)
+                written += 1
+    return written
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    root = argv[0] if argv else DEFAULT_ROOT
+    if not os.path.isdir(root):
+        print(f'{root} is not a directory; build the frontend first', file=sys.stderr)
+        return 2
+    written = build_variants(root)
+    note = '' if brotli is not None else ' (gzip only: install brotli for .br variants)'
+    print(f'{written} compressed variants written to {root}{note}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""Storage backends behind the in-memory dataset.
+
+The API always serves reads from its in-memory indexes (ClientStore,
+RecommendationRepository). A storage backend is where mutations are written
+through to and where the dataset is loaded from at startup:
+
+    InMemoryStorage  nothing is persisted; every worker has its own copy
+                     (the original behaviour, and the default)
+    SQLiteStorage    an embedded SQLite database in WAL mode shared by every
+                     worker on the host; each write is also appended to a
+                     change log that other workers replay to stay in sync
+    JournalStorage   an append-only, group-committed journal with compacted
+                     snapshots (journal.py); writes cost microseconds
+
+Select with AIVEST_STORAGE=memory|sqlite|journal; AIVEST_SQLITE_PATH sets
+the database file (default: aivest.db next to this module) and
+AIVEST_JOURNAL_DIR the journal directory (default: journal/ next to it).
+
+With a dataset snapshot (snapshot.py) workers start from the snapshot
+instead of `load` and `resume` the change log from the
+position the snapshot was taken at.
+
+`pull_changes` returns `(seq, entity, op, key, doc, own)` tuples: `seq` is
+the change's position in the log, shared by every worker, and `own` marks
+this worker's writes, which it applied when it made them. A backend's
+`epoch` names its data, so that positions from two databases are never
+mistaken for each other; it is None for InMemoryStorage.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+from journal import DEFAULT_COMPACT_BYTES, DEFAULT_FLUSH_MS, JournalStorage
+
+# Changes kept in the log for lagging workers; older ones force a reload
+CHANGE_LOG_RETENTION = 100000
+
+
+def open_storage():
+    """Create the storage backend selected by the environment"""
+    backend = os.getenv('AIVEST_STORAGE', 'memory').lower()
+    if backend == 'memory':
+        return InMemoryStorage()
+    if backend == 'sqlite':
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'aivest.db')
+        return SQLiteStorage(os.getenv('AIVEST_SQLITE_PATH', default_path))
+    if backend == 'journal':
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'journal')
+        return JournalStorage(os.getenv('AIVEST_JOURNAL_DIR', default_dir),
+                              flush_ms=float(os.getenv('AIVEST_JOURNAL_FLUSH_MS', DEFAULT_FLUSH_MS)),
+                              compact_bytes=int(os.getenv('AIVEST_JOURNAL_COMPACT_BYTES', DEFAULT_COMPACT_BYTES)))
+    raise ValueError(f'Unknown AIVEST_STORAGE backend: {backend}')
+
+
+class InMemoryStorage:
+    """No persistence: the seed dataset is used as-is and writes are no-ops"""
+
+    name = 'memory'
+    epoch = None
+
+    def load(self, seed_clients, seed_portfolios, seed_recommendations):
+        """Return `(clients, portfolios, recommendations)` to start from"""
+        return seed_clients, seed_portfolios, seed_recommendations
+
+    def next_client_seq(self):
+        """Numeric part of the next client id, or None to let the store pick"""
+        return None
+
+    def next_client_seqs(self, count):
+        """First of `count` consecutive sequence numbers, or None to let the store pick"""
+        return None
+
+    def insert_client(self, record):
+        pass
+
+    def insert_clients(self, records):
+        pass
+
+    def delete_client(self, client_id):
+        pass
+
+    def upsert_recommendation(self, record):
+        pass
+
+    def change_seq(self):
+        """Position in the change log that the loaded dataset reflects"""
+        return 0
+
+    def resume(self, seq):
+        """Continue from change `seq` (a snapshot's); False if that is not possible"""
+        return True
+
+    def pull_changes(self):
+        """Changes written since the last call"""
+        return []
+
+
+class _ConnectionPool:
+    """One SQLite connection per thread, rebuilt in a forked child
+
+    sqlite3 connections must not cross threads or a fork, so each thread of
+    each worker process lazily opens its own and keeps it for reuse.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def connection(self):
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.data_version = None
+        return conn
+
+    @property
+    def local(self):
+        self.connection()
+        return self._local
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS clients (
+    id TEXT PRIMARY KEY,
+    name_lower TEXT NOT NULL,
+    aum REAL NOT NULL,
+    domicile TEXT NOT NULL,
+    risk_profile TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clients_domicile ON clients (domicile);
+CREATE INDEX IF NOT EXISTS clients_risk_profile ON clients (risk_profile);
+CREATE INDEX IF NOT EXISTS clients_aum ON clients (aum);
+CREATE INDEX IF NOT EXISTS clients_name_lower ON clients (name_lower);
+CREATE TABLE IF NOT EXISTS client_segments (
+    client_id TEXT NOT NULL REFERENCES clients (id) ON DELETE CASCADE,
+    segment TEXT NOT NULL,
+    PRIMARY KEY (client_id, segment)
+);
+CREATE INDEX IF NOT EXISTS client_segments_segment ON client_segments (segment);
+CREATE TABLE IF NOT EXISTS portfolios (client_id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS recommendations (
+    id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    status TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recommendations_client_status ON recommendations (client_id, status);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,
+    op TEXT NOT NULL,
+    key TEXT NOT NULL,
+    doc TEXT,
+    writer TEXT
+);
+"""
+
+_INSERT_CLIENT = ('INSERT INTO clients (id, name_lower, aum, domicile, risk_profile, doc) '
+                  'VALUES (?, ?, ?, ?, ?, ?)')
+_INSERT_SEGMENT = 'INSERT OR IGNORE INTO client_segments (client_id, segment) VALUES (?, ?)'
+_DELETE_CLIENT = 'DELETE FROM clients WHERE id = ?'
+_UPSERT_RECOMMENDATION = (
+    'INSERT INTO recommendations (id, client_id, status, doc) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (id) DO UPDATE SET client_id = excluded.client_id, '
+    'status = excluded.status, doc = excluded.doc')
+_INSERT_PORTFOLIO = 'INSERT INTO portfolios (client_id, doc) VALUES (?, ?)'
+_LOG_CHANGE = 'INSERT INTO changes (entity, op, key, doc, writer) VALUES (?, ?, ?, ?, ?)'
+_BUMP_CLIENT_SEQ = "UPDATE meta SET value = CAST(value AS INTEGER) + ? WHERE key = 'client_seq'"
+_READ_CLIENT_SEQ = "SELECT value FROM meta WHERE key = 'client_seq'"
+
+
+class SQLiteStorage:
+    """Embedded SQLite (WAL) store shared by every worker on one host
+
+    WAL lets readers proceed while one writer commits. Statements are
+    constant strings so sqlite3's per-connection statement cache reuses the
+    prepared form. Each write also appends to `changes`; `pull_changes`
+    first compares `PRAGMA data_version` (a no-I/O check) and only reads the
+    log when another connection has committed since the last call.
+
+    Every change is tagged with the process that wrote it. Each thread has
+    its own connection, so `data_version` also moves for this worker's own
+    commits from other threads; those rows come back marked as its own, like
+    the journal's own entries.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._pool = _ConnectionPool(path)
+        self._cursor = 0
+        self._cursor_lock = threading.Lock()
+        self._id = uuid.uuid4().hex[:12]
+        # Position of this process's last logged change
+        self._written = 0
+        conn = self._pool.connection()
+        conn.executescript(_SCHEMA)
+        if 'writer' not in {column[1] for column in conn.execute('PRAGMA table_info(changes)')}:
+            conn.execute('ALTER TABLE changes ADD COLUMN writer TEXT')
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dataset_id', ?)", (uuid.uuid4().hex[:8],))
+        self.epoch = conn.execute("SELECT value FROM meta WHERE key = 'dataset_id'").fetchone()[0]
+
+    @property
+    def writer(self):
+        """Tag of this process's changes; workers forked from one instance differ by pid"""
+        return f'{self._id}-{os.getpid()}'
+
+    def load(self, seed_clients, seed_portfolios, seed_recommendations):
+        """Load the dataset, seeding an empty database on first start"""
+        conn = self._pool.connection()
+        with _transaction(conn):
+            seeded = conn.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+            if not seeded:
+                self._seed(conn, seed_clients, seed_portfolios, seed_recommendations)
+            self._cursor = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+            clients = [json.loads(doc) for (doc,) in conn.execute('SELECT doc FROM clients ORDER BY rowid')]
+            portfolios = {cid: json.loads(doc) for cid, doc in conn.execute('SELECT client_id, doc FROM portfolios')}
+            recommendations = [json.loads(doc) for (doc,) in conn.execute('SELECT doc FROM recommendations ORDER BY rowid')]
+        self._pool.local.data_version = _data_version(conn)
+        return clients, portfolios, recommendations
+
+    def next_client_seq(self):
+        return self.next_client_seqs(1)
+
+    def next_client_seqs(self, count):
+        conn = self._pool.connection()
+        with _transaction(conn):
+            conn.execute(_BUMP_CLIENT_SEQ, (count,))
+            return int(conn.execute(_READ_CLIENT_SEQ).fetchone()[0]) - count + 1
+
+    def insert_client(self, record):
+        conn = self._pool.connection()
+        with _transaction(conn):
+            doc = _dumps(record)
+            self._insert_client(conn, record, doc)
+            self._log(conn.execute(_LOG_CHANGE, ('client', 'insert', record['id'], doc, self.writer)).lastrowid)
+            self._prune(conn)
+
+    def insert_clients(self, records):
+        """Insert a batch of clients in one transaction"""
+        conn = self._pool.connection()
+        with _transaction(conn):
+            changes = []
+            writer = self.writer
+            for record in records:
+                doc = _dumps(record)
+                self._insert_client(conn, record, doc)
+                changes.append(('client', 'insert', record['id'], doc, writer))
+            conn.executemany(_LOG_CHANGE, changes)
+            self._log(conn.execute('SELECT last_insert_rowid()').fetchone()[0])
+            self._prune(conn)
+
+    def delete_client(self, client_id):
+        conn = self._pool.connection()
+        with _transaction(conn):
+            conn.execute(_DELETE_CLIENT, (client_id,))
+            self._log(conn.execute(_LOG_CHANGE, ('client', 'delete', client_id, None, self.writer)).lastrowid)
+
+    def upsert_recommendation(self, record):
+        conn = self._pool.connection()
+        with _transaction(conn):
+            doc = _dumps(record)
+            conn.execute(_UPSERT_RECOMMENDATION, (record['id'], record['clientId'], record.get('status'), doc))
+            self._log(conn.execute(_LOG_CHANGE, ('recommendation', 'upsert', record['id'], doc, self.writer)).lastrowid)
+
+    def change_seq(self):
+        return self._cursor
+
+    def resume(self, seq):
+        """Replay the change log from `seq` instead of loading the dataset
+
+        Returns False when the log no longer reaches back to `seq` or the
+        database is older than it (e.g. it was recreated).
+        """
+        conn = self._pool.connection()
+        seeded = conn.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+        oldest, newest = conn.execute('SELECT MIN(seq), MAX(seq) FROM changes').fetchone()
+        if not seeded or seq > (newest or 0) or (oldest is not None and oldest > seq + 1):
+            return False
+        with self._cursor_lock:
+            self._cursor = seq
+        self._pool.local.data_version = None
+        return True
+
+    def pull_changes(self):
+        """Changes committed since the last call
+
+        Returns a list of `(seq, entity, op, key, doc, own)` tuples, or None
+        when this worker has fallen further behind than the change log
+        retains and must reload the dataset.
+        """
+        conn = self._pool.connection()
+        local = self._pool.local
+        version = _data_version(conn)
+        # A connection's own commits don't move its data_version
+        if version == local.data_version and self._written <= self._cursor:
+            return []
+        local.data_version = version
+
+        with self._cursor_lock:
+            oldest = conn.execute('SELECT MIN(seq) FROM changes').fetchone()[0]
+            if oldest is not None and oldest > self._cursor + 1:
+                self._cursor = conn.execute('SELECT MAX(seq) FROM changes').fetchone()[0]
+                return None
+            rows = conn.execute('SELECT seq, entity, op, key, doc, writer FROM changes WHERE seq > ? ORDER BY seq',
+                                (self._cursor,)).fetchall()
+            if rows:
+                self._cursor = rows[-1][0]
+        writer = self.writer
+        return [(seq, entity, op, key, json.loads(doc) if doc else None, row_writer == writer)
+                for seq, entity, op, key, doc, row_writer in rows]
+
+    def _seed(self, conn, clients, portfolios, recommendations):
+        max_seq = 0
+        for record in clients:
+            self._insert_client(conn, record, _dumps(record))
+            suffix = record['id'][1:]
+            if suffix.isdigit():
+                max_seq = max(max_seq, int(suffix))
+        conn.executemany(_INSERT_PORTFOLIO, [(cid, _dumps(doc)) for cid, doc in portfolios.items()])
+        conn.executemany(_UPSERT_RECOMMENDATION, [
+            (rec['id'], rec['clientId'], rec.get('status'), _dumps(rec)) for rec in recommendations
+        ])
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('client_seq', ?)", (str(max_seq),))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded', '1')")
+
+    def _insert_client(self, conn, record, doc):
+        conn.execute(_INSERT_CLIENT, (record['id'], record['name'].lower(), record['aum'],
+                                      record['domicile'], record['riskProfile'], doc))
+        conn.executemany(_INSERT_SEGMENT, [(record['id'], s) for s in record.get('segments', [])])
+
+    def _log(self, seq):
+        self._written = max(self._written, seq)
+
+    def _prune(self, conn):
+        conn.execute('DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?',
+                     (CHANGE_LOG_RETENTION,))
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def _data_version(conn):
+    return conn.execute('PRAGMA data_version').fetchone()[0]
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
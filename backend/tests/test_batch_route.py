@@ -0,0 +1,33 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('body', [
+    ['c001'],
+    None,
+    {'ids': 'c001'},
+    {'ids': ['c001'], 'include': 'client'},
+    {'ids': ['c001'], 'include': ['client', 5]},
+    {'ids': ['c001'], 'include': ['nope']},
+    {'ids': ['c001'], 'include': ['recommendations'], 'status': ['pending']},
+    {'ids': ['c001'], 'status': 1},
+])
+def test_invalid_batch_requests_are_rejected(client, body):
+    assert client.post('/api/clients/batch', json=body).status_code == 400
+
+
+def test_batch_returns_requested_parts_in_order(client):
+    response = client.post('/api/clients/batch', json={
+        'ids': ['c002', 'nope', 'c001'], 'include': ['client', 'recommendations'], 'status': 'pending'})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [result['id'] for result in data['results']] == ['c002', 'c001']
+    assert data['missing'] == ['nope']
+    assert all(rec['status'] == 'pending' for result in data['results'] for rec in result['recommendations'])
+    assert all('portfolio' not in result for result in data['results'])
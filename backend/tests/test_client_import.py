@@ -0,0 +1,21 @@
+import pytest
+
+from client_import import client_fields
+
+VALID = {'name': 'Ada', 'phone': '1', 'aum': '12.5', 'domicile': 'Norway', 'riskProfile': 'Moderate'}
+
+
+def test_client_fields_parses_aum():
+    assert client_fields(VALID)['aum'] == 12.5
+
+
+@pytest.mark.parametrize('aum', ['NaN', 'nan', 'inf', '-Infinity', float('nan')])
+def test_client_fields_rejects_non_finite_aum(aum):
+    with pytest.raises(ValueError, match='finite'):
+        client_fields({**VALID, 'aum': aum})
+
+
+@pytest.mark.parametrize('field', ['segments', 'keyContacts'])
+def test_client_fields_rejects_non_string_list_items(field):
+    with pytest.raises(ValueError, match='list of strings'):
+        client_fields({**VALID, field: ['ok', 1]})
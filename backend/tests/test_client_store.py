@@ -0,0 +1,46 @@
+import pytest
+
+from client_store import ClientStore
+
+
+def client(client_id, **fields):
+    return {'id': client_id, 'name': f'Client {client_id}', 'aum': 10.0, 'domicile': 'Norway',
+            'riskProfile': 'Moderate', 'segments': ['ESG'], 'description': '', **fields}
+
+
+def assert_only(store, ids):
+    assert [record['id'] for record in store.all()] == ids
+    assert sorted(store.ids_matching_text('client')) == sorted(ids)
+    assert sorted(store.ids_by_segment(['ESG'])) == sorted(ids)
+    records, _ = store.query(sort_by='aum')
+    assert [record['id'] for record in records] == sorted(ids)
+
+
+@pytest.mark.parametrize('bad', [
+    {'segments': [1]},
+    {'segments': 'ESG'},
+    {'aum': '10'},
+    {'name': None},
+    {'description': 5},
+])
+def test_add_rejects_a_record_the_indexes_cannot_hold(bad):
+    store = ClientStore([client('c001')])
+    with pytest.raises(ValueError):
+        store.add(client('c002', **bad))
+    assert_only(store, ['c001'])
+
+
+def test_add_many_applies_nothing_when_one_record_is_invalid():
+    store = ClientStore([client('c001')])
+    with pytest.raises(ValueError):
+        store.add_many([client('c002'), client('c003', segments=[1])])
+    assert_only(store, ['c001'])
+    store.add_many([client('c002'), client('c003')])
+    assert_only(store, ['c001', 'c002', 'c003'])
+
+
+def test_add_many_rejects_duplicate_ids():
+    store = ClientStore([client('c001')])
+    with pytest.raises(KeyError):
+        store.add_many([client('c002'), client('c001')])
+    assert_only(store, ['c001'])
@@ -0,0 +1,73 @@
+import event_bus
+from event_bus import EventBus
+
+
+def frames_text(frames):
+    return b''.join(frames).decode('utf-8')
+
+
+def test_subscribers_receive_published_events():
+    bus = EventBus()
+    first, second = bus.subscribe(), bus.subscribe()
+    bus.publish('client.created', {'id': 'c001'})
+
+    for subscription in (first, second):
+        text = frames_text(subscription.next(timeout=0))
+        assert f'id: {bus.epoch}-1\nevent: client.created\ndata: {{"id":"c001"}}' in text
+
+
+def test_next_returns_nothing_after_the_heartbeat_interval():
+    subscription = EventBus().subscribe()
+    assert subscription.next(timeout=0.01) == []
+
+
+def test_slow_subscriber_gets_one_resync_instead_of_its_backlog():
+    bus = EventBus(queue_size=3)
+    slow, fast = bus.subscribe(), bus.subscribe()
+    for i in range(5):
+        bus.publish('client.created', {'id': f'c{i:03d}'})
+        fast.next(timeout=0)
+
+    frames = slow.next(timeout=0)
+    assert len(frames) == 1
+    assert 'event: resync' in frames_text(frames)
+    assert slow.dropped == 3
+    # Caught up again: later events flow normally
+    bus.publish('client.deleted', {'id': 'c000'})
+    assert 'event: client.deleted' in frames_text(slow.next(timeout=0))
+
+
+def test_closed_subscription_stops_receiving():
+    bus = EventBus()
+    subscription = bus.subscribe()
+    assert len(bus) == 1
+    subscription.close()
+    assert len(bus) == 0
+    bus.publish('client.created', {'id': 'c001'})
+    assert subscription.next(timeout=0) == []
+
+
+def test_last_event_id_replays_missed_events():
+    bus = EventBus()
+    bus.publish('client.created', {'id': 'c001'})
+    seen = bus.last_event_id
+    bus.publish('client.created', {'id': 'c002'})
+    bus.publish('client.deleted', {'id': 'c001'})
+
+    text = frames_text(bus.subscribe(seen).next(timeout=0))
+    assert '"c002"' in text and 'client.deleted' in text
+    assert f'id: {seen}\n' not in text
+    assert bus.subscribe(bus.last_event_id).next(timeout=0.01) == []
+
+
+def test_unknown_or_expired_last_event_id_asks_for_a_resync():
+    bus = EventBus(replay_size=2)
+    for i in range(5):
+        bus.publish('client.created', {'id': f'c{i:03d}'})
+
+    for last_event_id in (f'{bus.epoch}-1', 'otherepoch-4', 'garbage'):
+        assert 'event: resync' in frames_text(bus.subscribe(last_event_id).next(timeout=0))
+
+
+def test_stream_preamble_sets_the_reconnect_delay():
+    assert event_bus.stream_preamble() == f'retry: {event_bus.RETRY_MS}\n\n'.encode('utf-8')
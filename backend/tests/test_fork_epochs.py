@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from event_bus import EventBus
+from versions import VersionRegistry
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+
+
+def in_child(func, *args):
+    """`func(*args)` run in a forked child; returns its string result"""
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(write, func(*args).encode())
+        finally:
+            os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    with os.fdopen(read) as f:
+        return f.read()
+
+
+def test_forked_workers_tag_their_own_writes_apart():
+    versions = VersionRegistry('db1', base=7)
+
+    def child():
+        versions.changed([('client', 'c001')])
+        return versions.etag('client', 'c001')
+
+    # The loaded data is the same in every worker, and so are its tags
+    assert in_child(versions.etag, 'client', 'c002') == versions.etag('client', 'c002')
+    assert in_child(child) != in_child(child)
+
+
+def test_forked_workers_get_their_own_event_ids():
+    bus = EventBus()
+    bus.publish('client.created', {'id': 'c001'})
+    last_event_id = bus.last_event_id
+
+    def child():
+        bus.publish('client.created', {'id': 'c002'})
+        return bus.last_event_id
+
+    assert in_child(child) != f'{bus.epoch}-2'
+    assert bus.last_event_id == last_event_id
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from journal import JournalStorage
+
+SEED_CLIENTS = [{'id': 'C1', 'name': 'Seed Client', 'aum': 1.0}]
+SEED_PORTFOLIOS = {'C1': {'clientId': 'C1', 'holdings': []}}
+
+
+def client(client_id):
+    return {'id': client_id, 'name': f'Client {client_id}', 'aum': 2.5}
+
+
+def open_journal(directory):
+    # Large thresholds: tests flush and compact explicitly
+    storage = JournalStorage(str(directory), flush_ms=60000, compact_bytes=1 << 40)
+    clients, _, _ = storage.load(SEED_CLIENTS, SEED_PORTFOLIOS, [])
+    return storage, {record['id'] for record in clients}
+
+
+def test_load_seeds_an_empty_directory(tmp_path):
+    _, ids = open_journal(tmp_path)
+    assert ids == {'C1'}
+
+
+def test_workers_tail_each_others_entries(tmp_path):
+    first, _ = open_journal(tmp_path)
+    second, _ = open_journal(tmp_path)
+
+    first.insert_client(client('C2'))
+    first.delete_client('C1')
+    first.flush()
+
+    changes = second.pull_changes()
+    assert [change[1:] for change in changes] == [('client', 'insert', 'C2', client('C2'), False),
+                                                  ('client', 'delete', 'C1', None, False)]
+    assert changes[0][0] < changes[1][0] == second.change_seq()
+    assert second.pull_changes() == []
+    assert [change[0] for change in first.pull_changes()] == [change[0] for change in changes]
+    assert first.epoch == second.epoch
+
+
+def test_restart_replays_the_journal(tmp_path):
+    storage, _ = open_journal(tmp_path)
+    storage.insert_clients([client('C2'), client('C3')])
+    storage.delete_client('C2')
+    storage.flush()
+
+    _, ids = open_journal(tmp_path)
+    assert ids == {'C1', 'C3'}
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    storage, _ = open_journal(tmp_path)
+    tailer, _ = open_journal(tmp_path)
+    storage.insert_client(client('C2'))
+    storage.flush()
+
+    position = storage.compact()
+    assert position > 0
+    assert [change[1:] for change in tailer.pull_changes()] == [('client', 'insert', 'C2', client('C2'), False)]
+
+    # Entries after the compaction land in the new segment and are still tailed
+    storage.insert_client(client('C3'))
+    storage.flush()
+    assert [change[1:] for change in tailer.pull_changes()] == [('client', 'insert', 'C3', client('C3'), False)]
+
+    _, ids = open_journal(tmp_path)
+    assert ids == {'C1', 'C2', 'C3'}
+
+
+def test_tailer_behind_the_oldest_segment_must_reload(tmp_path):
+    storage, _ = open_journal(tmp_path)
+    tailer, _ = open_journal(tmp_path)
+    for client_id in ('C2', 'C3'):
+        storage.insert_client(client(client_id))
+        storage.flush()
+        storage.compact()
+
+    assert tailer.pull_changes() is None
+    assert not tailer.resume(0)
+    assert tailer.pull_changes() == []
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_workers_see_each_others_entries(tmp_path):
+    # A preloaded app forks its workers off one JournalStorage
+    storage, _ = open_journal(tmp_path)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            storage.insert_client(client('C2'))
+            storage.flush()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert [change[1:] for change in storage.pull_changes()] == [('client', 'insert', 'C2', client('C2'), False)]
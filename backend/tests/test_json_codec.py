@@ -0,0 +1,27 @@
+import json_codec
+from client_record import ClientRecord
+
+RECORDS = [ClientRecord({'id': f'c{n:03d}', 'name': f'Client {n}', 'phone': '+47 1', 'aum': n,
+                         'domicile': 'Norway', 'segments': ['ESG'], 'keyContacts': [],
+                         'description': '', 'riskProfile': 'Moderate'}) for n in range(3)]
+KEYS = [('client', record.id) for record in RECORDS]
+
+
+def test_get_many_encodes_each_record_once():
+    cache = json_codec.SerializedCache()
+    encoded = cache.get_many(KEYS, RECORDS)
+    assert encoded == [json_codec.dumps(record.to_dict()) for record in RECORDS]
+    assert all(again is first for again, first in zip(cache.get_many(KEYS, RECORDS), encoded))
+    assert cache.get(KEYS[0], RECORDS[0]) == encoded[0] + b'\n'
+
+    cache.invalidate(KEYS[1])
+    assert cache.get_many(KEYS, RECORDS)[1] is not encoded[1]
+
+
+def test_a_batch_larger_than_the_cache_is_not_cached():
+    cache = json_codec.SerializedCache(maxsize=2)
+    cache.get_many(KEYS, RECORDS)
+    assert len(cache) == 0
+    cache.get_many(KEYS[:2], RECORDS[:2])
+    cache.get_many(KEYS[2:], RECORDS[2:])
+    assert len(cache) == 2
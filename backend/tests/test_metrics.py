@@ -0,0 +1,51 @@
+import threading
+
+from metrics import Counter, Histogram
+
+
+def in_threads(count, func):
+    for _ in range(count):
+        thread = threading.Thread(target=func)
+        thread.start()
+        thread.join()
+
+
+def test_counter_sums_every_thread_and_drops_finished_shards():
+    counter = Counter('requests_total', 'Requests', ('route',))
+    in_threads(300, lambda: counter.inc(('/a',)))
+    counter.inc(('/b',), 2)
+
+    assert sorted(counter.collect()) == [('requests_total', ('/a',), 300), ('requests_total', ('/b',), 2)]
+    assert len(counter._shards) <= 2
+
+
+def test_histogram_keeps_finished_threads_observations():
+    histogram = Histogram('duration_seconds', 'Duration', (0.1, 1.0))
+    in_threads(50, lambda: histogram.observe(0.5))
+    histogram.observe(0.05)
+
+    samples = {(name, labels): value for name, labels, value in histogram.collect()}
+    assert samples[('duration_seconds_count', ())] == 51
+    assert samples[('duration_seconds_bucket', (('le', '0.1'),))] == 1
+    assert samples[('duration_seconds_bucket', (('le', '1.0'),))] == 51
+    assert len(histogram._shards) <= 2
+
+
+def test_live_threads_keep_writing_their_own_shard():
+    counter = Counter('events_total', 'Events')
+    started = threading.Event()
+    release = threading.Event()
+
+    def worker():
+        counter.inc()
+        started.set()
+        release.wait()
+        counter.inc()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    started.wait()
+    assert counter.collect() == [('events_total', (), 1)]
+    release.set()
+    thread.join()
+    assert counter.collect() == [('events_total', (), 2)]
@@ -0,0 +1,50 @@
+import base64
+import json
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor
+
+
+def token(scope, key, position):
+    raw = json.dumps([scope, key, position]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('scope, after', [
+    ('store', (0, 41)),
+    ('aum:desc', (12.5, 3)),
+    ('aum:asc', (7, 3)),
+    ('name:asc', ('ada lovelace', 0)),
+    ('riskProfile:desc', ('Moderate', 9)),
+])
+def test_cursor_round_trip(scope, after):
+    assert decode_cursor(encode_cursor(scope, after), scope) == after
+
+
+def test_cursor_from_another_listing_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor('aum:asc', (1.0, 2)), 'aum:desc')
+
+
+@pytest.mark.parametrize('scope, key, position', [
+    ('aum:desc', 'abc', 1),
+    ('aum:desc', None, 1),
+    ('aum:desc', True, 1),
+    ('aum:asc', [1], 1),
+    ('name:asc', 5, 1),
+    ('domicile:asc', None, 1),
+    ('store', 'x', 1),
+    ('store', 1, 1),
+    ('name:asc', 'ada', '1'),
+    ('name:asc', 'ada', True),
+])
+def test_cursor_with_wrong_key_type_is_rejected(scope, key, position):
+    with pytest.raises(ValueError):
+        decode_cursor(token(scope, key, position), scope)
+
+
+def test_cursor_with_non_finite_aum_is_rejected():
+    raw = '["aum:asc",NaN,1]'.encode('utf-8')
+    with pytest.raises(ValueError):
+        decode_cursor(base64.urlsafe_b64encode(raw).decode('ascii'), 'aum:asc')
@@ -0,0 +1,22 @@
+from sorted_index import SortedIndex
+
+
+def index_of(aums):
+    index = SortedIndex(lambda record: record['aum'])
+    for position, aum in enumerate(aums):
+        index.add({'id': f'c{position}', 'aum': aum}, position)
+    return index
+
+
+def test_remove_drops_only_that_client():
+    index = index_of([3.0, 1.0, 2.0, 1.0])
+    index.remove('c3')
+    assert index.range_ids() == ['c1', 'c2', 'c0']
+
+
+def test_remove_with_unordered_keys_removes_the_right_entry():
+    index = index_of([3.0, float('nan'), 1.0, 2.0, float('nan')])
+    for client_id in ('c0', 'c4', 'c1'):
+        index.remove(client_id)
+        assert client_id not in [entry[2] for entry in index.page()]
+    assert len(index) == 2
@@ -0,0 +1,122 @@
+import os
+import threading
+
+import pytest
+
+import storage
+from storage import SQLiteStorage
+
+SEED_CLIENTS = [{'id': 'c001', 'name': 'Seed Client', 'aum': 1.0, 'domicile': 'Norway',
+                 'riskProfile': 'Moderate', 'segments': ['ESG']}]
+SEED_RECOMMENDATIONS = [{'id': 'rec001', 'clientId': 'c001', 'status': 'pending'}]
+
+
+def client(client_id):
+    return {'id': client_id, 'name': f'Client {client_id}', 'aum': 2.5, 'domicile': 'Spain',
+            'riskProfile': 'Moderate', 'segments': []}
+
+
+def open_db(path):
+    db = SQLiteStorage(str(path))
+    clients, _, _ = db.load(SEED_CLIENTS, {}, SEED_RECOMMENDATIONS)
+    return db, [record['id'] for record in clients]
+
+
+def pulled(db):
+    """`db.pull_changes()` without the positions"""
+    return [change[1:] for change in db.pull_changes()]
+
+
+def in_thread(func, *args):
+    thread = threading.Thread(target=func, args=args)
+    thread.start()
+    thread.join()
+
+
+def test_load_seeds_an_empty_database(tmp_path):
+    _, ids = open_db(tmp_path / 'db')
+    assert ids == ['c001']
+    _, ids = open_db(tmp_path / 'db')
+    assert ids == ['c001']
+
+
+def test_workers_pull_each_others_changes(tmp_path):
+    first, _ = open_db(tmp_path / 'db')
+    second, _ = open_db(tmp_path / 'db')
+
+    first.insert_client(client('c002'))
+    first.upsert_recommendation({**SEED_RECOMMENDATIONS[0], 'status': 'approved'})
+    first.delete_client('c001')
+
+    assert pulled(second) == [
+        ('client', 'insert', 'c002', client('c002'), False),
+        ('recommendation', 'upsert', 'rec001', {**SEED_RECOMMENDATIONS[0], 'status': 'approved'}, False),
+        ('client', 'delete', 'c001', None, False),
+    ]
+    assert second.pull_changes() == []  # data_version unchanged: no query
+
+
+def test_own_writes_come_back_marked_as_own(tmp_path):
+    db, _ = open_db(tmp_path / 'db')
+    other, _ = open_db(tmp_path / 'db')
+
+    in_thread(db.insert_client, client('c002'))
+    in_thread(db.insert_clients, [client('c003'), client('c004')])
+    db.delete_client('c003')  # this thread's connection: its data_version stays put
+    assert [(key, own) for _, _, _, key, _, own in db.pull_changes()] == [
+        ('c002', True), ('c003', True), ('c004', True), ('c003', True)]
+    assert [(key, own) for _, _, _, key, _, own in other.pull_changes()] == [
+        ('c002', False), ('c003', False), ('c004', False), ('c003', False)]
+    assert db.pull_changes() == []
+
+
+def test_every_worker_sees_a_change_at_the_same_position(tmp_path):
+    db, _ = open_db(tmp_path / 'db')
+    other, _ = open_db(tmp_path / 'db')
+    assert other.epoch == db.epoch
+
+    db.insert_client(client('c002'))
+    other.delete_client('c002')
+    ours, theirs = db.pull_changes(), other.pull_changes()
+    assert [change[0] for change in ours] == [change[0] for change in theirs]
+    assert ours[0][0] < ours[1][0] == db.change_seq() == other.change_seq()
+    assert SQLiteStorage(str(tmp_path / 'other-db')).epoch != db.epoch
+
+
+def test_worker_behind_the_retained_log_must_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'CHANGE_LOG_RETENTION', 2)
+    db, _ = open_db(tmp_path / 'db')
+    lagging, _ = open_db(tmp_path / 'db')
+    for seq in range(2, 7):
+        db.insert_client(client(f'c{seq:03d}'))
+
+    assert lagging.pull_changes() is None
+    assert lagging.pull_changes() == []
+
+
+def test_resume_replays_from_a_position(tmp_path):
+    db, _ = open_db(tmp_path / 'db')
+    watcher, _ = open_db(tmp_path / 'db')
+    db.insert_client(client('c002'))
+    watcher.pull_changes()
+    position = watcher.change_seq()
+    db.insert_client(client('c003'))
+
+    other = SQLiteStorage(str(tmp_path / 'db'))
+    assert other.resume(position)
+    assert [key for _, _, _, key, _, _ in other.pull_changes()] == ['c003']
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_workers_pull_each_others_changes(tmp_path):
+    # A preloaded app forks its workers off one SQLiteStorage
+    db, _ = open_db(tmp_path / 'db')
+    pid = os.fork()
+    if pid == 0:
+        try:
+            db.insert_client(client('c002'))
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert pulled(db) == [('client', 'insert', 'c002', client('c002'), False)]
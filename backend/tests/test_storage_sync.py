@@ -0,0 +1,49 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.fixture
+def pulled(monkeypatch):
+    """Changes the next storage sync pulls from the change log"""
+    changes = []
+
+    def pull_changes():
+        batch = list(changes)
+        changes.clear()
+        return batch
+
+    monkeypatch.setattr(app.storage, 'pull_changes', pull_changes)
+    return changes
+
+
+def test_workers_tag_a_pulled_change_by_its_log_position(client, pulled):
+    rec = app.recommendation_repo.get('rec002')
+    pulled.append((101, 'recommendation', 'upsert', 'rec002', {**rec, 'notes': 'from another worker'}, False))
+    client.get('/api/health')
+
+    etag = client.get(f'/api/clients/{rec["clientId"]}/recommendations').headers['ETag']
+    assert etag == f'"{app.versions.epoch}-recommendations-{rec["clientId"]}-101"'
+
+
+def test_own_write_wins_over_an_older_change_pulled_after_it(client, pulled):
+    rec = app.recommendation_repo.get('rec003')
+    url = f'/api/clients/{rec["clientId"]}/recommendations'
+    assert client.post('/api/recommendations/rec003/action', json={'action': 'approved'}).status_code == 200
+    ours = app.recommendation_repo.get('rec003')
+    local_etag = client.get(url).headers['ETag']
+
+    # Another worker rejected it just before us; the log has theirs first
+    pulled.append((201, 'recommendation', 'upsert', 'rec003', {**rec, 'status': 'rejected'}, False))
+    pulled.append((202, 'recommendation', 'upsert', 'rec003', ours, True))
+    client.get('/api/health')
+
+    assert app.recommendation_repo.get('rec003')['status'] == 'approved'
+    etag = client.get(url).headers['ETag']
+    assert etag != local_etag
+    assert etag == f'"{app.versions.epoch}-recommendations-{rec["clientId"]}-202"'
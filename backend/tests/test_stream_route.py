@@ -0,0 +1,71 @@
+import pytest
+
+import app
+from event_bus import HEARTBEAT, Subscription
+
+THREADED = {'wsgi.multithread': True}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, 'MAX_STREAMS', 2)
+    monkeypatch.setattr(app, 'stream_slots', app.threading.BoundedSemaphore(2))
+    # Heartbeats every 10ms instead of every 15s
+    next_frames = Subscription.next
+    monkeypatch.setattr(Subscription, 'next', lambda self, timeout=0.01: next_frames(self, 0.01))
+    return app.app.test_client()
+
+
+def open_stream(client, **headers):
+    return client.get('/api/stream', environ_overrides=THREADED, buffered=False, headers=headers)
+
+
+def test_single_threaded_server_is_told_to_poll(client):
+    response = client.get('/api/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(app.STREAM_POLL_SECONDS)
+    assert response.get_json()['poll']['url'] == '/api/clients'
+
+
+def test_stream_sends_events_and_heartbeats(client):
+    response = open_stream(client)
+    try:
+        assert response.status_code == 200
+        body = iter(response.response)
+        assert next(body).startswith(b'retry:')
+        assert next(body) == HEARTBEAT
+        app.change_feed.publish('client.created', {'id': 'c999'})
+        assert b'"c999"' in next(body)
+    finally:
+        response.close()
+
+
+def test_streams_beyond_the_cap_are_told_to_poll(client):
+    first, second = open_stream(client), open_stream(client)
+    try:
+        assert (first.status_code, second.status_code) == (200, 200)
+        refused = open_stream(client)
+        assert refused.status_code == 503
+        assert 'poll' in refused.get_json()
+    finally:
+        first.close()
+    # Closing a stream frees its slot, even one whose body was never read
+    reopened = open_stream(client)
+    assert reopened.status_code == 200
+    reopened.close()
+    second.close()
+
+
+def test_last_event_id_resumes_the_stream(client):
+    app.change_feed.publish('client.created', {'id': 'c997'})
+    seen = app.change_feed.last_event_id
+    app.change_feed.publish('client.created', {'id': 'c998'})
+
+    response = open_stream(client, **{'Last-Event-ID': seen})
+    try:
+        body = iter(response.response)
+        next(body)  # preamble
+        replayed = next(body)
+        assert b'"c998"' in replayed and b'"c997"' not in replayed
+    finally:
+        response.close()
@@ -0,0 +1,45 @@
+from versions import COLLECTION, VersionRegistry
+
+CLIENT = ('client', 'c002')
+
+
+def test_workers_on_one_database_agree_on_tags():
+    first, second = VersionRegistry('db1', base=10), VersionRegistry('db1', base=10)
+    assert first.etag('client', 'c001') == second.etag('client', 'c001')
+
+    # first wrote it; second pulled it from the log at position 11
+    first.changed([CLIENT, COLLECTION])
+    second.changed([CLIENT, COLLECTION], 11)
+    assert first.etag('client', 'c002') != second.etag('client', 'c002')
+
+    first.logged([CLIENT, COLLECTION], 11)
+    assert first.etag('client', 'c002') == second.etag('client', 'c002')
+    assert first.collection_etag() == second.collection_etag()
+    assert first.etag('client', 'c002') != VersionRegistry('db2', base=10).etag('client', 'c002')
+
+
+def test_older_changes_pulled_before_our_write_is_logged_get_a_new_local_tag():
+    versions = VersionRegistry('db1', base=10)
+    versions.changed([COLLECTION])
+    written = versions.collection_etag()
+
+    versions.changed([COLLECTION], 11)  # another worker's change, from before ours
+    assert versions.collection_etag() not in (written, VersionRegistry('db1').collection_etag())
+    assert versions.collection_etag().split('-')[-1] != '11'
+
+    versions.logged([COLLECTION], 12)
+    assert versions.collection_etag() == 'db1-clients-12'
+
+
+def test_a_resource_stays_local_until_all_our_writes_to_it_are_logged():
+    versions = VersionRegistry('db1')
+    versions.changed([CLIENT])
+    versions.changed([CLIENT])
+    versions.logged([CLIENT], 3)
+    assert not versions.etag(*CLIENT).endswith('-3')
+    versions.logged([CLIENT], 4)
+    assert versions.etag(*CLIENT) == 'db1-client-c002-4'
+
+
+def test_without_shared_storage_every_registry_has_its_own_epoch():
+    assert VersionRegistry().etag('client', 'c001') != VersionRegistry().etag('client', 'c001')
@@ -0,0 +1,94 @@
+"""Per-resource versions used to build ETags."""
+
+import os
+import threading
+import weakref
+
+# Resource key of the client collection (listings, search, analytics)
+COLLECTION = ('clients', '*')
+
+# Registries given a new local id in each forked worker (see VersionRegistry._after_fork)
+_registries = weakref.WeakSet()
+
+
+class VersionRegistry:
+    """Versions of resources and of the client collection, shared by workers where storage is
+
+    A resource's version is the storage change log position of the last
+    change to it, or `base` (the position the dataset was loaded at) when it
+    has not changed since. Every worker replays the same log in order, so
+    workers on one shared database hand out the same ETag for the same data
+    and a client's cached copy revalidates on any of them. `epoch` names the
+    database; without shared storage it is random, as the data then lives
+    in this process only.
+
+    A worker's own write is applied before its position is known. Until the
+    log shows it (`logged`), the resources it changed carry a version unique
+    to this process, and changes pulled from the log for them in the
+    meantime, which are older than the write, give another fresh one.
+    """
+
+    def __init__(self, epoch=None, base=0):
+        self.epoch = epoch or os.urandom(4).hex()
+        self.base = base
+        self._versions = {}
+        self._pending = {}
+        self._local = os.urandom(4).hex()
+        self._provisional = 0
+        self._lock = threading.Lock()
+        _registries.add(self)
+
+    def _after_fork(self):
+        # Workers forked from a preloaded app share the loaded data and so its
+        # versions, but their own writes must not produce the same tags
+        self._local = os.urandom(4).hex()
+        self._lock = threading.Lock()
+
+    def changed(self, resources, seq=None):
+        """Record a change to `resources`, e.g. [('client', 'c001'), COLLECTION]
+
+        `seq` is the change's log position when it was pulled from the
+        storage change log; None for this worker's own write.
+        """
+        with self._lock:
+            for resource in resources:
+                if seq is None:
+                    self._pending[resource] = self._pending.get(resource, 0) + 1
+                if seq is None or resource in self._pending:
+                    self._provisional += 1
+                    self._versions[resource] = f'{self._local}.{self._provisional}'
+                else:
+                    self._versions[resource] = seq
+
+    def logged(self, resources, seq):
+        """This worker's own change to `resources` appears in the change log at `seq`"""
+        with self._lock:
+            for resource in resources:
+                pending = self._pending.get(resource, 0) - 1
+                if pending > 0:
+                    self._pending[resource] = pending
+                    continue
+                self._pending.pop(resource, None)
+                self._versions[resource] = seq
+
+    def etag(self, kind, key):
+        """Strong ETag value (unquoted) for one resource"""
+        return f'{self.epoch}-{kind}-{key}-{self._versions.get((kind, key), self.base)}'
+
+    def collection_etag(self, variant=''):
+        """Strong ETag value (unquoted) for listings of the client collection
+
+        `variant` distinguishes representations served from the same URL,
+        such as JSON and NDJSON.
+        """
+        suffix = f'-{variant}' if variant else ''
+        return f'{self.epoch}-clients-{self._versions.get(COLLECTION, self.base)}{suffix}'
+
+
+def _after_fork_in_child():
+    for registry in list(_registries):
+        registry._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)